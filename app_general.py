@@ -1,22 +1,53 @@
-from flask import Flask, request, redirect, session, render_template, flash
+from flask import Flask, request, redirect, session, render_template, flash, jsonify, url_for
 from werkzeug.utils import secure_filename
 import os
+import uuid
 
-# Import the scatter plot generator
-from models.chart_file import generate_scatter_plot
+# Import the scatter plot renderer
+from models.chart_file import chart_key, chart_scores, render_scatter_plot
 
-from models.maggic_risk_model import run_model as run_maggic  # MAGGIC Risk
-from models.maggic_risk_plus import run_model as run_maggic_plus  # MAGGIC Risk Plus
+from models.instrumentation import configure as configure_metrics, instrument
+from models.file_readers import SPOOL_MAX_SIZE, spool_upload
+from models.jobs import DONE, FAILED, JobQueue
+from models.maggic_risk_model import MODEL_VERSION as MAGGIC_VERSION, run_model as run_maggic  # MAGGIC Risk
+from models.maggic_risk_plus import MODEL_VERSION as MAGGIC_PLUS_VERSION, run_model as run_maggic_plus  # MAGGIC Risk Plus
+from models.pdf_reader import configure_page_cache, configure_workers as configure_pdf_workers
+from models.result_cache import MemoryResultCache, cache_key, hash_stream, make_result_cache
+from models.results import json_ready
 
 app = Flask(__name__)
 app.secret_key = 'supersecretkey'
-UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'csv', 'txt', 'json', 'xls', 'xlsx', 'pdf'}
 
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Uploads are processed from memory; larger ones spill to an anonymous temporary file
+app.config['SPOOL_MAX_SIZE'] = int(os.environ.get('MAGGIC_SPOOL_MAX_SIZE', SPOOL_MAX_SIZE))
 
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
+# patient_descriptions.txt of each upload, optionally gzip or zstd compressed
+DESCRIPTIONS_FOLDER = os.environ.get('MAGGIC_DESCRIPTIONS_DIR', 'descriptions')
+DESCRIPTIONS_COMPRESSION = os.environ.get('MAGGIC_DESCRIPTIONS_COMPRESSION') or None
+
+# Opt-in request metrics: MAGGIC_METRICS=log, memory or json:<path>
+configure_metrics(os.environ.get('MAGGIC_METRICS'))
+
+# Background jobs that run the models for /upload
+jobs = JobQueue(max_workers=int(os.environ.get('MAGGIC_JOB_WORKERS', 2)))
+
+# Finished results by (file content hash, model, model version); on disk if MAGGIC_CACHE_DIR is set
+result_cache = make_result_cache(os.environ.get('MAGGIC_CACHE_DIR'))
+
+# Rendered score charts (PNG bytes) by chart_key, i.e. by the scores they show
+chart_cache = MemoryResultCache(max_entries=64)
+
+# Extracted PDF page text by page content hash, so a re-uploaded export only has its new pages extracted;
+# only kept (on disk) if MAGGIC_PDF_PAGE_CACHE_DIR is set
+configure_page_cache(os.environ.get('MAGGIC_PDF_PAGE_CACHE_DIR'))
+
+# Processes that extract the text of one PDF upload; every running job can start its own,
+# so keep MAGGIC_JOB_WORKERS x MAGGIC_PDF_WORKERS within the CPUs (0: one per CPU)
+configure_pdf_workers(int(os.environ.get('MAGGIC_PDF_WORKERS', 2)))
+
+if not os.path.exists(DESCRIPTIONS_FOLDER):
+    os.makedirs(DESCRIPTIONS_FOLDER)
 
 def allowed_file(filename):
     """Check if the uploaded file has an allowed extension."""
@@ -69,9 +100,48 @@ def upload_form():
   session['language'] = language  # Store selected language in session
   return render_template('upload.html', translations=translations[language], language=language)
 
+def descriptions_path(upload):
+    """Descriptions file of an upload; the upload's unique name keeps concurrent jobs apart."""
+    name = os.path.splitext(upload.filename)[0]
+    return os.path.join(DESCRIPTIONS_FOLDER, f"{name}_patient_descriptions.txt")
+
+
+def process_upload(upload, selected_model, key=None, progress=None):
+    """Run the selected model on a spooled upload (in a job worker); the chart is rendered on request."""
+    with instrument('upload_job', model=selected_model) as metrics:
+        try:
+            # Run the appropriate MAGGIC model
+            with metrics.stage('model'):
+                if selected_model == 'maggic_plus':
+                    results = run_maggic_plus(upload, progress=progress)
+                else:
+                    results = run_maggic(upload, progress=progress, output_file=descriptions_path(upload),
+                                         compression=DESCRIPTIONS_COMPRESSION)
+        finally:
+            # Release the upload's memory (or its temporary file)
+            upload.close()
+
+    result = {'results': results, 'model': selected_model}
+    if key is not None:
+        result_cache.put(key, result)
+    return result
+
+
+def upload_cache_key(file, selected_model):
+    """Result cache key of an uploaded file: content hash, model and model version."""
+    model_version = MAGGIC_PLUS_VERSION if selected_model == 'maggic_plus' else MAGGIC_VERSION
+    # The extension selects the reader, so it is part of the content
+    extension = os.path.splitext(file.filename)[-1].lower()
+    return cache_key(hash_stream(file.stream), f"{selected_model}{extension}", model_version)
+
+
+def wants_json():
+    return request.args.get('format') == 'json' or request.accept_mimetypes.best == 'application/json'
+
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    """Handle file upload and model selection."""
+    """Handle file upload and model selection; the model runs as a background job."""
     if 'file' not in request.files:
         flash('No file part')
         return redirect(request.url)
@@ -82,37 +152,109 @@ def upload_file():
         return redirect(request.url)
 
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
-
         selected_model = request.form.get('model')
-        language = session.get('language', 'en')  # Get selected language from session
-        # Run the appropriate MAGGIC model
-        if selected_model == 'maggic_plus':
-            results = run_maggic_plus(file_path)
-        else:
-            results = run_maggic(file_path)
-
-        # Remove the uploaded file after processing
-        os.remove(file_path)
-
-        # Generate a scatter plot for all patients (only if there's more than one patient)
-        group_chart = None
-        if len(results) > 1:
-            group_chart = generate_scatter_plot(results)
-
-        # Render the template, passing in the results and the base64-encoded chart
-        return render_template('results_update.html',
-                               results=results,
-                               model=selected_model,
-                               group_chart=group_chart,
-                               translations=translations[language],
-                               language=language)
+        with instrument('upload', model=selected_model) as metrics:
+            # A repeated upload of the same file reuses the cached results
+            with metrics.stage('hash'):
+                key = upload_cache_key(file, selected_model)
+            cached = result_cache.get(key)
+            if cached is not None:
+                metrics.count('cache_hits')
+                job = jobs.complete(cached, meta={'model': selected_model})
+            else:
+                # A unique name, so that concurrent uploads of the same file get their own descriptions file
+                filename = f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
+                # Held in memory (or an anonymous temporary file) until the job has read it
+                with metrics.stage('spool'):
+                    upload = spool_upload(file.stream, filename, app.config['SPOOL_MAX_SIZE'])
+
+                job = jobs.submit(process_upload, upload, selected_model, key=key, meta={'model': selected_model})
+
+        if wants_json():
+            return jsonify(job_id=job.id,
+                           status_url=url_for('job_status', job_id=job.id),
+                           results_url=url_for('job_results', job_id=job.id)), 202
+        return redirect(url_for('job_results', job_id=job.id))
 
     else:
         flash('Unsupported file type')
         return redirect(request.url)
 
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Status and progress of an upload job, as JSON."""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify(error='Unknown job'), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/results')
+def job_results(job_id):
+    """Results page of a finished job (JSON with ?format=json); a progress page until then."""
+    job = jobs.get(job_id)
+    if job is None:
+        if wants_json():
+            return jsonify(error='Unknown job'), 404
+        flash('Unknown or expired job')
+        return redirect(url_for('upload_form'))
+
+    # ?lang= switches the language of the results page without re-running the model
+    language = request.args.get('lang', session.get('language', 'en'))
+    if language not in translations:
+        language = 'en'
+    session['language'] = language
+    if job.status != DONE:
+        if wants_json():
+            return jsonify(job.to_dict()), (500 if job.status == FAILED else 202)
+        return render_template('job_status.html',
+                               job=job,
+                               status_url=url_for('job_status', job_id=job.id),
+                               results_url=url_for('job_results', job_id=job.id),
+                               language=language)
+
+    if wants_json():
+        # NaN (e.g. a blank sodium cell) is not valid JSON
+        return jsonify(model=job.result['model'], results=json_ready(job.result['results']))
+
+    # Render the template; the page loads the chart from /jobs/<job_id>/chart.png
+    with instrument('results', model=job.result['model']) as metrics:
+        with metrics.stage('render'):
+            return render_template('results_update.html',
+                                   results=job.result['results'],
+                                   model=job.result['model'],
+                                   chart_url=job_chart_url(job),
+                                   translations=translations[language],
+                                   language=language)
+
+def job_chart_url(job):
+    """URL of the score chart of a finished job, or None for a single patient."""
+    if len(job.result['results']) > 1:
+        return url_for('job_chart', job_id=job.id)
+    return None
+
+@app.route('/jobs/<job_id>/chart.png')
+def job_chart(job_id):
+    """Score chart of a finished job as a PNG, rendered on first request and cached by its scores."""
+    job = jobs.get(job_id)
+    if job is None or job.status != DONE:
+        return jsonify(error='Unknown or unfinished job'), 404
+
+    key = job.meta.get('chart_key')
+    if key is None:
+        scores = chart_scores(job.result['results'])
+        key = job.meta['chart_key'] = chart_key(scores)
+    png = chart_cache.get(key)
+    if png is None:
+        scores = chart_scores(job.result['results'])
+        with instrument('chart', model=job.result['model']) as metrics:
+            with metrics.stage('render'):
+                png = render_scatter_plot(scores)
+        chart_cache.put(key, png)
+
+    response = app.response_class(png, mimetype='image/png')
+    response.set_etag(key)
+    response.cache_control.max_age = 3600
+    return response.make_conditional(request)
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,127 @@
+# cohorts.py
+# Synthetic patient cohorts for the benchmarks.
+# Every generator writes the same deterministic cohort (for a given size
+# and seed) in one of the upload formats accepted by the models. Rows are
+# written as they are generated, so a 1M-patient file never has to be held
+# in memory.
+import csv
+import json
+import os
+import random
+
+COHORT_SIZES = [1000, 100000, 1000000]
+COHORT_FORMATS = ['csv', 'json', 'xlsx', 'pdf']
+
+COLUMNS = [
+  'Name', 'age', 'gender', 'nyha_class', 'lvef', 'diabetes', 'smoker', 'copd', 'sbp', 'creatinine', 'bmi',
+  'beta_blocker', 'ace_arb', 'hf_duration_less_than_18_months',
+  # MAGGIC Risk Plus fields
+  'sodium', 'atrial_fibrillation', 'myocardial_infarction', 'stroke', 'pci', 'cabg',
+]
+
+# Rows per PDF page; small enough for the text to stay on one line each
+PDF_ROWS_PER_PAGE = 60
+
+
+def generate_patients(n, seed=0):
+  """Yield `n` synthetic raw patient rows (lists in COLUMNS order)."""
+  rng = random.Random(seed)
+  yes_no = ['yes', 'no']
+  for i in range(n):
+    yield [
+      f"P{i}",
+      rng.randint(18, 100),
+      rng.choice(['male', 'female']),
+      rng.choice(['I', 'II', 'III', 'IV']),
+      round(rng.uniform(10, 70), 1),
+      rng.choice(yes_no),
+      rng.choice(yes_no),
+      rng.choice(yes_no),
+      rng.randint(70, 200),
+      round(rng.uniform(0.5, 4.0), 2),
+      round(rng.uniform(15, 45), 1),
+      rng.choice(yes_no),
+      rng.choice(yes_no),
+      rng.choice(yes_no),
+      rng.randint(125, 150),
+      rng.choice(yes_no),
+      rng.choice(yes_no),
+      rng.choice(yes_no),
+      rng.choice(yes_no),
+      rng.choice(yes_no),
+    ]
+
+
+def write_csv(path, rows):
+  with open(path, 'w', encoding='utf-8', newline='') as f:
+    writer = csv.writer(f)
+    writer.writerow(COLUMNS)
+    writer.writerows(rows)
+
+
+def write_json(path, rows):
+  with open(path, 'w', encoding='utf-8') as f:
+    f.write('[')
+    for i, row in enumerate(rows):
+      if i:
+        f.write(',\n')
+      f.write(json.dumps(dict(zip(COLUMNS, row))))
+    f.write(']\n')
+
+
+def write_xlsx(path, rows):
+  from openpyxl import Workbook
+  workbook = Workbook(write_only=True)
+  sheet = workbook.create_sheet()
+  sheet.append(COLUMNS)
+  for row in rows:
+    sheet.append(row)
+  workbook.save(path)
+
+
+def write_pdf(path, rows):
+  # One comma-separated row per text line, the layout the PDF reader expects
+  import matplotlib
+  matplotlib.use('Agg')
+  import matplotlib.pyplot as plt
+  from matplotlib.backends.backend_pdf import PdfPages
+
+  def write_page(pdf, lines):
+    fig = plt.figure(figsize=(11.69, 8.27))
+    for i, line in enumerate(lines):
+      fig.text(0.01, 0.99 - i * 0.98 / PDF_ROWS_PER_PAGE, line, fontsize=5, va='top', family='monospace')
+    pdf.savefig(fig)
+    plt.close(fig)
+
+  with matplotlib.rc_context({'pdf.fonttype': 42}), PdfPages(path) as pdf:
+    lines = [','.join(COLUMNS)]
+    for row in rows:
+      lines.append(','.join(str(value) for value in row))
+      if len(lines) == PDF_ROWS_PER_PAGE:
+        write_page(pdf, lines)
+        lines = []
+    if lines:
+      write_page(pdf, lines)
+
+
+WRITERS = {
+  'csv': write_csv,
+  'json': write_json,
+  'xlsx': write_xlsx,
+  'pdf': write_pdf,
+}
+
+
+def cohort_path(data_dir, n, file_format, seed=0):
+  return os.path.join(data_dir, f"cohort_{n}_seed{seed}.{file_format}")
+
+
+def make_cohort(data_dir, n, file_format, seed=0, overwrite=False):
+  """Write (or reuse) the cohort of `n` patients in `file_format`; returns its path."""
+  os.makedirs(data_dir, exist_ok=True)
+  path = cohort_path(data_dir, n, file_format, seed)
+  if overwrite or not os.path.exists(path):
+    tmp_path = path + '.part'
+    WRITERS[file_format](tmp_path, generate_patients(n, seed))
+    os.replace(tmp_path, path)
+  return path
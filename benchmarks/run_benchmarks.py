@@ -0,0 +1,222 @@
+# run_benchmarks.py
+# Stage-by-stage timings of the MAGGIC pipeline on synthetic cohorts.
+#
+#   python -m benchmarks.run_benchmarks --sizes 1000 100000 --formats csv json \
+#       --output bench.json
+#   python -m benchmarks.run_benchmarks --sizes 1000 --compare bench.json
+#
+# Each (model, format, size) run is timed per stage: file read, parsing,
+# scoring, risk lookups, message/description generation, the
+# patient_descriptions.txt write and the scatter plot. Results are written
+# as JSON; --compare reports the stages that got slower than a previous run
+# and exits with status 1 if any did. Before its first timed run in a format,
+# each model is run once, untimed, on a small cohort of that format.
+# PDF cohorts above --pdf-max-patients are not generated: a 1M-patient PDF
+# is over 16k pages and takes hours to write.
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.cohorts import COHORT_FORMATS, COHORT_SIZES, make_cohort
+from models import maggic_risk_model, maggic_risk_plus
+from models.chart_file import generate_scatter_plot
+from models.file_readers import read_patient_records
+from models.maggic_core import PatientParser
+from models.maggic_risk_plus import PlusPatientParser
+
+MODELS = {
+  'maggic_risk_model': (maggic_risk_model, PatientParser),
+  'maggic_risk_plus': (maggic_risk_plus, PlusPatientParser),
+}
+
+# The chart stage is skipped above this many patients
+CHART_MAX_PATIENTS = 100000
+
+# PDF cohorts are only benchmarked up to this many patients
+PDF_MAX_PATIENTS = 10000
+
+# Size of the cohort of the untimed warm-up runs
+WARMUP_PATIENTS = 100
+
+
+def run_pipeline(model_name, path, descriptions_path, chart_max_patients=CHART_MAX_PATIENTS):
+  """Run every stage once on `path`; returns {stage: seconds or None if skipped}."""
+  module, parser_class = MODELS[model_name]
+  timings = {}
+
+  start = time.perf_counter()
+  raw_records = read_patient_records(path)
+  timings['read'] = time.perf_counter() - start
+
+  start = time.perf_counter()
+  parser = parser_class()
+  patients = [parser.parse(raw_data, idx + 1) for idx, raw_data in enumerate(raw_records)]
+  timings['parse'] = time.perf_counter() - start
+
+  start = time.perf_counter()
+  scores = [module.calculate_maggic_score(patient_data) for patient_data in patients]
+  timings['score'] = time.perf_counter() - start
+
+  start = time.perf_counter()
+  results = []
+  for idx, (patient_data, score) in enumerate(zip(patients, scores)):
+    results.append({
+      "patient_id": patient_data['name'] if patient_data['name'] else f"Patient {idx + 1}",
+      "patient_data": patient_data,
+      "score": score,
+      "risk1_year": module.calculate_1_year_risk(score),
+      "risk3_year": module.calculate_3_year_risk(score),
+      "category": module.get_risk_category(score),
+    })
+  timings['risk'] = time.perf_counter() - start
+
+  start = time.perf_counter()
+  for result in results:
+    for field, narrator in module.NARRATORS.items():
+      result[field] = narrator(result)
+  timings['narratives'] = time.perf_counter() - start
+
+  # Only the basic model writes the file; the same writer is timed for both
+  start = time.perf_counter()
+  with open(descriptions_path, 'w', encoding='utf-8') as output:
+    for result in results:
+      maggic_risk_model.write_patient_description(output, result)
+  timings['write'] = time.perf_counter() - start
+
+  if len(results) <= chart_max_patients:
+    start = time.perf_counter()
+    generate_scatter_plot(results)
+    timings['chart'] = time.perf_counter() - start
+  else:
+    timings['chart'] = None
+
+  return timings
+
+
+def git_revision():
+  try:
+    return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def run_benchmarks(models, sizes, formats, data_dir, repeat=1, seed=0, chart_max_patients=CHART_MAX_PATIENTS,
+                   pdf_max_patients=PDF_MAX_PATIENTS):
+  """
+  Run every combination (PDF only up to `pdf_max_patients` patients); each
+  stage keeps the best of `repeat` runs.
+  """
+  runs = []
+  descriptions_path = os.path.join(data_dir, 'patient_descriptions.txt')
+  warmed_up = set()
+  for n in sizes:
+    for file_format in formats:
+      if file_format == 'pdf' and n > pdf_max_patients:
+        print(f"Cohort {n} x pdf: skipped (above {pdf_max_patients} patients)")
+        continue
+      start = time.perf_counter()
+      path = make_cohort(data_dir, n, file_format, seed)
+      print(f"Cohort {n} x {file_format}: {path} ({time.perf_counter() - start:.1f}s)")
+      for model_name in models:
+        if (model_name, file_format) not in warmed_up:
+          # Warm-up run: the first call pays for imports (pandas, openpyxl, PyPDF2, matplotlib) and caches
+          warmup_path = make_cohort(data_dir, WARMUP_PATIENTS, file_format, seed)
+          run_pipeline(model_name, warmup_path, descriptions_path, chart_max_patients)
+          warmed_up.add((model_name, file_format))
+        best = {}
+        for _ in range(repeat):
+          timings = run_pipeline(model_name, path, descriptions_path, chart_max_patients)
+          for stage, seconds in timings.items():
+            if seconds is None:
+              best.setdefault(stage, None)
+            elif best.get(stage) is None or seconds < best[stage]:
+              best[stage] = seconds
+        runs.append({
+          'model': model_name,
+          'format': file_format,
+          'patients': n,
+          'stages': best,
+          'total': sum(seconds for seconds in best.values() if seconds is not None),
+        })
+        print(format_run(runs[-1]))
+
+  return {
+    'meta': {
+      'revision': git_revision(),
+      'python': platform.python_version(),
+      'platform': platform.platform(),
+      'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+      'seed': seed,
+      'repeat': repeat,
+    },
+    'runs': runs,
+  }
+
+
+def format_run(run):
+  stages = ' '.join(
+    f"{stage}={seconds:.3f}" if seconds is not None else f"{stage}=skipped"
+    for stage, seconds in run['stages'].items()
+  )
+  return f"{run['model']:<18} {run['format']:<5} {run['patients']:>8}  total={run['total']:.3f}s  {stages}"
+
+
+def compare(baseline, current, threshold=0.1, min_seconds=0.01):
+  """Return the (key, stage, before, after) stages more than `threshold` slower than `baseline`."""
+  before = {(run['model'], run['format'], run['patients']): run['stages'] for run in baseline['runs']}
+  regressions = []
+  for run in current['runs']:
+    key = (run['model'], run['format'], run['patients'])
+    for stage, seconds in run['stages'].items():
+      old = before.get(key, {}).get(stage)
+      if old is None or seconds is None or seconds < min_seconds:
+        continue
+      if seconds > old * (1 + threshold):
+        regressions.append((key, stage, old, seconds))
+  return regressions
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Benchmark the MAGGIC pipeline on synthetic cohorts.")
+  parser.add_argument('--models', nargs='+', choices=list(MODELS), default=list(MODELS))
+  parser.add_argument('--sizes', nargs='+', type=int, default=COHORT_SIZES)
+  parser.add_argument('--formats', nargs='+', choices=COHORT_FORMATS, default=COHORT_FORMATS)
+  parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'maggic_benchmarks'),
+                      help="Where the generated cohorts are cached")
+  parser.add_argument('--repeat', type=int, default=1)
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--chart-max-patients', type=int, default=CHART_MAX_PATIENTS)
+  parser.add_argument('--pdf-max-patients', type=int, default=PDF_MAX_PATIENTS,
+                      help="Skip the PDF cohorts larger than this")
+  parser.add_argument('--output', help="Write the results to this JSON file")
+  parser.add_argument('--compare', help="Previous results JSON to check for regressions")
+  parser.add_argument('--threshold', type=float, default=0.1, help="Allowed slowdown per stage (0.1 = 10%%)")
+  args = parser.parse_args(argv)
+
+  results = run_benchmarks(args.models, args.sizes, args.formats, args.data_dir, args.repeat, args.seed,
+                           args.chart_max_patients, args.pdf_max_patients)
+
+  if args.output:
+    with open(args.output, 'w', encoding='utf-8') as f:
+      json.dump(results, f, indent=2)
+    print(f"Benchmark results have been saved to {args.output}")
+
+  if args.compare:
+    with open(args.compare, 'r', encoding='utf-8') as f:
+      baseline = json.load(f)
+    regressions = compare(baseline, results, args.threshold)
+    for (model_name, file_format, n), stage, old, new in regressions:
+      print(f"REGRESSION {model_name} {file_format} {n} {stage}: {old:.3f}s -> {new:.3f}s")
+    if regressions:
+      return 1
+    print("No regressions.")
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
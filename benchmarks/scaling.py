@@ -0,0 +1,95 @@
+# scaling.py
+# Regression benchmark for linear scaling in the number of patients.
+#
+#   python -m benchmarks.scaling --sizes 500 1000 2000 4000
+#
+# Each model's run_model is timed end to end on synthetic CSV cohorts of
+# the given sizes and log(time) is fitted against log(patients). A linear
+# pipeline has an exponent close to 1; a per-patient step that grows with
+# the cohort (e.g. re-rendering a chart for every patient) pushes it towards
+# 2. Exits with status 1 if any exponent is above --max-exponent.
+import argparse
+import contextlib
+import io
+import math
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.cohorts import make_cohort
+from models import maggic_risk_model, maggic_risk_model_part2, maggic_risk_plus
+
+PIPELINES = {
+  'maggic_risk_model': maggic_risk_model.run_model,
+  'maggic_risk_plus': maggic_risk_plus.run_model,
+  'maggic_risk_model_part2': maggic_risk_model_part2.run_model,
+}
+
+DEFAULT_SIZES = [500, 1000, 2000, 4000]
+MAX_EXPONENT = 1.3
+
+
+def time_pipeline(run_model, path, work_dir, repeat=1):
+  """Best wall time of `repeat` runs, with the output files and prints kept out of the way."""
+  best = None
+  cwd = os.getcwd()
+  os.chdir(work_dir)
+  try:
+    for _ in range(repeat):
+      with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        run_model(path)
+        seconds = time.perf_counter() - start
+      best = seconds if best is None else min(best, seconds)
+  finally:
+    os.chdir(cwd)
+  return best
+
+
+def scaling_exponent(sizes, seconds):
+  """Least-squares slope of log(seconds) against log(sizes)."""
+  xs = [math.log(n) for n in sizes]
+  ys = [math.log(s) for s in seconds]
+  x_mean = sum(xs) / len(xs)
+  y_mean = sum(ys) / len(ys)
+  return (sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys))
+          / sum((x - x_mean) ** 2 for x in xs))
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Check that the MAGGIC pipelines scale linearly with the cohort size.")
+  parser.add_argument('--models', nargs='+', choices=list(PIPELINES), default=list(PIPELINES))
+  parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES)
+  parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'maggic_benchmarks'),
+                      help="Where the generated cohorts are cached")
+  parser.add_argument('--repeat', type=int, default=1)
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--max-exponent', type=float, default=MAX_EXPONENT)
+  args = parser.parse_args(argv)
+  if len(set(args.sizes)) < 2:
+    parser.error("at least two different sizes are needed")
+
+  paths = {n: os.path.abspath(make_cohort(args.data_dir, n, 'csv', args.seed)) for n in args.sizes}
+  failed = []
+  with tempfile.TemporaryDirectory() as work_dir:
+    for model_name in args.models:
+      # Warm-up run: the first call pays for imports (pandas, matplotlib) and caches
+      time_pipeline(PIPELINES[model_name], paths[min(args.sizes)], work_dir)
+      seconds = [time_pipeline(PIPELINES[model_name], paths[n], work_dir, args.repeat) for n in args.sizes]
+      exponent = scaling_exponent(args.sizes, seconds)
+      timings = ' '.join(f"{n}={s:.3f}s" for n, s in zip(args.sizes, seconds))
+      print(f"{model_name:<24} exponent={exponent:.2f}  {timings}")
+      if exponent > args.max_exponent:
+        failed.append(model_name)
+
+  for model_name in failed:
+    print(f"REGRESSION {model_name}: run time grows faster than linearly (exponent > {args.max_exponent})")
+  if failed:
+    return 1
+  print("All pipelines scale linearly.")
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -1,7 +1,22 @@
 from flask import Flask, request, jsonify
 
+from models.batch_scoring import ResultBatch, parse_records
+from models.maggic_core import PatientParser
+from models.maggic_risk_plus import PlusPatientParser
+from models.scoring_table import MAGGIC_PLUS_TABLE, MAGGIC_TABLE
+
 app = Flask(__name__)
 
+# Largest request body and number of patients accepted by /api/score
+app.config['MAX_CONTENT_LENGTH'] = 64 * 1024 * 1024
+MAX_PATIENTS = 100000
+
+# Parser and scoring table of each model
+SCORING_MODELS = {
+    'maggic': (PatientParser, MAGGIC_TABLE),
+    'maggic_plus': (PlusPatientParser, MAGGIC_PLUS_TABLE),
+}
+
 @app.route('/calculate-risk', methods=['POST'])
 def calculate_risk():
     # Λήψη δεδομένων από το front-end
@@ -22,5 +37,52 @@ def calculate_risk():
     # Επιστροφή αποτελέσματος
     return jsonify({"risk": risk})
 
+def patient_from_json(patient):
+    """
+    A JSON patient object as a file record: true/false become 'yes'/'no' and
+    null fields are left out, so they take their defaults like missing ones.
+    """
+    return {key: ('yes' if value else 'no') if isinstance(value, bool) else value
+            for key, value in patient.items() if value is not None}
+
+@app.route('/api/score', methods=['POST'])
+def score_patients():
+    """
+    Score one patient (a JSON object) or many (a JSON array of objects) in one
+    vectorized pass. The fields are the columns of the upload files, e.g.
+    {"name": "A", "age": 70, "gender": "male", "nyha_class": "II", "lvef": 35,
+    "diabetes": "yes", ...}; ?model=maggic_plus selects MAGGIC Risk Plus.
+    A patient without a name is "Patient <n>", n counting from 1 in the
+    request. A single patient gets its result object back; an array gets
+    {"model", "results", "errors", "warnings"}, with the results in input
+    order, the patients that could not be parsed listed in "errors" by
+    patient_no and the parser's warnings (e.g. fields that took their
+    defaults) in "warnings".
+    """
+    model = request.args.get('model', 'maggic')
+    if model not in SCORING_MODELS:
+        return jsonify({"error": f"Unknown model: {model}"}), 400
+
+    data = request.get_json(silent=True)
+    single = isinstance(data, dict)
+    patients = [data] if single else data
+    if not isinstance(patients, list) or not all(isinstance(patient, dict) for patient in patients):
+        return jsonify({"error": "Expected a JSON object or an array of objects"}), 400
+    if len(patients) > MAX_PATIENTS:
+        return jsonify({"error": f"At most {MAX_PATIENTS} patients per request"}), 413
+
+    parser_class, table = SCORING_MODELS[model]
+    # Warnings go in the response rather than the server log
+    parser = parser_class(name_fallback=False, quiet=True)
+    patient_ids, records, errors = parse_records(map(patient_from_json, patients), parser)
+    results = ResultBatch.from_records(patient_ids, records, table).to_records() if records else []
+    errors = [{"patient_no": patient_no, "error": message} for patient_no, message in errors]
+
+    if single:
+        if errors:
+            return jsonify(errors[0]), 400
+        return jsonify(results[0])
+    return jsonify({"model": model, "results": results, "errors": errors, "warnings": parser.warnings})
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -1,335 +1,12 @@
 # maggic_model.py
-import os
-import json
-import pandas as pd
-import PyPDF2
-
-
-def parse_patient_data(patient_data, default_patient_no):
-  parsed_data = {}
-
-  # Handle possible different key names with case insensitivity
-  def get_value(keys, default):
-    for key in keys:
-      if key in patient_data:
-        return patient_data[key]
-    return default
-
-  name = get_value(['Name', 'name', 'Patient Name', 'PatientName'], None)
-  if not name:
-    # Fallback: Extract the first column's value
-    first_key = list(patient_data.keys())[0]
-    name = patient_data[first_key]
-    print(f"Warning: 'name' field not found. Using first column '{first_key}' value '{name}' as patient name.")
-
-  parsed_data['name'] = name
-
-  try:
-    parsed_data['age'] = int(get_value(['age', 'Age'], 0))
-  except ValueError:
-    parsed_data['age'] = 0
-
-  gender = get_value(['gender', 'Gender'], 'male').strip().lower()
-  parsed_data['gender'] = gender if gender in ['male', 'female'] else 'male'
-
-  nyha_str = get_value(['nyha_class', 'NYHA Class'], 'I').strip().upper()
-  nyha_class_map = {'I': 1, 'II': 2, 'III': 3, 'IV': 4}
-  parsed_data['nyha_class'] = nyha_class_map.get(nyha_str, 1)
-
-  try:
-    parsed_data['lvef'] = float(get_value(['lvef', 'LVEF'], 30))
-  except ValueError:
-    parsed_data['lvef'] = 30.0
-
-  parsed_data['diabetes'] = get_value(['diabetes', 'Diabetes'], 'no').strip().lower() == 'yes'
-  parsed_data['smoker'] = get_value(['smoker', 'Smoker'], 'no').strip().lower() == 'yes'
-  parsed_data['copd'] = get_value(['copd', 'COPD'], 'no').strip().lower() == 'yes'
-
-  try:
-    parsed_data['sbp'] = int(get_value(['sbp', 'SBP'], 120))
-  except ValueError:
-    parsed_data['sbp'] = 120
-
-  try:
-    parsed_data['creatinine'] = float(get_value(['creatinine', 'Creatinine'], 1.0))
-  except ValueError:
-    parsed_data['creatinine'] = 1.0
-
-  try:
-    parsed_data['bmi'] = float(get_value(['bmi', 'BMI'], 24))
-  except ValueError:
-    parsed_data['bmi'] = 24.0
-
-  parsed_data['beta_blocker'] = get_value(['beta_blocker', 'Beta Blocker'], 'no').strip().lower() == 'yes'
-  parsed_data['ace_arb'] = get_value(['ace_arb', 'ACE_ARB', 'ACE Inhibitors or ARBs'], 'no').strip().lower() == 'yes'
-  parsed_data['hf_duration_less_than_18_months'] = get_value(
-    ['hf_duration_less_than_18_months', 'HF Duration <18 months'], 'no').strip().lower() == 'yes'
-
-  return parsed_data
-
-
-def calculate_efr(ef):
-  if ef == 0 or ef is None:
-    return None
-  elif ef < 20:
-    return 7
-  elif ef < 25:
-    return 6
-  elif ef < 30:
-    return 5
-  elif ef < 35:
-    return 3
-  elif ef < 40:
-    return 2
-  else:
-    return 0
-
-
-def calculate_efar(age, ef, _efr):
-  if age < 18 or age > 110 or age is None:
-    return None
-  elif _efr is not None:
-    if age < 55:
-      return 0
-    elif age < 60:
-      if ef < 30:
-        return 1
-      elif ef < 40:
-        return 2
-      else:
-        return 3
-    elif age < 65:
-      if ef < 30:
-        return 2
-      elif ef < 40:
-        return 4
-      else:
-        return 5
-    elif age < 70:
-      if ef < 30:
-        return 4
-      elif ef < 40:
-        return 6
-      else:
-        return 7
-    elif age < 75:
-      if ef < 30:
-        return 6
-      elif ef < 40:
-        return 8
-      else:
-        return 9
-    elif age < 80:
-      if ef < 30:
-        return 8
-      elif ef < 40:
-        return 10
-      else:
-        return 12
-    else:
-      if ef < 30:
-        return 10
-      elif ef < 40:
-        return 13
-      else:
-        return 15
-  else:
-    return None
-
-
-def calculate_sbpr(sbp, ef):
-  if ef < 1 or ef > 95 or sbp < 50 or sbp > 250:
-    return None
-  else:
-    if sbp < 110:
-      if ef < 30:
-        return 5
-      elif ef < 40:
-        return 3
-      else:
-        return 2
-    elif sbp < 120:
-      if ef < 30:
-        return 4
-      elif ef < 40:
-        return 2
-      else:
-        return 1
-    elif sbp < 130:
-      if ef < 30:
-        return 3
-      elif ef < 40:
-        return 1
-      else:
-        return 1
-    elif sbp < 140:
-      if ef < 30:
-        return 2
-      elif ef < 40:
-        return 1
-      else:
-        return 0
-    elif sbp < 150:
-      if ef < 30:
-        return 1
-      else:
-        return 0
-    else:
-      return 0
-
-
-def calculate_bmir(bmi):
-  if bmi < 10 or bmi > 50:
-    return None
-  else:
-    if bmi < 15:
-      return 6
-    elif bmi < 20:
-      return 5
-    elif bmi < 25:
-      return 3
-    elif bmi < 30:
-      return 2
-    else:
-      return 0
-
-
-def calculate_crtnr(creatinine):
-  if creatinine < 20 or creatinine > 1400:
-    return None
-  else:
-    if creatinine < 90:
-      return 0
-    elif creatinine < 110:
-      return 1
-    elif creatinine < 130:
-      return 2
-    elif creatinine < 150:
-      return 3
-    elif creatinine < 170:
-      return 4
-    elif creatinine < 210:
-      return 5
-    elif creatinine < 250:
-      return 6
-    else:
-      return 8
-
-
-def calculate_gender_points(gender):
-  if gender.lower() == 'female':
-    return -3
-  else:
-    return 0
-
-
-def calculate_nyha_points(nyha_class):
-  nyha_points = {1: 0, 2: 3, 3: 6, 4: 8}
-  return nyha_points.get(nyha_class, 0)
-
-
-def calculate_smoker_points(smoker):
-  return 1 if smoker else 0
-
-
-def calculate_diabetes_points(diabetes):
-  return 3 if diabetes else 0
-
-
-def calculate_copd_points(copd):
-  return 2 if copd else 0
-
-
-def calculate_hf_points(hf_duration_less_than_18_months):
-  return 2 if hf_duration_less_than_18_months else 0
-
-
-def calculate_blocker_points(beta_blocker):
-  return 5 if not beta_blocker else 0
-
-
-def calculate_acei_points(acei_arb):
-  return 3 if not acei_arb else 0
-
-
-def calculate_maggic_score(patient_data):
-  age = patient_data['age']
-  lvef = patient_data['lvef']
-  ef = lvef  # For consistency with TypeScript code
-  sbp = patient_data['sbp']
-  bmi = patient_data['bmi']
-  creatinine_mg_dl = patient_data['creatinine']
-  creatinine = creatinine_mg_dl * 88.4  # Convert mg/dL to μmol/L
-
-  _efr = calculate_efr(ef)
-  _efar = calculate_efar(age, ef, _efr)
-  _sbpr = calculate_sbpr(sbp, ef)
-  _bmir = calculate_bmir(bmi)
-  _crtnr = calculate_crtnr(creatinine)
-
-  gender_points = calculate_gender_points(patient_data['gender'])
-  nyha_points = calculate_nyha_points(patient_data['nyha_class'])
-  smoker_points = calculate_smoker_points(patient_data['smoker'])
-  diabetes_points = calculate_diabetes_points(patient_data['diabetes'])
-  copd_points = calculate_copd_points(patient_data['copd'])
-  hf_points = calculate_hf_points(patient_data['hf_duration_less_than_18_months'])
-  blocker_points = calculate_blocker_points(patient_data['beta_blocker'])
-  acei_points = calculate_acei_points(patient_data['ace_arb'])
-
-  # Sum all the points
-  score = (
-    (_efr or 0) +
-    (_efar or 0) +
-    (_sbpr or 0) +
-    (_bmir or 0) +
-    (_crtnr or 0) +
-    gender_points +
-    nyha_points +
-    smoker_points +
-    diabetes_points +
-    copd_points +
-    hf_points +
-    blocker_points +
-    acei_points
-  )
-
-  return score
-
-
-def calculate_1_year_risk(score):
-  risk1 = [
-    0.015, 0.016, 0.018, 0.02, 0.022, 0.024, 0.027, 0.029, 0.032, 0.036,
-    0.039, 0.043, 0.048, 0.052, 0.058, 0.063, 0.07, 0.077, 0.084, 0.093,
-    0.102, 0.111, 0.122, 0.134, 0.147, 0.16, 0.175, 0.191, 0.209, 0.227,
-    0.248, 0.269, 0.292, 0.316, 0.342, 0.369, 0.398, 0.427, 0.458, 0.49,
-    0.523, 0.557, 0.591, 0.625, 0.659, 0.692, 0.725, 0.757, 0.787, 0.816,
-    0.842
-  ]
-  if 0 <= score < len(risk1):
-    return round(100 * risk1[score], 2)  # Percentage % with 2 decimal places
-  return None
-
-
-def calculate_3_year_risk(score):
-  risk3 = [
-    0.039, 0.043, 0.048, 0.052, 0.058, 0.063, 0.07, 0.077, 0.084, 0.092,
-    0.102, 0.111, 0.122, 0.134, 0.146, 0.16, 0.175, 0.191, 0.209, 0.227,
-    0.247, 0.269, 0.292, 0.316, 0.342, 0.369, 0.397, 0.427, 0.458, 0.49,
-    0.523, 0.556, 0.59, 0.625, 0.658, 0.692, 0.725, 0.756, 0.787, 0.815,
-    0.842, 0.866, 0.889, 0.908, 0.926, 0.941, 0.953, 0.964, 0.973, 0.98, 0.985
-  ]
-  if 0 <= score < len(risk3):
-    return round(100 * risk3[score], 2)  # Percentage % with 2 decimal places
-  return None
-
-
-def get_risk_category(score):
-  if score <= 19:
-    return 'Low Risk'
-  elif score <= 30:
-    return 'Medium Risk'
-  else:
-    return 'High Risk'
+from models.file_readers import read_patient_records
+from models.maggic_core import (
+  PatientParser,
+  calculate_maggic_score,
+  calculate_1_year_risk,
+  calculate_3_year_risk,
+  get_risk_category,
+)
 
 
 def generate_health_message_patient(score, patient_data):
@@ -873,80 +550,17 @@ def generate_patient_description(patient_id, patient_data, score, risk1_year, ri
 
 
 def process_file_and_calculate(filename):
-  patient_data_list = []
-  file_extension = os.path.splitext(filename)[-1].lower()
   output_file = "patient_descriptions.txt"
-
-  # Handle files based on their type
-  if file_extension == '.csv':
-    try:
-      df = pd.read_csv(filename)
-      patient_data_list = df.to_dict(orient='records')
-    except Exception as e:
-      print(f"Error reading CSV file: {e}")
-
-  elif file_extension == '.txt':
-    try:
-      with open(filename, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-      headers = lines[0].strip().split(',')
-      for line in lines[1:]:
-        values = line.strip().split(',')
-        patient_data = dict(zip(headers, values))
-        patient_data_list.append(patient_data)
-    except Exception as e:
-      print(f"Error reading TXT file: {e}")
-
-  elif file_extension == '.json':
-    try:
-      with open(filename, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-      if isinstance(data, list):
-        patient_data_list = data
-      elif isinstance(data, dict):
-        patient_data_list = [data]
-      else:
-        raise ValueError("Invalid JSON format: Expected a list or a dictionary.")
-    except json.JSONDecodeError as e:
-      print(f"Error decoding JSON file: {e}")
-    except Exception as e:
-      print(f"Error reading JSON file: {e}")
-
-  elif file_extension in ['.xls', '.xlsx']:
-    try:
-      df = pd.read_excel(filename, sheet_name=0)
-      patient_data_list = df.to_dict(orient='records')
-    except Exception as e:
-      print(f"Error reading Excel file: {e}")
-
-  elif file_extension == '.pdf':
-    try:
-      with open(filename, 'rb') as f:
-        reader = PyPDF2.PdfReader(f)
-        text = ""
-        for page in reader.pages:
-          page_text = page.extract_text()
-          if page_text:
-            text += page_text + "\n"
-
-      lines = [line.strip() for line in text.split('\n') if line.strip()]
-      if lines:
-        headers = lines[0].split(',')
-        for line in lines[1:]:
-          values = line.split(',')
-          if len(values) == len(headers):
-            patient_data = dict(zip(headers, values))
-            patient_data_list.append(patient_data)
-    except Exception as e:
-      print(f"Error reading PDF file: {e}")
+  patient_data_list = read_patient_records(filename)
 
   # Process patient data and write to output file
   results = []
   with open(output_file, 'w', encoding='utf-8') as output:
+    parser = PatientParser()
     for idx, raw_data in enumerate(patient_data_list):
       try:
         # Parse patient data
-        patient_data = parse_patient_data(raw_data, idx + 1)
+        patient_data = parser.parse(raw_data, idx + 1)
         patient_id = patient_data['name'] if patient_data['name'] else f"Patient {idx + 1}"
         score = calculate_maggic_score(patient_data)
         risk1_year = calculate_1_year_risk(score)
@@ -0,0 +1,302 @@
+# batch_scoring.py
+# Columnar (vectorized) version of calculate_maggic_score for large cohorts.
+# The bin edges and point arrays come from the same ScoringTable the
+# per-patient functions use, so the results match them exactly.
+import numpy as np
+
+from models.file_readers import DEFAULT_CHUNKSIZE, iter_patient_chunks, patient_file_extension
+from models.instrumentation import current_metrics
+from models.maggic_core import patient_id_for
+from models.results import RiskResult
+from models.scoring_table import MAGGIC_TABLE
+
+BATCH_COLUMNS = [
+  'age', 'gender', 'nyha_class', 'lvef', 'diabetes', 'smoker', 'copd', 'sbp',
+  'creatinine', 'bmi', 'beta_blocker', 'ace_arb', 'hf_duration_less_than_18_months'
+]
+
+RISK_CATEGORIES = np.array(['Low Risk', 'Medium Risk', 'High Risk'], dtype=object)
+
+
+class _BatchArrays:
+  """NumPy views of a ScoringTable, built once per table."""
+
+  def __init__(self, table):
+    self.ef_points = np.array(table.ef_points)
+    self.age_ef_points = np.array(table.age_ef_points)
+    self.sbp_ef_points = np.array(table.sbp_ef_points)
+    self.bmi_points = np.array(table.bmi_points)
+    self.creatinine_points = np.array(table.creatinine_points)
+    self.nyha_classes = list(table.nyha_points.keys())
+    self.nyha_points = list(table.nyha_points.values())
+    self.risk1_percent = np.array(table.risk1_percent, dtype=float)
+    self.risk3_percent = np.array(table.risk3_percent, dtype=float)
+
+
+def _arrays_for(table):
+  arrays = getattr(table, '_batch_arrays', None)
+  if arrays is None:
+    arrays = table._batch_arrays = _BatchArrays(table)
+  return arrays
+
+
+def _column(data, key, dtype=float):
+  return np.asarray(data[key], dtype=dtype)
+
+
+def _flag(data, key):
+  # Same truthiness as the scalar `if value` checks
+  values = np.asarray(data[key])
+  if values.dtype.kind in 'biuf':
+    return values.astype(bool)
+  return np.array([bool(value) for value in values], dtype=bool)
+
+
+def calculate_points_batch(data, table=MAGGIC_TABLE):
+  """Return a dict of per-factor point arrays for every patient in `data`."""
+  arrays = _arrays_for(table)
+  age = _column(data, 'age')
+  ef = _column(data, 'lvef')
+  sbp = _column(data, 'sbp')
+  bmi = _column(data, 'bmi')
+  creatinine = _column(data, 'creatinine') * table.creatinine_factor  # Convert mg/dL to μmol/L
+  nyha_class = _column(data, 'nyha_class')
+  gender = np.char.lower(np.asarray(data['gender'], dtype=str))
+
+  # np.digitize sends NaN past the last edge, which is the `else` branch of
+  # every bin list, exactly as the failing comparisons do in the scalar code.
+  ef_valid = ef != 0
+  efr = np.where(ef_valid, arrays.ef_points[np.digitize(ef, table.ef_edges)], 0)
+
+  age_valid = ~((age < table.age_min) | (age > table.age_max)) & ef_valid
+  age_ef = arrays.age_ef_points[np.digitize(age, table.age_edges), np.digitize(ef, table.age_ef_edges)]
+  efar = np.where(age_valid, age_ef, 0)
+
+  sbp_valid = ~((ef < table.sbp_ef_min) | (ef > table.sbp_ef_max) | (sbp < table.sbp_min) | (sbp > table.sbp_max))
+  sbp_ef = arrays.sbp_ef_points[np.digitize(sbp, table.sbp_edges), np.digitize(ef, table.sbp_ef_edges)]
+  sbpr = np.where(sbp_valid, sbp_ef, 0)
+
+  bmi_valid = ~((bmi < table.bmi_min) | (bmi > table.bmi_max))
+  bmir = np.where(bmi_valid, arrays.bmi_points[np.digitize(bmi, table.bmi_edges)], 0)
+
+  creatinine_valid = ~((creatinine < table.creatinine_min) | (creatinine > table.creatinine_max))
+  crtnr = np.where(creatinine_valid, arrays.creatinine_points[np.digitize(creatinine, table.creatinine_edges)], 0)
+
+  points = {
+    'efr': efr,
+    'efar': efar,
+    'sbpr': sbpr,
+    'bmir': bmir,
+    'crtnr': crtnr,
+    'gender': np.where(gender == 'female', table.female_points, 0),
+    'nyha': np.select([nyha_class == c for c in arrays.nyha_classes], arrays.nyha_points, 0),
+  }
+  for name, value in table.flag_points:
+    points[name] = np.where(_flag(data, name), value, 0)
+  for name, value in table.missing_treatment_points:
+    points[name] = np.where(_flag(data, name), 0, value)
+  if table.sodium_threshold is not None:
+    points['sodium'] = np.where(_column(data, 'sodium') < table.sodium_threshold, table.sodium_points, 0)
+  return points
+
+
+def calculate_maggic_score_batch(data, table=MAGGIC_TABLE):
+  """Vectorized calculate_maggic_score; returns an int64 array of scores."""
+  points = calculate_points_batch(data, table)
+  score = np.zeros(len(points['efr']), dtype=np.int64)
+  for value in points.values():
+    score += value
+  return score
+
+
+def risk_lookup_batch(score, table):
+  """Look up a risk table by score; out-of-range scores become NaN (None in the scalar code)."""
+  score = np.asarray(score)
+  in_range = (score >= 0) & (score < len(table))
+  return np.where(in_range, table[np.clip(score, 0, len(table) - 1)], np.nan)
+
+
+def get_risk_category_code_batch(score):
+  """Index into RISK_CATEGORIES for each score."""
+  score = np.asarray(score)
+  return np.select([score <= 19, score <= 30], [0, 1], 2).astype(np.int8)
+
+
+def get_risk_category_batch(score):
+  return RISK_CATEGORIES[get_risk_category_code_batch(score)]
+
+
+def score_patients_batch(data, table=MAGGIC_TABLE):
+  """
+  Score a whole cohort at once.
+  `data` is a pandas DataFrame or a dict of equal-length arrays holding the
+  fields produced by parse_patient_data (see BATCH_COLUMNS; the Plus table
+  also needs its extra fields).
+  Returns score, risk1_year, risk3_year and category columns, as a DataFrame
+  (same index) when a DataFrame is given, otherwise as a dict of arrays.
+  """
+  arrays = _arrays_for(table)
+  score = calculate_maggic_score_batch(data, table)
+  columns = {
+    'score': score,
+    'risk1_year': risk_lookup_batch(score, arrays.risk1_percent),
+    'risk3_year': risk_lookup_batch(score, arrays.risk3_percent),
+    'category': get_risk_category_batch(score),
+  }
+
+  if hasattr(data, 'index') and hasattr(data, 'columns'):
+    import pandas as pd
+    return pd.DataFrame(columns, index=data.index)
+  return columns
+
+
+def _table_columns(table):
+  columns = list(BATCH_COLUMNS)
+  columns += [name for name, _ in table.flag_points if name not in columns]
+  if table.sodium_threshold is not None:
+    columns.append('sodium')
+  return columns
+
+
+class ResultBatch:
+  """
+  Struct-of-arrays results of a bulk run: one NumPy array per field instead
+  of one result object per patient. Out-of-range risks are NaN and the
+  category is stored as an int8 index into RISK_CATEGORIES.
+  Indexing or iterating yields RiskResult objects (without patient_data).
+  """
+  __slots__ = ('patient_id', 'score', 'risk1_year', 'risk3_year', 'category_code')
+
+  def __init__(self, patient_id, score, risk1_year, risk3_year, category_code):
+    self.patient_id = np.asarray(patient_id, dtype=object)
+    self.score = np.asarray(score, dtype=np.int64)
+    self.risk1_year = np.asarray(risk1_year, dtype=float)
+    self.risk3_year = np.asarray(risk3_year, dtype=float)
+    self.category_code = np.asarray(category_code, dtype=np.int8)
+
+  @classmethod
+  def from_records(cls, patient_ids, records, table=MAGGIC_TABLE):
+    """Score parsed patient dicts (or PatientRecords) in one vectorized pass."""
+    data = {key: [record[key] for record in records] for key in _table_columns(table)}
+    return cls.from_columns(patient_ids, data, table)
+
+  @classmethod
+  def from_columns(cls, patient_ids, data, table=MAGGIC_TABLE):
+    """Score parsed columns (a dict of equal-length arrays, see score_patients_batch) in one pass."""
+    arrays = _arrays_for(table)
+    score = calculate_maggic_score_batch(data, table)
+    return cls(
+      patient_ids,
+      score,
+      risk_lookup_batch(score, arrays.risk1_percent),
+      risk_lookup_batch(score, arrays.risk3_percent),
+      get_risk_category_code_batch(score),
+    )
+
+  @classmethod
+  def concat(cls, batches):
+    batches = list(batches)
+    if not batches:
+      return cls([], [], [], [], [])
+    return cls(*(np.concatenate([getattr(batch, name) for batch in batches]) for name in cls.__slots__))
+
+  @property
+  def category(self):
+    return RISK_CATEGORIES[self.category_code]
+
+  def __len__(self):
+    return len(self.score)
+
+  def __getitem__(self, i):
+    risk1_year = self.risk1_year[i]
+    risk3_year = self.risk3_year[i]
+    return RiskResult(
+      self.patient_id[i],
+      None,
+      int(self.score[i]),
+      None if np.isnan(risk1_year) else float(risk1_year),
+      None if np.isnan(risk3_year) else float(risk3_year),
+      RISK_CATEGORIES[self.category_code[i]],
+    )
+
+  def __iter__(self):
+    for i in range(len(self)):
+      yield self[i]
+
+  def to_records(self):
+    """Plain result dicts (NaN risks as None), e.g. for a JSON response."""
+    risk1_year = self.risk1_year.astype(object)
+    risk1_year[np.isnan(self.risk1_year)] = None
+    risk3_year = self.risk3_year.astype(object)
+    risk3_year[np.isnan(self.risk3_year)] = None
+    columns = zip(self.patient_id.tolist(), self.score.tolist(), risk1_year.tolist(), risk3_year.tolist(),
+                  self.category.tolist())
+    return [
+      {"patient_id": patient_id, "score": score, "risk1_year": risk1, "risk3_year": risk3, "category": category}
+      for patient_id, score, risk1, risk3, category in columns
+    ]
+
+  def to_dataframe(self):
+    import pandas as pd
+    return pd.DataFrame({
+      'patient_id': self.patient_id,
+      'score': self.score,
+      'risk1_year': self.risk1_year,
+      'risk3_year': self.risk3_year,
+      'category': self.category,
+    })
+
+
+def parse_records(raw_records, parse, start=0):
+  """
+  Parse raw patient records numbered from start + 1 with parse(raw_data, patient_no).
+  Returns (patient_ids, records, errors); errors lists (patient_no, message)
+  for the records that failed to parse and were skipped.
+  """
+  patient_ids = []
+  records = []
+  errors = []
+  for patient_no, raw_data in enumerate(raw_records, start + 1):
+    try:
+      patient_data = parse(raw_data, patient_no)
+    except Exception as e:
+      errors.append((patient_no, str(e)))
+      continue
+    patient_ids.append(patient_id_for(patient_data['name'], patient_no))
+    records.append(patient_data)
+  return patient_ids, records, errors
+
+
+def score_chunks_batch(chunks, parse, table=MAGGIC_TABLE):
+  """
+  Parse and score chunks of raw patient records (see
+  models.file_readers.iter_patient_chunks) into a single ResultBatch.
+  `parse` is called as parse(raw_data, patient_no), e.g. a PatientParser.
+  Patients that fail to parse are reported and skipped, as in process_patient.
+  """
+  batches = []
+  idx = 0
+  for chunk in chunks:
+    patient_ids, records, errors = parse_records(chunk, parse, idx)
+    idx += len(chunk)
+    for patient_no, message in errors:
+      print(f"Error processing patient data for Patient {patient_no}: {message}")
+    if records:
+      batches.append(ResultBatch.from_records(patient_ids, records, table))
+  return ResultBatch.concat(batches)
+
+
+def score_patient_file(filename, parse, table=MAGGIC_TABLE, chunksize=DEFAULT_CHUNKSIZE, typed_csv=True):
+  """
+  Score a patient file into a ResultBatch with `parse` (a PatientParser).
+  CSV files are read by models.typed_csv unless typed_csv=False; files it
+  cannot represent exactly are scored from their raw records instead.
+  """
+  if typed_csv and patient_file_extension(filename) == '.csv':
+    from models.typed_csv import TypedCSVUnsupported, score_csv_batch
+    try:
+      return score_csv_batch(filename, parse, table, chunksize)
+    except (TypedCSVUnsupported, OSError):
+      # The generic path reports read errors and scores what the typed reader could not
+      current_metrics().count('typed_csv_fallbacks')
+  return score_chunks_batch(iter_patient_chunks(filename, chunksize, columns=parse.uses_column), parse, table)
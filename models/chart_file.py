@@ -3,41 +3,64 @@ matplotlib.use('Agg')  # For servers without a display
 import matplotlib.pyplot as plt
 import io
 import base64
-import matplotlib.pyplot as plt
-from collections import Counter
-def generate_scatter_plot(results):
+import hashlib
+import numpy as np
+
+# Part of chart_key: bump when the drawing changes
+CHART_VERSION = '1'
+# Points are labelled with their patient number up to this many patients
+ANNOTATE_MAX_POINTS = 100
+# Above this many patients the scores are drawn as a hexbin density instead of one marker each
+SCATTER_MAX_POINTS = 5000
+
+
+def chart_scores(results):
+    """The MAGGIC scores of `results`, the only data the chart depends on."""
+    return np.array([r['score'] for r in results], dtype=np.int64)
+
+
+def chart_key(scores):
+    """Cache key of the chart of `scores`: a hash of the result set's scores."""
+    digest = hashlib.sha256(np.asarray(scores, dtype=np.int64).tobytes()).hexdigest()
+    return f"chart-{CHART_VERSION}-{digest}"
+
+
+def render_scatter_plot(scores):
     """
-    Generate a 2-in-1 figure with:
-      1) A scatter plot of MAGGIC scores vs. patient index (with point annotations).
+    Render a 2-in-1 figure as PNG bytes:
+      1) A scatter plot of MAGGIC scores vs. patient index. Points are annotated
+         for small cohorts; large ones are drawn as a hexbin density.
       2) A bar chart of how many patients fall into each risk category (Low/Medium/High).
-    Returns a base64-encoded PNG image.
     """
-
-    # 1. Extract MAGGIC scores
-    scores = [r['score'] for r in results]
+    scores = np.asarray(scores)
     # We'll treat each patient index as x = 1..N
-    indices = list(range(1, len(scores)+1))
+    indices = np.arange(1, len(scores) + 1)
 
-    # 2. Determine risk categories and count how many patients fall in each
-    low_count = sum(s < 20 for s in scores)
-    medium_count = sum(20 <= s <= 30 for s in scores)
-    high_count = sum(s > 30 for s in scores)
+    # 1. Count how many patients fall in each risk category
+    low_count = int(np.count_nonzero(scores < 20))
+    medium_count = int(np.count_nonzero((scores >= 20) & (scores <= 30)))
+    high_count = int(np.count_nonzero(scores > 30))
 
-    # 3. Create the figure with 2 subplots vertically
+    # 2. Create the figure with 2 subplots vertically
     fig, ax = plt.subplots(2, 1, figsize=(8, 10), sharex=False)
     fig.subplots_adjust(hspace=0.4)  # Increase vertical space between subplots
 
     # -- SUBPLOT 1: SCATTER PLOT --
-    ax[0].scatter(indices, scores, c='blue', alpha=0.7)
+    if len(scores) > SCATTER_MAX_POINTS:
+        density = ax[0].hexbin(indices, scores, gridsize=(80, 25), cmap='Blues', mincnt=1)
+        fig.colorbar(density, ax=ax[0], label='Patients')
+    else:
+        ax[0].scatter(indices, scores, c='blue', alpha=0.7)
     ax[0].set_title('MAGGIC Scores by Patient Number', fontsize=14)
     ax[0].set_xlabel('Patient #')
     ax[0].set_ylabel('MAGGIC Score')
     ax[0].grid(True)
 
     # Annotate each point with its patient index (1-based)
-    for i, score in enumerate(scores, start=1):
-        # Adjust the x offset (0.1) to avoid overlapping the point
-        ax[0].annotate(str(i), (i, score), (i+0.1, score), fontsize=9)
+    if len(scores) <= ANNOTATE_MAX_POINTS:
+        for i, score in enumerate(scores.tolist(), start=1):
+            # Adjust the x offset (0.1) to avoid overlapping the point
+            ax[0].annotate(str(i), (i, score), (i+0.1, score), fontsize=9)
 
     # -- SUBPLOT 2: BAR CHART OF RISK CATEGORIES --
     categories = ['Low (<20)', 'Medium (20-30)', 'High (>30)']
@@ -51,11 +74,17 @@ def generate_scatter_plot(results):
     for idx, count in enumerate(counts):
         ax[1].text(idx, count + 0.1, str(count), ha='center', va='bottom', fontsize=11)
 
-    # 4. Convert the figure to PNG and then to base64
+    # 3. Convert the figure to PNG
     png_image = io.BytesIO()
-    plt.savefig(png_image, format='png', bbox_inches='tight')
-    png_image.seek(0)
+    fig.savefig(png_image, format='png', bbox_inches='tight')
     plt.close(fig)
+    return png_image.getvalue()
+
 
-    encoded_png = base64.b64encode(png_image.getvalue()).decode('utf-8')
+def generate_scatter_plot(results):
+    """
+    Generate the 2-in-1 chart of `results` (see render_scatter_plot).
+    Returns a base64-encoded PNG image.
+    """
+    encoded_png = base64.b64encode(render_scatter_plot(chart_scores(results))).decode('utf-8')
     return f"data:image/png;base64,{encoded_png}"
@@ -0,0 +1,209 @@
+# corpus_export.py
+# Structured exports of the patient descriptions corpus (the content of
+# patient_descriptions.txt) for training: one row per patient with the
+# parsed inputs, score, risks, category, description and both messages as
+# typed columns.
+#
+#   python -m models.corpus_export patients.csv corpus.parquet
+#   python -m models.corpus_export patients.csv corpus.jsonl.gz --model maggic_plus
+#
+# JSON Lines (optionally gzip/zstd compressed) needs nothing extra.
+# Parquet and Arrow IPC (.arrow/.feather, uncompressed so it can be
+# memory-mapped with pyarrow.memory_map) need pyarrow, imported on first use.
+# Results are consumed as an iterable, so a streamed run is exported
+# without holding the cohort in memory.
+import argparse
+import json
+import math
+import sys
+from dataclasses import fields
+
+from models.description_writer import DescriptionWriter
+from models.results import PatientRecord
+
+# Rows per Parquet row group / Arrow record batch
+DEFAULT_BATCH_SIZE = 10000
+
+_FIELD_KINDS = {int: 'int', float: 'float', bool: 'bool', str: 'string', object: 'string'}
+
+# (column, kind) of every exported column, in order
+CORPUS_COLUMNS = (
+  [('patient_id', 'string')]
+  + [(field.name, _FIELD_KINDS[field.type]) for field in fields(PatientRecord)]
+  + [
+    ('score', 'int'),
+    ('risk1_year', 'float'),
+    ('risk3_year', 'float'),
+    ('category', 'string'),
+    ('detailed_description', 'string'),
+    ('patient_message', 'string'),
+    ('patient_recommendations', 'string_list'),
+    ('doctor_message', 'string'),
+    ('doctor_recommendations', 'string_list'),
+  ]
+)
+INPUT_COLUMNS = [field.name for field in fields(PatientRecord)]
+
+
+def _to_float(value):
+  value = float(value)
+  return None if math.isnan(value) else value
+
+
+_CONVERTERS = {
+  'int': int,
+  'float': _to_float,
+  'bool': bool,
+  'string': str,
+  'string_list': lambda values: [str(value) for value in values],
+}
+
+
+def corpus_row(result):
+  """
+  The typed row of one result (a result dict or LazyResult; the narrative
+  fields are built if they are pending). Missing values are None.
+  """
+  patient_data = result['patient_data']
+  patient_message, patient_recommendations = result['patient_message']
+  doctor_message, doctor_recommendations = result['doctor_message']
+  row = {'patient_id': result['patient_id']}
+  for name in INPUT_COLUMNS:
+    row[name] = patient_data.get(name) if isinstance(patient_data, dict) else patient_data[name]
+  row.update({
+    'score': result['score'],
+    'risk1_year': result['risk1_year'],
+    'risk3_year': result['risk3_year'],
+    'category': result['category'],
+    'detailed_description': result['detailed_description'],
+    'patient_message': patient_message,
+    'patient_recommendations': patient_recommendations,
+    'doctor_message': doctor_message,
+    'doctor_recommendations': doctor_recommendations,
+  })
+  for name, kind in CORPUS_COLUMNS:
+    if row[name] is not None:
+      row[name] = _CONVERTERS[kind](row[name])
+  return row
+
+
+def corpus_rows(results):
+  """The rows of `results`; a result whose narratives fail is reported and skipped."""
+  for result in results:
+    try:
+      row = corpus_row(result)
+    except Exception as e:
+      print(f"Error exporting patient data for {result['patient_id']}: {e}")
+      continue
+    yield row
+
+
+def write_jsonl(results, path, compression=None):
+  """Write one JSON object per line to `path`; returns the number of rows."""
+  n = 0
+  with DescriptionWriter(path, compression) as writer:
+    for row in corpus_rows(results):
+      writer.write(json.dumps(row, ensure_ascii=False) + '\n')
+      n += 1
+  return n
+
+
+def _import_pyarrow():
+  try:
+    import pyarrow
+  except ImportError:
+    raise ImportError("Parquet and Arrow exports need the pyarrow package (pip install pyarrow)")
+  return pyarrow
+
+
+def arrow_schema():
+  """The pyarrow schema of the corpus."""
+  pa = _import_pyarrow()
+  types = {
+    'int': pa.int64(),
+    'float': pa.float64(),
+    'bool': pa.bool_(),
+    'string': pa.string(),
+    'string_list': pa.list_(pa.string()),
+  }
+  return pa.schema([(name, types[kind]) for name, kind in CORPUS_COLUMNS])
+
+
+def iter_record_batches(results, batch_size=DEFAULT_BATCH_SIZE):
+  """pyarrow RecordBatches of up to `batch_size` rows."""
+  pa = _import_pyarrow()
+  schema = arrow_schema()
+  columns = {name: [] for name, _ in CORPUS_COLUMNS}
+  n = 0
+  for row in corpus_rows(results):
+    for name, values in columns.items():
+      values.append(row[name])
+    n += 1
+    if n == batch_size:
+      yield pa.RecordBatch.from_pydict(columns, schema=schema)
+      columns = {name: [] for name, _ in CORPUS_COLUMNS}
+      n = 0
+  if n:
+    yield pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+def write_parquet(results, path, batch_size=DEFAULT_BATCH_SIZE, compression='zstd'):
+  """Write a Parquet file with one row group per `batch_size` rows; returns the number of rows."""
+  _import_pyarrow()
+  import pyarrow.parquet as pq
+  n = 0
+  with pq.ParquetWriter(path, arrow_schema(), compression=compression) as writer:
+    for batch in iter_record_batches(results, batch_size):
+      writer.write_batch(batch)
+      n += batch.num_rows
+  return n
+
+
+def write_arrow(results, path, batch_size=DEFAULT_BATCH_SIZE):
+  """Write an uncompressed Arrow IPC file, readable with pyarrow.memory_map; returns the number of rows."""
+  pa = _import_pyarrow()
+  n = 0
+  with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, arrow_schema()) as writer:
+    for batch in iter_record_batches(results, batch_size):
+      writer.write_batch(batch)
+      n += batch.num_rows
+  return n
+
+
+def export_corpus(results, path):
+  """Write `results` in the format of the extension of `path` (.jsonl[.gz|.zst], .parquet, .arrow, .feather)."""
+  if path.endswith('.jsonl'):
+    return write_jsonl(results, path)
+  if path.endswith('.jsonl.gz'):
+    return write_jsonl(results, path, 'gzip')
+  if path.endswith('.jsonl.zst'):
+    return write_jsonl(results, path, 'zstd')
+  if path.endswith('.parquet'):
+    return write_parquet(results, path)
+  if path.endswith(('.arrow', '.feather')):
+    return write_arrow(results, path)
+  raise ValueError(f"Unsupported corpus format: {path}")
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Export the scored patients and their narratives as a training corpus.")
+  parser.add_argument('input', help="Patient file (CSV, TXT, JSON, Excel or PDF)")
+  parser.add_argument('output', help="Corpus file: .jsonl, .jsonl.gz, .jsonl.zst, .parquet, .arrow or .feather")
+  parser.add_argument('--model', choices=['maggic', 'maggic_plus'], default='maggic')
+  parser.add_argument('--chunksize', type=int, default=None, help="Rows read at a time")
+  args = parser.parse_args(argv)
+
+  if args.model == 'maggic_plus':
+    from models.maggic_risk_plus import DEFAULT_CHUNKSIZE, run_model
+  else:
+    from models.maggic_risk_model import DEFAULT_CHUNKSIZE, run_model
+
+  # Streamed with lazy narratives: nothing is written but the corpus
+  results = run_model(args.input, stream=True, chunksize=args.chunksize or DEFAULT_CHUNKSIZE, narratives='lazy')
+  n = export_corpus(results, args.output)
+  print(f"{n} patients have been exported to {args.output}")
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
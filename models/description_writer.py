@@ -0,0 +1,109 @@
+# description_writer.py
+# Buffered writers for the patient_descriptions.txt output.
+# Entries are collected in memory and written in large blocks, optionally
+# gzip or zstd compressed (zstd needs the `zstandard` package). In sharded
+# mode every parallel worker appends its chunk to its own shard file next to
+# the output, and merge_shards() concatenates the shards in chunk order once
+# all workers are done; gzip members and zstd frames can be concatenated, so
+# the merged file is a valid compressed stream as well.
+import glob
+import gzip
+import os
+import shutil
+
+# Characters buffered before they are written out
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+COMPRESSION_SUFFIXES = {
+  None: '',
+  'gzip': '.gz',
+  'zstd': '.zst',
+}
+
+
+def output_path(path, compression=None):
+  """`path` with the suffix of `compression` added, unless it is already there."""
+  if compression not in COMPRESSION_SUFFIXES:
+    raise ValueError(f"Unknown compression: {compression}")
+  suffix = COMPRESSION_SUFFIXES[compression]
+  return path if path.endswith(suffix) else path + suffix
+
+
+def open_text(path, mode='w', compression=None):
+  """Open `path` for text output ('w' or 'a'), compressed with `compression`."""
+  if compression is None:
+    return open(path, mode, encoding='utf-8')
+  if compression == 'gzip':
+    return gzip.open(path, mode + 't', encoding='utf-8')
+  if compression == 'zstd':
+    try:
+      import zstandard
+    except ImportError:
+      raise ImportError("zstd compression needs the zstandard package (pip install zstandard)")
+    return zstandard.open(path, mode + 't', encoding='utf-8')
+  raise ValueError(f"Unknown compression: {compression}")
+
+
+class DescriptionWriter:
+  """
+  Writes text entries to `path` in blocks of about `buffer_size` characters.
+  append=True opens the file for appending instead of truncating it. The
+  path is used as given; see output_path() for the compressed file name.
+  """
+
+  def __init__(self, path, compression=None, buffer_size=DEFAULT_BUFFER_SIZE, append=False):
+    self.path = path
+    self.buffer_size = buffer_size
+    self.buffer = []
+    self.buffered = 0
+    self.output = open_text(self.path, 'a' if append else 'w', compression)
+
+  def write(self, text):
+    self.buffer.append(text)
+    self.buffered += len(text)
+    if self.buffered >= self.buffer_size:
+      self.flush()
+
+  def flush(self):
+    if self.buffer:
+      self.output.write(''.join(self.buffer))
+      self.buffer = []
+      self.buffered = 0
+
+  def close(self):
+    if self.output is not None:
+      self.flush()
+      self.output.close()
+      self.output = None
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+    return False
+
+
+def shard_path(path, shard):
+  """Shard `shard` (e.g. the first row of a worker's chunk) of the output `path`."""
+  return f"{path}.part-{shard:09d}"
+
+
+def _shard_paths(path):
+  # The zero-padded shard numbers sort in chunk order
+  return sorted(glob.glob(glob.escape(path) + '.part-*'))
+
+
+def remove_shards(path):
+  """Remove the shards of `path` left over from an earlier run."""
+  for shard in _shard_paths(path):
+    os.remove(shard)
+
+
+def merge_shards(path):
+  """Concatenate the shards of `path` into it, in shard order, and remove them."""
+  with open(path, 'wb') as output:
+    for shard in _shard_paths(path):
+      with open(shard, 'rb') as f:
+        shutil.copyfileobj(f, output)
+      os.remove(shard)
@@ -0,0 +1,134 @@
+# excel_reader.py
+# Excel ingestion for models.file_readers.
+# .xlsx files are read with openpyxl in read-only mode: rows are streamed
+# from the sheet XML one at a time instead of being loaded into a
+# DataFrame, and only the projected columns are turned into record dicts.
+# Legacy .xls files still go through pandas, with the same projection.
+# Records look as pandas would produce them: empty cells are NaN, headers
+# without a name become 'Unnamed: <i>' and repeated headers '<header>.<n>'.
+# Unlike pandas, an int column with blanks keeps its ints (65, not 65.0);
+# the parsers read both the same way (see maggic_core.stringify_number).
+# Several sheets can be read at once, one worker process per sheet (started
+# with models.parallel.mp_context).
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from models.parallel import mp_context
+
+NAN = float('nan')
+
+
+def _open_workbook(source):
+  import openpyxl
+  if isinstance(source, bytes):
+    source = io.BytesIO(source)
+  # data_only: formula cells give their last computed value, as in pandas
+  return openpyxl.load_workbook(source, read_only=True, data_only=True)
+
+
+def excel_headers(cells):
+  """Column names of a header row, with pandas' names for blank and repeated headers."""
+  headers = []
+  seen = {}
+  for i, header in enumerate(cells):
+    if header is None:
+      header = f"Unnamed: {i}"
+    n = seen.get(header, 0)
+    seen[header] = n + 1
+    headers.append(header if n == 0 else f"{header}.{n}")
+  return headers
+
+
+def _projection(headers, columns):
+  # (index, header) of the kept columns. The first column is always kept:
+  # it names the patients of files without a name column.
+  return [(i, header) for i, header in enumerate(headers) if i == 0 or columns is None or columns(header)]
+
+
+def _iter_sheet_records(sheet, columns):
+  rows = sheet.iter_rows(values_only=True)
+  header_row = next(rows, None)
+  if header_row is None:
+    return
+  kept = _projection(excel_headers(header_row), columns)
+  for row in rows:
+    if all(value is None for value in row):
+      continue
+    n = len(row)
+    yield {header: (row[i] if i < n and row[i] is not None else NAN) for i, header in kept}
+
+
+def _sheet(workbook, sheet):
+  if isinstance(sheet, int):
+    return workbook.worksheets[sheet]
+  return workbook[sheet]
+
+
+def _iter_xlsx_sheet(source, sheet, columns):
+  workbook = _open_workbook(source)
+  try:
+    yield from _iter_sheet_records(_sheet(workbook, sheet), columns)
+  finally:
+    # Read-only workbooks keep the file open until closed
+    workbook.close()
+
+
+def _read_xlsx_sheet(source, sheet, columns):
+  return list(_iter_xlsx_sheet(source, sheet, columns))
+
+
+def _iter_xls_sheet(source, sheet, columns):
+  import pandas as pd
+  if isinstance(source, bytes):
+    source = io.BytesIO(source)
+  df = pd.read_excel(source, sheet_name=sheet)
+  df = df[[header for _, header in _projection(list(df.columns), columns)]]
+  yield from df.to_dict(orient='records')
+
+
+def _read_xls_sheet(source, sheet, columns):
+  return list(_iter_xls_sheet(source, sheet, columns))
+
+
+def sheet_names(source):
+  """Names of the sheets of an .xlsx workbook (a path or its bytes)."""
+  workbook = _open_workbook(source)
+  try:
+    return workbook.sheetnames
+  finally:
+    workbook.close()
+
+
+def iter_excel_records(source, xls=False, columns=None, sheets=0, workers=None):
+  """
+  Yield the raw patient records of an Excel workbook (a path or its bytes;
+  xls=True for the legacy format).
+  columns(header) selects the columns kept in each record (all of them if
+  None). `sheets` is the index or name of one sheet, a list of them, or
+  None for every sheet; the records of several sheets follow each other in
+  that order and, with workers=None or workers > 1, the sheets are read on
+  separate processes.
+  """
+  if sheets is None:
+    if xls:
+      import pandas as pd
+      with pd.ExcelFile(io.BytesIO(source) if isinstance(source, bytes) else source) as workbook:
+        sheets = workbook.sheet_names
+    else:
+      sheets = sheet_names(source)
+  elif not isinstance(sheets, (list, tuple)):
+    sheets = [sheets]
+
+  iter_sheet, read_sheet = (_iter_xls_sheet, _read_xls_sheet) if xls else (_iter_xlsx_sheet, _read_xlsx_sheet)
+  if workers is None:
+    workers = os.cpu_count() or 1
+  if workers <= 1 or len(sheets) < 2:
+    for sheet in sheets:
+      yield from iter_sheet(source, sheet, columns)
+    return
+
+  n = len(sheets)
+  with ProcessPoolExecutor(max_workers=min(workers, n), mp_context=mp_context()) as executor:
+    for records in executor.map(read_sheet, [source] * n, sheets, [columns] * n):
+      yield from records
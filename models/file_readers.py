@@ -0,0 +1,248 @@
+# file_readers.py
+# Chunked readers for the patient files accepted by the models.
+# Each reader yields lists of raw patient dicts (the same dicts that
+# process_file_and_calculate builds) so a cohort can be scored without
+# holding the whole file in memory.
+# pandas, openpyxl and PyPDF2 are imported on first use, so importing the
+# models does not pay for them until a CSV, Excel or PDF file is read.
+# Wherever a filename is accepted, a PatientFile (an open binary stream plus
+# the filename that gives its format) can be passed instead, e.g. an upload
+# held in memory by spool_upload().
+import csv
+import io
+import itertools
+import os
+import json
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+DEFAULT_CHUNKSIZE = 1000
+
+# Column delimiters of .txt files, in order of preference; see sniff_delimiter()
+TXT_DELIMITERS = [',', '\t', ';']
+
+# Uploads up to this size are kept in memory by spool_upload(); larger ones spill to a temporary file
+SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+
+class PatientFile:
+  """An open binary patient file; `filename` only selects the reader."""
+
+  def __init__(self, stream, filename):
+    self.stream = stream
+    self.filename = filename
+
+  def close(self):
+    self.stream.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+    return False
+
+
+def spool_upload(stream, filename, max_size=SPOOL_MAX_SIZE):
+  """
+  Copy an uploaded stream into a PatientFile that stays in memory up to
+  `max_size` bytes and spills to an anonymous temporary file beyond that,
+  so it outlives the request without a named file on disk.
+  """
+  spool = tempfile.SpooledTemporaryFile(max_size=max_size)
+  shutil.copyfileobj(stream, spool)
+  spool.seek(0)
+  return PatientFile(spool, filename)
+
+
+def _source_path(source):
+  return source.filename if isinstance(source, PatientFile) else source
+
+
+def _pandas_source(source):
+  if isinstance(source, PatientFile):
+    source.stream.seek(0)
+    return source.stream
+  return source
+
+
+@contextmanager
+def _open_text(source):
+  if not isinstance(source, PatientFile):
+    with open(source, 'r', encoding='utf-8') as f:
+      yield f
+    return
+  source.stream.seek(0)
+  f = io.TextIOWrapper(source.stream, encoding='utf-8')
+  try:
+    yield f
+  finally:
+    # Leave the stream open for the owner of the PatientFile
+    f.detach()
+
+
+def _chunked(records, chunksize):
+  if chunksize is None:
+    yield list(records)
+    return
+  chunk = []
+  for record in records:
+    chunk.append(record)
+    if len(chunk) >= chunksize:
+      yield chunk
+      chunk = []
+  if chunk:
+    yield chunk
+
+
+def _iter_csv(filename, chunksize):
+  import pandas as pd
+  if chunksize is None:
+    yield pd.read_csv(_pandas_source(filename)).to_dict(orient='records')
+    return
+  for df in pd.read_csv(_pandas_source(filename), chunksize=chunksize):
+    yield df.to_dict(orient='records')
+
+
+def csv_headers(filename):
+  """Column names of a CSV file, as pandas names them (e.g. 'Unnamed: 2', repeated names numbered)."""
+  import pandas as pd
+  return list(pd.read_csv(_pandas_source(filename), nrows=0).columns)
+
+
+def iter_csv_frames(filename, chunksize=DEFAULT_CHUNKSIZE, usecols=None, dtype=None):
+  """
+  Yield a CSV file as DataFrames of at most `chunksize` rows (chunksize=None
+  yields one), keeping the `usecols` columns with the declared `dtype`s.
+  Unlike iter_patient_chunks, read errors are raised.
+  """
+  import pandas as pd
+  if chunksize is None:
+    yield pd.read_csv(_pandas_source(filename), usecols=usecols, dtype=dtype)
+    return
+  yield from pd.read_csv(_pandas_source(filename), usecols=usecols, dtype=dtype, chunksize=chunksize)
+
+
+def sniff_delimiter(header_line):
+  """
+  Delimiter of a delimited text file, from its header line: the most
+  frequent of TXT_DELIMITERS outside quotes (the first one on a tie), or
+  None for whitespace-separated columns.
+  """
+  counts = dict.fromkeys(TXT_DELIMITERS, 0)
+  quoted = False
+  for char in header_line:
+    if char == '"':
+      quoted = not quoted
+    elif not quoted and char in counts:
+      counts[char] += 1
+  delimiter = max(TXT_DELIMITERS, key=counts.get)
+  return delimiter if counts[delimiter] else None
+
+
+def _txt_reader(lines, delimiter):
+  if delimiter is None:
+    # Runs of spaces or tabs separate the columns
+    return csv.reader((' '.join(line.split()) for line in lines), delimiter=' ')
+  return csv.reader(lines, delimiter=delimiter)
+
+
+def _iter_txt_records(filename):
+  # Every line is stripped, as the values of the plain split(',') reader
+  # were. Quoted fields may contain the delimiter; blank lines are skipped.
+  with _open_text(filename) as f:
+    header_line = f.readline()
+    if not header_line.strip():
+      return
+    delimiter = sniff_delimiter(header_line)
+    rows = _txt_reader((line.strip() for line in itertools.chain([header_line], f)), delimiter)
+    headers = next(rows)
+    for values in rows:
+      if values:
+        yield dict(zip(headers, values))
+
+
+def _iter_json_records(filename):
+  # The json module has no incremental parser, so the document is loaded
+  # once and handed out in chunks.
+  with _open_text(filename) as f:
+    data = json.load(f)
+  if isinstance(data, list):
+    yield from data
+  elif isinstance(data, dict):
+    yield data
+  else:
+    raise ValueError("Invalid JSON format: Expected a list or a dictionary.")
+
+
+def _iter_excel_records(filename, file_extension, columns, sheets):
+  from models.excel_reader import iter_excel_records
+  if isinstance(filename, PatientFile):
+    # Sheet workers each need their own copy of the workbook
+    filename.stream.seek(0)
+    filename = filename.stream.read()
+  yield from iter_excel_records(filename, file_extension == '.xls', columns, sheets)
+
+
+def _iter_pdf_records(filename):
+  from models.pdf_reader import iter_pdf_records
+  if isinstance(filename, PatientFile):
+    # The extraction workers each need their own copy of the document
+    filename.stream.seek(0)
+    yield from iter_pdf_records(filename.stream.read())
+  else:
+    yield from iter_pdf_records(filename)
+
+
+def _iter_chunks(filename, file_extension, chunksize, columns, sheets):
+  if file_extension == '.csv':
+    yield from _iter_csv(filename, chunksize)
+  elif file_extension == '.txt':
+    yield from _chunked(_iter_txt_records(filename), chunksize)
+  elif file_extension == '.json':
+    yield from _chunked(_iter_json_records(filename), chunksize)
+  elif file_extension in ['.xls', '.xlsx']:
+    yield from _chunked(_iter_excel_records(filename, file_extension, columns, sheets), chunksize)
+  elif file_extension == '.pdf':
+    yield from _chunked(_iter_pdf_records(filename), chunksize)
+  else:
+    print(f"Unsupported file format: {file_extension}")
+
+
+def patient_file_extension(filename):
+  """The lower-case extension (e.g. '.csv') that selects the reader of `filename`."""
+  return os.path.splitext(_source_path(filename))[-1].lower()
+
+
+def iter_patient_chunks(filename, chunksize=DEFAULT_CHUNKSIZE, columns=None, sheets=0):
+  """
+  Yield the raw patient records of `filename` in lists of at most `chunksize`
+  (chunksize=None yields the whole file as a single list).
+  CSV, TXT (comma, tab, semicolon or whitespace separated, with quoting),
+  PDF and .xlsx files are read incrementally; JSON and .xls files
+  are parsed once and then handed out chunk by chunk.
+  columns(header), e.g. PatientParser.uses_column, lets Excel files skip the
+  columns nobody reads (the first column is always kept). `sheets` selects
+  the Excel sheets (see models.excel_reader.iter_excel_records).
+  A read error ends the stream after the chunks already produced.
+  """
+  file_extension = patient_file_extension(filename)
+  try:
+    yield from _iter_chunks(filename, file_extension, chunksize, columns, sheets)
+  except Exception as e:
+    print(f"Error reading {file_extension.lstrip('.').upper()} file: {e}")
+
+
+def iter_patient_records(filename, chunksize=DEFAULT_CHUNKSIZE, columns=None, sheets=0):
+  """Yield the raw patient records of `filename` one at a time."""
+  for chunk in iter_patient_chunks(filename, chunksize, columns, sheets):
+    yield from chunk
+
+
+def read_patient_records(filename, columns=None, sheets=0):
+  """Read every raw patient record of `filename` into a list."""
+  records = []
+  for chunk in iter_patient_chunks(filename, None, columns, sheets):
+    records.extend(chunk)
+  return records
@@ -0,0 +1,180 @@
+# instrumentation.py
+# Opt-in per-stage timings and counters.
+# Nothing is recorded until a sink is added (add_sink / configure): without
+# one, instrument() hands out a shared no-op object and current_metrics()
+# returns it as well, so the hooks in the models cost a function call.
+#
+#   with instrument('upload', model='maggic') as metrics:
+#     with metrics.stage('save'):
+#       ...
+#     metrics.count('rows_parsed', n)
+#
+# Each finished run is passed to every sink as a dict:
+#   {'name', 'tags', 'total', 'stages': {stage: seconds}, 'counters': {...}}
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class Metrics:
+  """Stage timings (seconds, summed per stage) and counters of one run."""
+
+  def __init__(self, name, tags=None):
+    self.name = name
+    self.tags = tags or {}
+    self.stages = {}
+    self.counters = {}
+    self.total = None
+
+  @contextmanager
+  def stage(self, name):
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+  def count(self, name, n=1):
+    self.counters[name] = self.counters.get(name, 0) + n
+
+  def to_dict(self):
+    return {
+      'name': self.name,
+      'tags': self.tags,
+      'total': self.total,
+      'stages': dict(self.stages),
+      'counters': dict(self.counters),
+    }
+
+
+class _NullStage:
+  def __enter__(self):
+    return None
+
+  def __exit__(self, *exc_info):
+    return False
+
+
+class _NullMetrics:
+  """Stand-in used while instrumentation is disabled."""
+  _stage = _NullStage()
+
+  def stage(self, name):
+    return self._stage
+
+  def count(self, name, n=1):
+    pass
+
+
+NULL_METRICS = _NullMetrics()
+
+_current = ContextVar('maggic_metrics', default=NULL_METRICS)
+_sinks = []
+
+
+def current_metrics():
+  """The Metrics of the run in progress, or NULL_METRICS."""
+  return _current.get()
+
+
+def enabled():
+  return bool(_sinks)
+
+
+@contextmanager
+def instrument(name, **tags):
+  """Record one run (e.g. one request); emitted to the sinks when the block exits."""
+  if not _sinks:
+    yield NULL_METRICS
+    return
+
+  metrics = Metrics(name, tags)
+  token = _current.set(metrics)
+  start = time.perf_counter()
+  try:
+    yield metrics
+  finally:
+    metrics.total = time.perf_counter() - start
+    _current.reset(token)
+    record = metrics.to_dict()
+    for sink in list(_sinks):
+      try:
+        sink.emit(record)
+      except Exception as e:
+        print(f"Error writing metrics to {type(sink).__name__}: {e}")
+
+
+class LogSink:
+  """One line per run, printed or sent to `logger`."""
+
+  def __init__(self, logger=None, level=logging.INFO):
+    self.logger = logger
+    self.level = level
+
+  def emit(self, record):
+    stages = ' '.join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in record['stages'].items())
+    counters = ' '.join(f"{name}={value}" for name, value in record['counters'].items())
+    line = f"[metrics] {record['name']} total={record['total'] * 1000:.1f}ms {stages} {counters}".rstrip()
+    if self.logger is None:
+      print(line)
+    else:
+      self.logger.log(self.level, line)
+
+
+class JsonFileSink:
+  """Appends one JSON object per run to `path` (JSON Lines)."""
+
+  def __init__(self, path):
+    self.path = path
+    self.lock = threading.Lock()
+
+  def emit(self, record):
+    line = json.dumps(record) + '\n'
+    with self.lock, open(self.path, 'a', encoding='utf-8') as f:
+      f.write(line)
+
+
+class MemorySink:
+  """Keeps the last `maxlen` runs in memory, e.g. for a status page or tests."""
+
+  def __init__(self, maxlen=1000):
+    self.records = deque(maxlen=maxlen)
+
+  def emit(self, record):
+    self.records.append(record)
+
+
+def add_sink(sink):
+  _sinks.append(sink)
+  return sink
+
+
+def remove_sink(sink):
+  if sink in _sinks:
+    _sinks.remove(sink)
+
+
+def clear_sinks():
+  _sinks.clear()
+
+
+def configure(spec):
+  """
+  Add a sink from a short spec, e.g. the MAGGIC_METRICS environment variable:
+  'log', 'memory' or 'json:<path>'. An empty spec leaves instrumentation off.
+  Returns the sink (or None).
+  """
+  if not spec:
+    return None
+  if spec == 'log':
+    return add_sink(LogSink())
+  if spec == 'memory':
+    return add_sink(MemorySink())
+  if spec.startswith('json:'):
+    return add_sink(JsonFileSink(spec[len('json:'):]))
+  print(f"Unknown metrics sink: {spec}")
+  return None
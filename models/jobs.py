@@ -0,0 +1,124 @@
+# jobs.py
+# In-process background jobs for the web apps.
+# An upload is spooled (see models.file_readers.spool_upload: in memory, or
+# an anonymous temporary file once it is large), submitted as a job and the
+# request returns at once; a small thread pool runs the model on the spooled
+# file and the client polls the job for its status, progress and, once
+# done, its result. Jobs live in memory, so they are lost on restart;
+# finished jobs are dropped after `ttl` seconds or when more than
+# `max_jobs` are kept.
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Job:
+  """State of one submitted job; `meta` holds caller data such as the selected model."""
+
+  def __init__(self, job_id, meta=None):
+    self.id = job_id
+    self.meta = meta or {}
+    self.status = QUEUED
+    self.processed = 0
+    self.total = None
+    self.result = None
+    self.error = None
+    self.created = time.time()
+    self.started = None
+    self.finished = None
+
+  @property
+  def progress(self):
+    """Fraction of the rows processed, or None while the row count is unknown."""
+    if self.status == DONE:
+      return 1.0
+    if not self.total:
+      return None
+    return self.processed / self.total
+
+  def report_progress(self, processed, total):
+    self.processed = processed
+    self.total = total
+
+  def to_dict(self):
+    return {
+      'id': self.id,
+      'status': self.status,
+      'progress': self.progress,
+      'processed': self.processed,
+      'total': self.total,
+      'error': self.error,
+      'created': self.created,
+      'started': self.started,
+      'finished': self.finished,
+    }
+
+
+class JobQueue:
+  """Runs submitted functions on a thread pool and keeps their Job state."""
+
+  def __init__(self, max_workers=2, max_jobs=100, ttl=3600):
+    self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='maggic-job')
+    self.max_jobs = max_jobs
+    self.ttl = ttl
+    self.jobs = OrderedDict()
+    self.lock = threading.Lock()
+
+  def submit(self, func, *args, meta=None, **kwargs):
+    """
+    Queue func(*args, progress=job.report_progress, **kwargs) and return its Job.
+    The return value of `func` becomes job.result.
+    """
+    job = Job(uuid.uuid4().hex, meta)
+    with self.lock:
+      self._evict()
+      self.jobs[job.id] = job
+    self.executor.submit(self._run, job, func, args, kwargs)
+    return job
+
+  def complete(self, result, meta=None):
+    """Register an already finished job (e.g. a cached result) and return it."""
+    job = Job(uuid.uuid4().hex, meta)
+    job.result = result
+    job.status = DONE
+    job.started = job.finished = time.time()
+    with self.lock:
+      self._evict()
+      self.jobs[job.id] = job
+    return job
+
+  def get(self, job_id):
+    with self.lock:
+      return self.jobs.get(job_id)
+
+  def _run(self, job, func, args, kwargs):
+    job.status = RUNNING
+    job.started = time.time()
+    try:
+      job.result = func(*args, progress=job.report_progress, **kwargs)
+      job.status = DONE
+    except Exception as e:
+      print(f"Error running job {job.id}: {e}")
+      job.error = str(e)
+      job.status = FAILED
+    finally:
+      job.finished = time.time()
+
+  def _evict(self):
+    # Only finished jobs are dropped; queued and running ones are always kept
+    now = time.time()
+    finished = [job for job in self.jobs.values() if job.finished is not None]
+    for job in finished:
+      if now - job.finished > self.ttl:
+        del self.jobs[job.id]
+    for job in finished:
+      if len(self.jobs) < self.max_jobs:
+        break
+      self.jobs.pop(job.id, None)
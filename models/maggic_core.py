@@ -0,0 +1,337 @@
+# maggic_core.py
+# Shared MAGGIC core used by every model and entry point: patient parsing,
+# point functions, risk lookups and risk categories.
+# Only the standard library is needed here; pandas and PyPDF2 are imported
+# by models.file_readers when a file of that type is actually read.
+from models.scoring_table import MAGGIC_TABLE
+
+NYHA_CLASS_MAP = {'I': 1, 'II': 2, 'III': 3, 'IV': 4}
+NAME_KEYS = ['Name', 'name', 'Patient Name', 'PatientName']
+
+# Accepted column names of each parsed field, in order of preference.
+# Headers are matched ignoring case and whitespace (see normalize_header).
+FIELD_ALIASES = {
+  'name': NAME_KEYS,
+  'age': ['age', 'Age'],
+  'gender': ['gender', 'Gender'],
+  'nyha_class': ['nyha_class', 'NYHA Class'],
+  'lvef': ['lvef', 'LVEF'],
+  'diabetes': ['diabetes', 'Diabetes'],
+  'smoker': ['smoker', 'Smoker'],
+  'copd': ['copd', 'COPD'],
+  'sbp': ['sbp', 'SBP'],
+  'creatinine': ['creatinine', 'Creatinine'],
+  'bmi': ['bmi', 'BMI'],
+  'beta_blocker': ['beta_blocker', 'Beta Blocker'],
+  'ace_arb': ['ace_arb', 'ACE_ARB', 'ACE Inhibitors or ARBs'],
+  'hf_duration_less_than_18_months': ['hf_duration_less_than_18_months', 'HF Duration <18 months'],
+}
+
+
+def normalize_header(header):
+  return ''.join(str(header).split()).lower()
+
+
+def stringify_number(value):
+  """
+  Text of a numeric cell. Integral floats are written without the '.0':
+  pandas reads an int column with blanks as floats (65.0), openpyxl and
+  JSON give 65, and both must parse as the int 65.
+  """
+  if isinstance(value, float) and value.is_integer():
+    return str(int(value))
+  return str(value)
+
+
+class HeaderPlan:
+  """
+  Field -> column mapping for one set of headers, resolved once.
+  `columns` maps every field found to its header; `missing` lists the
+  fields with no matching column.
+  """
+
+  def __init__(self, headers, field_aliases=FIELD_ALIASES):
+    headers = list(headers)
+    self.headers = frozenset(headers)
+    self.first_column = headers[0] if headers else None
+
+    normalized = {}
+    for header in headers:
+      normalized.setdefault(normalize_header(header), header)
+
+    self.columns = {}
+    for field, aliases in field_aliases.items():
+      for alias in aliases:
+        header = normalized.get(normalize_header(alias))
+        if header is not None:
+          self.columns[field] = header
+          break
+    self.missing = [field for field in field_aliases if field not in self.columns]
+
+  def value_getter(self, patient_data, stringify_numbers=False):
+    """
+    Return get_value(field, default) for one record.
+    With stringify_numbers, int/float cells (as pandas produces them) are
+    returned as strings (see stringify_number) so that .strip() works on
+    every field.
+    """
+    columns = self.columns
+
+    def get_value(field, default):
+      column = columns.get(field)
+      if column is None or column not in patient_data:
+        return default
+      value = patient_data[column]
+      if stringify_numbers and isinstance(value, (int, float)):
+        return stringify_number(value)
+      return value
+
+    return get_value
+
+
+def make_value_getter(patient_data, stringify_numbers=False, field_aliases=FIELD_ALIASES):
+  """get_value(field, default) for a single record; files should use a PatientParser."""
+  return HeaderPlan(patient_data.keys(), field_aliases).value_getter(patient_data, stringify_numbers)
+
+
+def parse_yes_no(value):
+  return value.strip().lower() == 'yes'
+
+
+def parse_clinical_values(get_value, parsed_data):
+  """Fill `parsed_data` with the MAGGIC input fields; invalid numbers fall back to defaults."""
+  try:
+    parsed_data['age'] = int(get_value('age', 0))
+  except ValueError:
+    parsed_data['age'] = 0
+
+  gender = get_value('gender', 'male').strip().lower()
+  parsed_data['gender'] = gender if gender in ['male', 'female'] else 'male'
+
+  nyha_str = get_value('nyha_class', 'I').strip().upper()
+  parsed_data['nyha_class'] = NYHA_CLASS_MAP.get(nyha_str, 1)
+
+  try:
+    parsed_data['lvef'] = float(get_value('lvef', 30))
+  except ValueError:
+    parsed_data['lvef'] = 30.0
+
+  parsed_data['diabetes'] = parse_yes_no(get_value('diabetes', 'no'))
+  parsed_data['smoker'] = parse_yes_no(get_value('smoker', 'no'))
+  parsed_data['copd'] = parse_yes_no(get_value('copd', 'no'))
+
+  try:
+    parsed_data['sbp'] = int(get_value('sbp', 120))
+  except ValueError:
+    parsed_data['sbp'] = 120
+
+  try:
+    parsed_data['creatinine'] = float(get_value('creatinine', 1.0))
+  except ValueError:
+    parsed_data['creatinine'] = 1.0
+
+  try:
+    parsed_data['bmi'] = float(get_value('bmi', 24))
+  except ValueError:
+    parsed_data['bmi'] = 24.0
+
+  parsed_data['beta_blocker'] = parse_yes_no(get_value('beta_blocker', 'no'))
+  parsed_data['ace_arb'] = parse_yes_no(get_value('ace_arb', 'no'))
+  parsed_data['hf_duration_less_than_18_months'] = parse_yes_no(get_value('hf_duration_less_than_18_months', 'no'))
+
+  return parsed_data
+
+
+class PatientParser:
+  """
+  Parser for the records of one file.
+  Column aliases are resolved into a HeaderPlan once per distinct set of
+  headers rather than once per row, and each warning is printed once per
+  parser instead of once per patient (quiet=True only keeps them in
+  `warnings`). With name_fallback=False a record without a name is left
+  unnamed instead of being named by its first column. Subclasses add fields
+  by extending FIELD_ALIASES and overriding parse_fields.
+  """
+  field_aliases = FIELD_ALIASES
+
+  def __init__(self, stringify_numbers=False, name_fallback=True, quiet=False):
+    self.stringify_numbers = stringify_numbers
+    self.name_fallback = name_fallback
+    self.quiet = quiet
+    self.plan = None
+    self.plans = {}
+    self.warned = set()
+    self.warnings = []
+    self.alias_headers = frozenset(
+      normalize_header(alias) for aliases in self.field_aliases.values() for alias in aliases)
+
+  def uses_column(self, header):
+    """Whether a column named `header` can feed a parsed field; readers may drop the others."""
+    return normalize_header(header) in self.alias_headers
+
+  def warn_once(self, key, message):
+    if key not in self.warned:
+      self.warned.add(key)
+      self.warnings.append(message)
+      if not self.quiet:
+        print(message)
+
+  def warn_name_fallback(self, first_key):
+    self.warn_once(('name', first_key),
+                   f"Warning: 'name' field not found. Using first column '{first_key}' as patient name.")
+
+  def plan_for(self, patient_data):
+    plan = self.plan
+    if plan is not None and patient_data.keys() == plan.headers:
+      return plan
+    headers = frozenset(patient_data.keys())
+    plan = self.plans.get(headers)
+    if plan is None:
+      plan = self.plans[headers] = HeaderPlan(patient_data.keys(), self.field_aliases)
+      missing = [field for field in plan.missing if field != 'name']
+      if missing:
+        self.warn_once(('missing', headers), f"Warning: columns not found, using defaults for: {', '.join(missing)}.")
+    self.plan = plan
+    return plan
+
+  def parse_fields(self, get_value, parsed_data):
+    return parse_clinical_values(get_value, parsed_data)
+
+  def parse(self, patient_data, default_patient_no=None):
+    """Parse one raw patient record (a dict keyed by column name) into model inputs."""
+    plan = self.plan_for(patient_data)
+    get_value = plan.value_getter(patient_data, self.stringify_numbers)
+
+    name = get_value('name', None)
+    raw_name = patient_data.get(plan.columns.get('name'))
+    if isinstance(raw_name, float) and raw_name != raw_name:
+      # A blank name cell, not the string 'nan' stringify_numbers makes of it
+      name = raw_name
+    if not name and self.name_fallback:
+      # Fallback: Extract the first column's value
+      first_key = plan.first_column
+      name = patient_data[first_key]
+      self.warn_name_fallback(first_key)
+
+    parsed_data = {'name': name}
+    return self.parse_fields(get_value, parsed_data)
+
+  __call__ = parse
+
+
+def parse_clinical_fields(patient_data, parsed_data=None, stringify_numbers=False):
+  """Parse the MAGGIC input fields of a single raw record."""
+  if parsed_data is None:
+    parsed_data = {}
+  return parse_clinical_values(make_value_getter(patient_data, stringify_numbers), parsed_data)
+
+
+def parse_patient_data(patient_data, default_patient_no=None, stringify_numbers=False):
+  """Parse a single raw patient record; use one PatientParser per file for many records."""
+  return PatientParser(stringify_numbers).parse(patient_data, default_patient_no)
+
+
+def patient_id_for(name, patient_no):
+  """Id of a parsed patient: its name, or "Patient <n>" without one (empty, None or a NaN cell)."""
+  if not name or name != name:
+    return f"Patient {patient_no}"
+  return name
+
+
+def classify_bmi(bmi):
+  """BMI category, or None between the bands (e.g. 24.95) or for a missing BMI."""
+  if bmi < 18.5:
+    return "Underweight"
+  elif 18.5 <= bmi <= 24.9:
+    return "Normal"
+  elif 25 <= bmi <= 29.9:
+    return "Overweight"
+  elif bmi >= 30:
+    return "Obesity"
+  return None
+
+
+def check_narrative_inputs(patient_data):
+  """
+  Raise ValueError for a patient the narratives cannot describe (a BMI with
+  no category); returns the BMI category otherwise.
+  """
+  bmi_category = classify_bmi(patient_data['bmi'])
+  if bmi_category is None:
+    raise ValueError(f"BMI {patient_data['bmi']} does not fall into a BMI category")
+  return bmi_category
+
+
+def calculate_efr(ef):
+  return MAGGIC_TABLE.efr(ef)
+
+
+def calculate_efar(age, ef, _efr):
+  return MAGGIC_TABLE.efar(age, ef, _efr)
+
+
+def calculate_sbpr(sbp, ef):
+  return MAGGIC_TABLE.sbpr(sbp, ef)
+
+
+def calculate_bmir(bmi):
+  return MAGGIC_TABLE.bmir(bmi)
+
+
+def calculate_crtnr(creatinine):
+  return MAGGIC_TABLE.crtnr(creatinine)
+
+
+def calculate_gender_points(gender):
+  return MAGGIC_TABLE.gender(gender)
+
+
+def calculate_nyha_points(nyha_class):
+  return MAGGIC_TABLE.nyha(nyha_class)
+
+
+def calculate_smoker_points(smoker):
+  return MAGGIC_TABLE.flag('smoker', smoker)
+
+
+def calculate_diabetes_points(diabetes):
+  return MAGGIC_TABLE.flag('diabetes', diabetes)
+
+
+def calculate_copd_points(copd):
+  return MAGGIC_TABLE.flag('copd', copd)
+
+
+def calculate_hf_points(hf_duration_less_than_18_months):
+  return MAGGIC_TABLE.flag('hf_duration_less_than_18_months', hf_duration_less_than_18_months)
+
+
+def calculate_blocker_points(beta_blocker):
+  return MAGGIC_TABLE.missing_treatment('beta_blocker', beta_blocker)
+
+
+def calculate_acei_points(acei_arb):
+  return MAGGIC_TABLE.missing_treatment('ace_arb', acei_arb)
+
+
+def calculate_maggic_score(patient_data, table=MAGGIC_TABLE):
+  # Point lookups come from the shared, precompiled scoring table
+  return table.score(patient_data)
+
+
+def calculate_1_year_risk(score, table=MAGGIC_TABLE):
+  return table.risk1_year(score)
+
+
+def calculate_3_year_risk(score, table=MAGGIC_TABLE):
+  return table.risk3_year(score)
+
+
+def get_risk_category(score, low_max=19):
+  """Low up to `low_max` (19 in the models, 20 in the older scripts), Medium up to 30."""
+  if score <= low_max:
+    return 'Low Risk'
+  elif score <= 30:
+    return 'Medium Risk'
+  else:
+    return 'High Risk'
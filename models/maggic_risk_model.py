@@ -1,334 +1,43 @@
 # maggic_model.py
 import os
-import json
-import pandas as pd
-import PyPDF2
-
-def parse_patient_data(patient_data, default_patient_no):
-  parsed_data = {}
-
-  # Handle possible different key names with case insensitivity
-  def get_value(keys, default):
-    for key in keys:
-      if key in patient_data:
-        return patient_data[key]
-    return default
-
-  name = get_value(['Name', 'name', 'Patient Name', 'PatientName'], None)
-  if not name:
-    # Fallback: Extract the first column's value
-    first_key = list(patient_data.keys())[0]
-    name = patient_data[first_key]
-    print(f"Warning: 'name' field not found. Using first column '{first_key}' value '{name}' as patient name.")
-
-  parsed_data['name'] = name
-
-  try:
-    parsed_data['age'] = int(get_value(['age', 'Age'], 0))
-  except ValueError:
-    parsed_data['age'] = 0
-
-  gender = get_value(['gender', 'Gender'], 'male').strip().lower()
-  parsed_data['gender'] = gender if gender in ['male', 'female'] else 'male'
-
-  nyha_str = get_value(['nyha_class', 'NYHA Class'], 'I').strip().upper()
-  nyha_class_map = {'I': 1, 'II': 2, 'III': 3, 'IV': 4}
-  parsed_data['nyha_class'] = nyha_class_map.get(nyha_str, 1)
-
-  try:
-    parsed_data['lvef'] = float(get_value(['lvef', 'LVEF'], 30))
-  except ValueError:
-    parsed_data['lvef'] = 30.0
-
-  parsed_data['diabetes'] = get_value(['diabetes', 'Diabetes'], 'no').strip().lower() == 'yes'
-  parsed_data['smoker'] = get_value(['smoker', 'Smoker'], 'no').strip().lower() == 'yes'
-  parsed_data['copd'] = get_value(['copd', 'COPD'], 'no').strip().lower() == 'yes'
-
-  try:
-    parsed_data['sbp'] = int(get_value(['sbp', 'SBP'], 120))
-  except ValueError:
-    parsed_data['sbp'] = 120
-
-  try:
-    parsed_data['creatinine'] = float(get_value(['creatinine', 'Creatinine'], 1.0))
-  except ValueError:
-    parsed_data['creatinine'] = 1.0
-
-  try:
-    parsed_data['bmi'] = float(get_value(['bmi', 'BMI'], 24))
-  except ValueError:
-    parsed_data['bmi'] = 24.0
-
-  parsed_data['beta_blocker'] = get_value(['beta_blocker', 'Beta Blocker'], 'no').strip().lower() == 'yes'
-  parsed_data['ace_arb'] = get_value(['ace_arb', 'ACE_ARB', 'ACE Inhibitors or ARBs'], 'no').strip().lower() == 'yes'
-  parsed_data['hf_duration_less_than_18_months'] = get_value(
-    ['hf_duration_less_than_18_months', 'HF Duration <18 months'], 'no').strip().lower() == 'yes'
-
-  return parsed_data
-
-
-def calculate_efr(ef):
-  if ef == 0 or ef is None:
-    return None
-  elif ef < 20:
-    return 7
-  elif ef < 25:
-    return 6
-  elif ef < 30:
-    return 5
-  elif ef < 35:
-    return 3
-  elif ef < 40:
-    return 2
-  else:
-    return 0
-
-
-def calculate_efar(age, ef, _efr):
-  if age < 18 or age > 110 or age is None:
-    return None
-  elif _efr is not None:
-    if age < 55:
-      return 0
-    elif age < 60:
-      if ef < 30:
-        return 1
-      elif ef < 40:
-        return 2
-      else:
-        return 3
-    elif age < 65:
-      if ef < 30:
-        return 2
-      elif ef < 40:
-        return 4
-      else:
-        return 5
-    elif age < 70:
-      if ef < 30:
-        return 4
-      elif ef < 40:
-        return 6
-      else:
-        return 7
-    elif age < 75:
-      if ef < 30:
-        return 6
-      elif ef < 40:
-        return 8
-      else:
-        return 9
-    elif age < 80:
-      if ef < 30:
-        return 8
-      elif ef < 40:
-        return 10
-      else:
-        return 12
-    else:
-      if ef < 30:
-        return 10
-      elif ef < 40:
-        return 13
-      else:
-        return 15
-  else:
-    return None
-
-
-def calculate_sbpr(sbp, ef):
-  if ef < 1 or ef > 95 or sbp < 50 or sbp > 250:
-    return None
-  else:
-    if sbp < 110:
-      if ef < 30:
-        return 5
-      elif ef < 40:
-        return 3
-      else:
-        return 2
-    elif sbp < 120:
-      if ef < 30:
-        return 4
-      elif ef < 40:
-        return 2
-      else:
-        return 1
-    elif sbp < 130:
-      if ef < 30:
-        return 3
-      elif ef < 40:
-        return 1
-      else:
-        return 1
-    elif sbp < 140:
-      if ef < 30:
-        return 2
-      elif ef < 40:
-        return 1
-      else:
-        return 0
-    elif sbp < 150:
-      if ef < 30:
-        return 1
-      else:
-        return 0
-    else:
-      return 0
-
-
-def calculate_bmir(bmi):
-  if bmi < 10 or bmi > 50:
-    return None
-  else:
-    if bmi < 15:
-      return 6
-    elif bmi < 20:
-      return 5
-    elif bmi < 25:
-      return 3
-    elif bmi < 30:
-      return 2
-    else:
-      return 0
-
-
-def calculate_crtnr(creatinine):
-  if creatinine < 20 or creatinine > 1400:
-    return None
-  else:
-    if creatinine < 90:
-      return 0
-    elif creatinine < 110:
-      return 1
-    elif creatinine < 130:
-      return 2
-    elif creatinine < 150:
-      return 3
-    elif creatinine < 170:
-      return 4
-    elif creatinine < 210:
-      return 5
-    elif creatinine < 250:
-      return 6
-    else:
-      return 8
-
-
-def calculate_gender_points(gender):
-  if gender.lower() == 'female':
-    return -3
-  else:
-    return 0
-
-
-def calculate_nyha_points(nyha_class):
-  nyha_points = {1: 0, 2: 3, 3: 6, 4: 8}
-  return nyha_points.get(nyha_class, 0)
-
-
-def calculate_smoker_points(smoker):
-  return 1 if smoker else 0
-
-
-def calculate_diabetes_points(diabetes):
-  return 3 if diabetes else 0
-
-
-def calculate_copd_points(copd):
-  return 2 if copd else 0
-
-
-def calculate_hf_points(hf_duration_less_than_18_months):
-  return 2 if hf_duration_less_than_18_months else 0
-
-
-def calculate_blocker_points(beta_blocker):
-  return 5 if not beta_blocker else 0
-
-
-def calculate_acei_points(acei_arb):
-  return 3 if not acei_arb else 0
-
-
-def calculate_maggic_score(patient_data):
-  age = patient_data['age']
-  lvef = patient_data['lvef']
-  ef = lvef  # For consistency with TypeScript code
-  sbp = patient_data['sbp']
-  bmi = patient_data['bmi']
-  creatinine_mg_dl = patient_data['creatinine']
-  creatinine = creatinine_mg_dl * 88.4  # Convert mg/dL to μmol/L
-
-  _efr = calculate_efr(ef)
-  _efar = calculate_efar(age, ef, _efr)
-  _sbpr = calculate_sbpr(sbp, ef)
-  _bmir = calculate_bmir(bmi)
-  _crtnr = calculate_crtnr(creatinine)
-
-  gender_points = calculate_gender_points(patient_data['gender'])
-  nyha_points = calculate_nyha_points(patient_data['nyha_class'])
-  smoker_points = calculate_smoker_points(patient_data['smoker'])
-  diabetes_points = calculate_diabetes_points(patient_data['diabetes'])
-  copd_points = calculate_copd_points(patient_data['copd'])
-  hf_points = calculate_hf_points(patient_data['hf_duration_less_than_18_months'])
-  blocker_points = calculate_blocker_points(patient_data['beta_blocker'])
-  acei_points = calculate_acei_points(patient_data['ace_arb'])
-
-  # Sum all the points
-  score = (
-    (_efr or 0) +
-    (_efar or 0) +
-    (_sbpr or 0) +
-    (_bmir or 0) +
-    (_crtnr or 0) +
-    gender_points +
-    nyha_points +
-    smoker_points +
-    diabetes_points +
-    copd_points +
-    hf_points +
-    blocker_points +
-    acei_points
-  )
-
-  return score
-
-
-def calculate_1_year_risk(score):
-  risk1 = [
-    0.015, 0.016, 0.018, 0.02, 0.022, 0.024, 0.027, 0.029, 0.032, 0.036,
-    0.039, 0.043, 0.048, 0.052, 0.058, 0.063, 0.07, 0.077, 0.084, 0.093,
-    0.102, 0.111, 0.122, 0.134, 0.147, 0.16, 0.175, 0.191, 0.209, 0.227,
-    0.248, 0.269, 0.292, 0.316, 0.342, 0.369, 0.398, 0.427, 0.458, 0.49,
-    0.523, 0.557, 0.591, 0.625, 0.659, 0.692, 0.725, 0.757, 0.787, 0.816,
-    0.842
-  ]
-  if 0 <= score < len(risk1):
-    return round(100 * risk1[score], 2)  # Percentage % with 2 decimal places
-  return None
-
-
-def calculate_3_year_risk(score):
-  risk3 = [
-    0.039, 0.043, 0.048, 0.052, 0.058, 0.063, 0.07, 0.077, 0.084, 0.092,
-    0.102, 0.111, 0.122, 0.134, 0.146, 0.16, 0.175, 0.191, 0.209, 0.227,
-    0.247, 0.269, 0.292, 0.316, 0.342, 0.369, 0.397, 0.427, 0.458, 0.49,
-    0.523, 0.556, 0.59, 0.625, 0.658, 0.692, 0.725, 0.756, 0.787, 0.815,
-    0.842, 0.866, 0.889, 0.908, 0.926, 0.941, 0.953, 0.964, 0.973, 0.98, 0.985
-  ]
-  if 0 <= score < len(risk3):
-    return round(100 * risk3[score], 2)  # Percentage % with 2 decimal places
-  return None
-
-
-def get_risk_category(score):
-  if score <= 19:
-    return 'Low Risk'
-  elif score <= 30:
-    return 'Medium Risk'
-  else:
-    return 'High Risk'
+import string
+from functools import partial
+from operator import itemgetter
+
+from models.description_writer import DescriptionWriter, merge_shards, output_path, remove_shards, shard_path
+from models.file_readers import DEFAULT_CHUNKSIZE, iter_patient_chunks, read_patient_records
+from models.instrumentation import current_metrics
+from models.memo import LRUMemo
+from models.parallel import process_records_parallel
+from models.results import LazyResult, RiskResult, collect_results
+from models.maggic_core import (
+  PatientParser,
+  patient_id_for,
+  parse_patient_data,
+  check_narrative_inputs,
+  classify_bmi,
+  calculate_efr,
+  calculate_efar,
+  calculate_sbpr,
+  calculate_bmir,
+  calculate_crtnr,
+  calculate_gender_points,
+  calculate_nyha_points,
+  calculate_smoker_points,
+  calculate_diabetes_points,
+  calculate_copd_points,
+  calculate_hf_points,
+  calculate_blocker_points,
+  calculate_acei_points,
+  calculate_maggic_score,
+  calculate_1_year_risk,
+  calculate_3_year_risk,
+  get_risk_category,
+)
+
+# Part of the result cache key: bump when the scores or the narratives change
+# 2: patients with a NaN (blank) name are "Patient <n>" instead of nan
+MODEL_VERSION = '2'
 
 
 def generate_health_message_patient(score, patient_data):
@@ -698,308 +407,538 @@ def generate_health_message_doctor(score, patient_data):
   return main_message, recommendations
 
 
-def generate_patient_description(patient_id, patient_data, score, risk1_year, risk3_year, category):
-  """Generate a detailed description for the patient with added information."""
-
-  # Gender description
-  gender = "male" if patient_data['gender'] == 'male' else "female"
-
-  # NYHA Class and associated AHA Stage
-  nyha_class = patient_data['nyha_class']
-  nyha_class_str = {1: 'I', 2: 'II', 3: 'III', 4: 'IV'}.get(nyha_class, 'I')
-
-  # AHA Stages descriptions
-  aha_stages = {
-    'I': (
-      "At risk for heart failure.\n"
-      "In this class, belong people who are at risk for heart failure but do not yet have symptoms or structural or functional heart disease.\n"
-      "Risk factors include hypertension, coronary vascular disease, diabetes, obesity, exposure to cardiotoxic agents, "
-      "genetic variants for cardiomyopathy, and family history of cardiomyopathy.\n"
-    ),
-    'II': (
-      "Pre-heart failure.\n"
-      "In this class, people without current or previous symptoms of heart failure but with either structural heart disease, "
-      "increased filling pressures in the heart or other risk factors.\n"
-    ),
-    'III': (
-      "Symptomatic heart failure.\n"
-      "In this class, the people consider that marked limitation of physical activity; comfortable at rest; less than ordinary activity causes fatigue, palpitation, or dyspnea.\n"
-    ),
-    'IV': (
-      "Advanced heart failure.\n"
-      "In this class, people with heart failure symptoms that interfere with daily life functions or lead to repeated hospitalizations.\n"
-    )
-  }
-
-  # Get the corresponding AHA stage message based on NYHA class
-  aha_stage_message = aha_stages.get(nyha_class_str, "")
-
-  # LVEF classification
-  lvef = patient_data['lvef']
+# Narrative text of generate_patient_description, built once at import time
+NYHA_CLASS_NAMES = {1: 'I', 2: 'II', 3: 'III', 4: 'IV'}
+
+# AHA stage description of each NYHA class
+AHA_STAGES = {
+  'I': (
+    "At risk for heart failure.\n"
+    "In this class, belong people who are at risk for heart failure but do not yet have symptoms or structural or functional heart disease.\n"
+    "Risk factors include hypertension, coronary vascular disease, diabetes, obesity, exposure to cardiotoxic agents, "
+    "genetic variants for cardiomyopathy, and family history of cardiomyopathy.\n"
+  ),
+  'II': (
+    "Pre-heart failure.\n"
+    "In this class, people without current or previous symptoms of heart failure but with either structural heart disease, "
+    "increased filling pressures in the heart or other risk factors.\n"
+  ),
+  'III': (
+    "Symptomatic heart failure.\n"
+    "In this class, the people consider that marked limitation of physical activity; comfortable at rest; less than ordinary activity causes fatigue, palpitation, or dyspnea.\n"
+  ),
+  'IV': (
+    "Advanced heart failure.\n"
+    "In this class, people with heart failure symptoms that interfere with daily life functions or lead to repeated hospitalizations.\n"
+  )
+}
+
+DIABETES_EXPLANATION = (
+  "Diabetes is a chronic disease that occurs either when the pancreas does not produce enough insulin or when the body cannot\n"
+  "effectively use the insulin it produces. Insulin is a hormone that regulates blood glucose. Hyperglycaemia, also called raised blood glucose,\n"
+  "is a common effect of uncontrolled diabetes and over time leads to serious damage to many of the body's systems, especially the nerves and blood vessels.\n"
+)
+
+COPD_EXPLANATION = (
+  "For Information, chronic obstructive pulmonary disease (COPD) is the name for a group of lung conditions that cause breathing difficulties. "
+  "It includes: emphysema – damage to the air sacs in the lungs or chronic bronchitis – long-term inflammation of the airways. "
+  "COPD is a common condition that mainly affects middle-aged or older adults who smoke. Many people do not realise they have it."
+  "The breathing problems tend to get gradually worse over time and can limit your normal activities, although treatment can help "
+  "keep the condition under control."
+)
+
+BETA_BLOCKER_TEXT = {
+  True: "the patient is taking beta blockers therapy.",
+  False: "the patient doesn't take beta blockers therapy.",
+}
+
+ACE_ARB_TEXT = {
+  True: "is taking ACE inhibitors or ARBs therapy.",
+  False: "doesn't take ACE inhibitors or ARBs therapy.",
+}
+
+# The description with a {slot} for every patient-specific part; see compile_template
+DESCRIPTION_TEMPLATE = (
+  "We have patient {patient_id}, whose age is {age} years, and the gender is {gender}, with the following medical characteristics:\n"
+  "Regarding the NYHA class, the patient {patient_id}  belongs to Class {nyha_class}.\n"
+  "Based on the American Heart Association (AHA) and in collaboration with the American College of Cardiology (ACC), "
+  "Class {nyha_class} has the following characteristics:\n{aha_stage}"
+  "(Source: https://www.heart.org/en/health-topics/heart-failure/what-is-heart-failure/classes-of-heart-failure,\n"
+  "https://www.mdcalc.com/calc/3987/new-york-heart-association-nyha-functional-classification-heart-failure).\n"
+  "Also, the left ventricular ejection fraction (LVEF) of the patient {patient_id}  is {lvef}%.\nAccording to the American College of Cardiology (ACC), the patient has {lvef_category} \n"
+  "For information, Left ventricular ejection fraction (LVEF) is the central measure of left ventricular systolic function. LVEF is the fraction of chamber volume ejected in systole (stroke volume) in relation to the volume of the blood in the ventricle at the end of diastole (end-diastolic volume).\n"
+  "(Source: https://www.healthline.com/health/ejection-fraction#ejection-fraction-results, https://www.ncbi.nlm.nih.gov/books/NBK459131/).\n"
+  "Regarding diabetes, {diabetes_info}"
+  "{smoking_status}\n"
+  "{copd_status}\n"
+  "The patient's {patient_id} systolic pressure is {sbp} mm Hg and is characterized as '{sbp_category}' ({sbp_condition}).\n"
+  "Regarding heart failure medications, {beta_blocker} Moreover, {ace_arb}\n"
+  "The patient {patient_id} has a creatinine level of {creatinine} mg/dL and is categorized as {creatinine_category} ({creatinine_condition}).\n"
+  "(Source: https://www.healthline.com/health/low-creatinine#creatinine-levels.)\n"
+  "The Body Mass Index (BMI) of the patient {patient_id} is {bmi}.\n"
+  "Body mass index (BMI) is a measure of body fat based on height and weight that applies to adult men and women.\n"
+  "So, based on the existing scientific literature, the patient {patient_id} with this BMI can be characterized as '{bmi_category}'.\n"
+  "(Source: https://www.nhlbi.nih.gov/health/educational/lose_wt/BMI/bmicalc.htm.).\n"
+  "Finally, patient {patient_id} {hf_duration_status} heart failure diagnosed within the past 18 months.\n"
+  "Based on all the above characteristics, patient's {patient_id} MAGGIC score is {score} and this MAGGIC score is categorized as {category}.\n"
+  "The predicted mortality of the patient {patient_id} for 1-Year is {risk1_year}%. Namely, there is a {risk1_year}% change that the patient may not survive "
+  "within the next year due to heart-related conditions.\n"
+  "The predicted mortality of the patient {patient_id} for 3-Year is {risk3_year}%. Namely, there is a {risk3_year}% change that the patient may not survive "
+  "within the next three years due to heart-related conditions.\n"
+)
+
+
+def compile_template(template):
+  """
+  Split a template into its static fragments and the slot names between
+  them. Rendering interleaves the fragments with the slot values, so the
+  template text is only scanned once.
+  """
+  fragments = []
+  slots = []
+  for literal, slot, _, _ in string.Formatter().parse(template):
+    fragments.append(literal)
+    if slot is not None:
+      slots.append(slot)
+  if len(fragments) == len(slots):
+    fragments.append('')
+  return fragments, slots
+
+
+DESCRIPTION_FRAGMENTS, DESCRIPTION_SLOTS = compile_template(DESCRIPTION_TEMPLATE)
+# Fragments at the even positions, the slots in between
+_DESCRIPTION_PARTS = [None] * (2 * len(DESCRIPTION_FRAGMENTS) - 1)
+_DESCRIPTION_PARTS[::2] = DESCRIPTION_FRAGMENTS
+# Slot names in the order description_values() returns them, and where each goes in the template
+DESCRIPTION_VALUE_NAMES = (
+  'patient_id', 'age', 'gender', 'nyha_class', 'aha_stage', 'lvef', 'lvef_category', 'diabetes_info',
+  'smoking_status', 'copd_status', 'sbp', 'sbp_category', 'sbp_condition', 'beta_blocker', 'ace_arb',
+  'creatinine', 'creatinine_category', 'creatinine_condition', 'bmi', 'bmi_category', 'hf_duration_status',
+  'score', 'category', 'risk1_year', 'risk3_year',
+)
+_description_slot_values = itemgetter(*(DESCRIPTION_VALUE_NAMES.index(slot) for slot in DESCRIPTION_SLOTS))
+
+
+def classify_lvef(lvef):
+  """LVEF classification of the American College of Cardiology."""
   if lvef > 70:
-    lvef_category = "Hyperdynamic (LVEF > 70%)"
+    return "Hyperdynamic (LVEF > 70%)"
   elif 50 <= lvef <= 70:
-    lvef_category = "Normal (LVEF 50% to 70%)"
+    return "Normal (LVEF 50% to 70%)"
   elif 40 <= lvef < 50:
-    lvef_category = "Mild dysfunction (LVEF 40% to 49%). It could be a sign of heart damage, perhaps from " \
-                    "a heart condition or a previous heart attack"
+    return "Mild dysfunction (LVEF 40% to 49%). It could be a sign of heart damage, perhaps from " \
+           "a heart condition or a previous heart attack"
   elif 30 <= lvef < 40:
-    lvef_category = "Moderate dysfunction (LVEF 30% to 39%). It can also be due to cardiomyopathy, which is when the patient's  " \
-                    "heart muscle weakens, making the patient's heart less effective at pumping blood to the rest of the patient's body. "
+    return "Moderate dysfunction (LVEF 30% to 39%). It can also be due to cardiomyopathy, which is when the patient's  " \
+           "heart muscle weakens, making the patient's heart less effective at pumping blood to the rest of the patient's body. "
   else:
-    lvef_category = "Severe dysfunction (LVEF < 30%)"
+    return "Severe dysfunction (LVEF < 30%)"
 
-  # Diabetes explanation
-  if patient_data['diabetes']:
-    diabetes_info = (
-      f"the patient {patient_data['name']} has been diagnosed with diabetes.\n"
-      "Diabetes is a chronic disease that occurs either when the pancreas does not produce enough insulin or when the body cannot\n"
-      "effectively use the insulin it produces. Insulin is a hormone that regulates blood glucose. Hyperglycaemia, also called raised blood glucose,\n"
-      "is a common effect of uncontrolled diabetes and over time leads to serious damage to many of the body's systems, especially the nerves and blood vessels.\n"
-    )
-  else:
-    diabetes_info = f"the patient {patient_data['name']} has not been diagnosed with diabetes.\n"
 
-  # Systolic Blood Pressure details
-  sbp = patient_data['sbp']
+def classify_sbp(sbp):
+  """(category, condition) of a systolic blood pressure."""
   if sbp < 120:
-    sbp_category = "Normal"
-    sbp_condition = "Less than 120 systolic pressure"
+    return "Normal", "Less than 120 systolic pressure"
   elif 120 <= sbp <= 129:
-    sbp_category = "Elevated"
-    sbp_condition = "120 to 129 systolic pressure"
+    return "Elevated", "120 to 129 systolic pressure"
   elif 130 <= sbp <= 139:
-    sbp_category = "High Blood Pressure Stage 1"
-    sbp_condition = "130 to 139 systolic pressure"
+    return "High Blood Pressure Stage 1", "130 to 139 systolic pressure"
   elif 140 <= sbp <= 180:
-    sbp_category = "High Blood Pressure Stage 2"
-    sbp_condition = "140 or higher systolic pressure"
+    return "High Blood Pressure Stage 2", "140 or higher systolic pressure"
   else:
-    sbp_category = "Hypertensive Crisis"
-    sbp_condition = "Higher than 180 systolic pressure"
+    return "Hypertensive Crisis", "Higher than 180 systolic pressure"
 
-  # Beta-blocker and ACE/ARB therapy descriptions
-  if patient_data['beta_blocker']:
-    beta_blocker_text = "the patient is taking beta blockers therapy."
-  else:
-    beta_blocker_text = "the patient doesn't take beta blockers therapy."
 
-  if patient_data['ace_arb']:
-    ace_arb_text = "is taking ACE inhibitors or ARBs therapy."
-  else:
-    ace_arb_text = "doesn't take ACE inhibitors or ARBs therapy."
-
-  # Heart Failure Duration status
-  hf_duration_status = "has" if patient_data['hf_duration_less_than_18_months'] else "does not have"
-  # Creatinine levels
-  creatinine = patient_data['creatinine']
+def classify_creatinine(creatinine, gender):
+  """(category, condition) of a creatinine level for 'male' or 'female'."""
   if creatinine < 0.6 and gender == 'male':
-    creatinine_category = "Low"
-    creatinine_condition = "< 0.6 mg/dL"
+    return "Low", "< 0.6 mg/dL"
   elif creatinine < 0.5 and gender == 'female':
-    creatinine_category = "Low"
-    creatinine_condition = "< 0.5 mg/dL"
+    return "Low", "< 0.5 mg/dL"
   elif 0.6 < creatinine < 1.2 and gender == 'male':
-    creatinine_category = "Normal"
-    creatinine_condition = "0.6 to 1.2 mg/dL"
+    return "Normal", "0.6 to 1.2 mg/dL"
   elif 0.5 < creatinine < 1.1 and gender == 'female':
-    creatinine_category = "Normal"
-    creatinine_condition = "0.5 to 1.1 mg/dL"
+    return "Normal", "0.5 to 1.1 mg/dL"
   elif creatinine > 1.2 and gender == 'male':
-    creatinine_category = "High"
-    creatinine_condition = "above 1.2 mg/dL"
+    return "High", "above 1.2 mg/dL"
+  else:
+    return "High", "above 1.1 mg/dL"
+
+
+def description_values(patient_id, patient_data, score, risk1_year, risk3_year, category):
+  """The slot values of DESCRIPTION_TEMPLATE, as strings in DESCRIPTION_VALUE_NAMES order."""
+  patient_id = f"{patient_id}"
+  gender = "male" if patient_data['gender'] == 'male' else "female"
+  nyha_class = NYHA_CLASS_NAMES.get(patient_data['nyha_class'], 'I')
+  lvef = patient_data['lvef']
+  sbp = patient_data['sbp']
+  creatinine = patient_data['creatinine']
+  bmi = patient_data['bmi']
+
+  bmi_category = check_narrative_inputs(patient_data)
+
+  if patient_data['diabetes']:
+    diabetes_info = f"the patient {patient_data['name']} has been diagnosed with diabetes.\n{DIABETES_EXPLANATION}"
   else:
-    creatinine_category = "High"
-    creatinine_condition = "above 1.1 mg/dL"
+    diabetes_info = f"the patient {patient_data['name']} has not been diagnosed with diabetes.\n"
 
-  # Smoking status
   if patient_data['smoker']:
     smoking_status = f" The patient {patient_id} is a smoker."
   else:
     smoking_status = f"The patient {patient_id} doesn't smoke."
 
-  # COPD status
   if patient_data['copd']:
-    copd_status = f" The patient {patient_id} has COPD disease. For Information, chronic obstructive pulmonary disease (COPD) is the name for a group of lung conditions that cause breathing difficulties. " \
-                    "It includes: emphysema – damage to the air sacs in the lungs or chronic bronchitis – long-term inflammation of the airways. " \
-                    "COPD is a common condition that mainly affects middle-aged or older adults who smoke. Many people do not realise they have it." \
-                    "The breathing problems tend to get gradually worse over time and can limit your normal activities, although treatment can help " \
-                    "keep the condition under control."
+    copd_status = f" The patient {patient_id} has COPD disease. {COPD_EXPLANATION}"
   else:
     copd_status = "The patient hasn't COPD disease."
 
-
-  # BMI
-  bmi = patient_data['bmi']
-  if bmi < 18.5:
-    bmi_category = "Underweight"
-  elif 18.5 <= bmi <= 24.9:
-    bmi_category = "Normal"
-  elif 25 <= bmi <= 29.9:
-    bmi_category = "Overweight"
-  elif bmi >= 30:
-    bmi_category = "Obesity"
-  description = (
-    f"We have patient {patient_id}, whose age is {patient_data['age']} years, and the gender is {gender}, with the following medical characteristics:\n"
-    f"Regarding the NYHA class, the patient {patient_id}  belongs to Class {nyha_class_str}.\n"
-    f"Based on the American Heart Association (AHA) and in collaboration with the American College of Cardiology (ACC), "
-    f"Class {nyha_class_str} has the following characteristics:\n{aha_stage_message}"
-    f"(Source: https://www.heart.org/en/health-topics/heart-failure/what-is-heart-failure/classes-of-heart-failure,\n"
-    f"https://www.mdcalc.com/calc/3987/new-york-heart-association-nyha-functional-classification-heart-failure).\n"
-    f"Also, the left ventricular ejection fraction (LVEF) of the patient {patient_id}  is {lvef:.1f}%.\nAccording to the American College of Cardiology (ACC), the patient has {lvef_category} \n"
-    f"For information, Left ventricular ejection fraction (LVEF) is the central measure of left ventricular systolic function. LVEF is the fraction of chamber volume ejected in systole (stroke volume) in relation to the volume of the blood in the ventricle at the end of diastole (end-diastolic volume).\n"
-    f"(Source: https://www.healthline.com/health/ejection-fraction#ejection-fraction-results, https://www.ncbi.nlm.nih.gov/books/NBK459131/).\n"
-    f"Regarding diabetes, {diabetes_info}"
-    f"{smoking_status}\n"  # Add smoking status
-    f"{copd_status}\n"  # Add COPD status
-    f"The patient's {patient_id} systolic pressure is {sbp} mm Hg and is characterized as '{sbp_category}' ({sbp_condition}).\n"
-    f"Regarding heart failure medications, {beta_blocker_text} Moreover, {ace_arb_text}\n"
-    f"The patient {patient_id} has a creatinine level of {creatinine} mg/dL and is categorized as {creatinine_category} ({creatinine_condition}).\n"
-    f"(Source: https://www.healthline.com/health/low-creatinine#creatinine-levels.)\n"
-    f"The Body Mass Index (BMI) of the patient {patient_id} is {bmi}.\n"
-    f"Body mass index (BMI) is a measure of body fat based on height and weight that applies to adult men and women.\n"
-    f"So, based on the existing scientific literature, the patient {patient_id} with this BMI can be characterized as '{bmi_category}'.\n"
-    f"(Source: https://www.nhlbi.nih.gov/health/educational/lose_wt/BMI/bmicalc.htm.).\n"
-    f"Finally, patient {patient_id} {hf_duration_status} heart failure diagnosed within the past 18 months.\n"
-    f"Based on all the above characteristics, patient's {patient_id} MAGGIC score is {score} and this MAGGIC score is categorized as {category}.\n"
-    f"The predicted mortality of the patient {patient_id} for 1-Year is {risk1_year}%. Namely, there is a {risk1_year}% change that the patient may not survive "
-    f"within the next year due to heart-related conditions.\n"
-    f"The predicted mortality of the patient {patient_id} for 3-Year is {risk3_year}%. Namely, there is a {risk3_year}% change that the patient may not survive "
-    f"within the next three years due to heart-related conditions.\n"
+  sbp_category, sbp_condition = classify_sbp(sbp)
+  creatinine_category, creatinine_condition = classify_creatinine(creatinine, gender)
+  return (
+    patient_id,
+    f"{patient_data['age']}",
+    gender,
+    nyha_class,
+    AHA_STAGES.get(nyha_class, ""),
+    f"{lvef:.1f}",
+    classify_lvef(lvef),
+    diabetes_info,
+    smoking_status,
+    copd_status,
+    f"{sbp}",
+    sbp_category,
+    sbp_condition,
+    BETA_BLOCKER_TEXT[bool(patient_data['beta_blocker'])],
+    ACE_ARB_TEXT[bool(patient_data['ace_arb'])],
+    f"{creatinine}",
+    creatinine_category,
+    creatinine_condition,
+    f"{bmi}",
+    bmi_category,
+    "has" if patient_data['hf_duration_less_than_18_months'] else "does not have",
+    f"{score}",
+    f"{category}",
+    f"{risk1_year}",
+    f"{risk3_year}",
   )
 
-  return description
-
-
-def process_file_and_calculate(filename):
-  patient_data_list = []
-  file_extension = os.path.splitext(filename)[-1].lower()
-  output_file = "patient_descriptions.txt"
-
-  # Handle files based on their type
-  if file_extension == '.csv':
-    try:
-      df = pd.read_csv(filename)
-      patient_data_list = df.to_dict(orient='records')
-    except Exception as e:
-      print(f"Error reading CSV file: {e}")
-
-  elif file_extension == '.txt':
-    try:
-      with open(filename, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-      headers = lines[0].strip().split(',')
-      for line in lines[1:]:
-        values = line.strip().split(',')
-        patient_data = dict(zip(headers, values))
-        patient_data_list.append(patient_data)
-    except Exception as e:
-      print(f"Error reading TXT file: {e}")
-
-  elif file_extension == '.json':
-    try:
-      with open(filename, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-      if isinstance(data, list):
-        patient_data_list = data
-      elif isinstance(data, dict):
-        patient_data_list = [data]
-      else:
-        raise ValueError("Invalid JSON format: Expected a list or a dictionary.")
-    except json.JSONDecodeError as e:
-      print(f"Error decoding JSON file: {e}")
-    except Exception as e:
-      print(f"Error reading JSON file: {e}")
-
-  elif file_extension in ['.xls', '.xlsx']:
-    try:
-      df = pd.read_excel(filename, sheet_name=0)
-      patient_data_list = df.to_dict(orient='records')
-    except Exception as e:
-      print(f"Error reading Excel file: {e}")
-
-  elif file_extension == '.pdf':
-    try:
-      with open(filename, 'rb') as f:
-        reader = PyPDF2.PdfReader(f)
-        text = ""
-        for page in reader.pages:
-          page_text = page.extract_text()
-          if page_text:
-            text += page_text + "\n"
-
-      lines = [line.strip() for line in text.split('\n') if line.strip()]
-      if lines:
-        headers = lines[0].split(',')
-        for line in lines[1:]:
-          values = line.split(',')
-          if len(values) == len(headers):
-            patient_data = dict(zip(headers, values))
-            patient_data_list.append(patient_data)
-    except Exception as e:
-      print(f"Error reading PDF file: {e}")
-
-  # Process patient data and write to output file
-  results = []
-  with open(output_file, 'w', encoding='utf-8') as output:
-    for idx, raw_data in enumerate(patient_data_list):
-      try:
-        # Parse patient data
-        patient_data = parse_patient_data(raw_data, idx + 1)
-        patient_id = patient_data['name'] if patient_data['name'] else f"Patient {idx + 1}"
-        score = calculate_maggic_score(patient_data)
-        risk1_year = calculate_1_year_risk(score)
-        risk3_year = calculate_3_year_risk(score)
-        category = get_risk_category(score)
-
-        # Generate messages for the patient and doctor
-        patient_main_message, patient_recommendations = generate_health_message_patient(score, patient_data)
-        doctor_main_message, doctor_recommendations = generate_health_message_doctor(score, patient_data)
-
-        # Generate detailed description for the patient
-        detailed_description = generate_patient_description(
-          patient_id=patient_id,
-          patient_data=patient_data,
-          score=score,
-          risk1_year=risk1_year,
-          risk3_year=risk3_year,
-          category=category
-        )
-
-        # Write to the patient_descriptions.txt file
-        output.write(f"{patient_id}\n")
-        output.write(f"{detailed_description}\n")
-        output.write("MESSAGE FOR PATIENT:\n")
-        output.write(f"{patient_main_message}\n")
-        output.write(f"RECOMMENDATIONS FOR PATIENT {patient_id}:\n")
-        for rec in patient_recommendations:
-          output.write(f"- {rec}\n")
-        output.write("\nMESSAGE FOR DOCTOR:\n")
-        output.write(f"{doctor_main_message}\n")
-        output.write(f"RECOMMENDATIONS FOR DOCTOR TO PATIENT {patient_id}:\n")
-        for rec in doctor_recommendations:
-          output.write(f"- {rec}\n")
-        output.write("\n" + "-" * 80 + "\n")
-
-        # Add result to the results list
-        results.append({
-          "patient_id": patient_id,
-          "patient_data": patient_data,
-          "detailed_description": detailed_description,
-          "score": score,
-          "risk1_year": risk1_year,
-          "risk3_year": risk3_year,
-          "category": category,
-          "patient_message": (patient_main_message, patient_recommendations),
-          "doctor_message": (doctor_main_message, doctor_recommendations)
-        })
-      except Exception as e:
-        print(f"Error processing patient data for {patient_id}: {e}")
+
+def _render_description(parts, values):
+  # parts is a copy of _DESCRIPTION_PARTS; the slots are filled in place
+  parts[1::2] = _description_slot_values(values)
+  return ''.join(parts)
+
+
+def generate_patient_description(patient_id, patient_data, score, risk1_year, risk3_year, category):
+  """Generate a detailed description for the patient with added information."""
+  values = description_values(patient_id, patient_data, score, risk1_year, risk3_year, category)
+  return _render_description(list(_DESCRIPTION_PARTS), values)
+
+
+def generate_patient_descriptions(results):
+  """
+  Bulk generate_patient_description for a batch of results (dicts,
+  LazyResults or RiskResults); one parts list is reused for the batch.
+  """
+  parts = list(_DESCRIPTION_PARTS)
+  return [
+    _render_description(parts, description_values(result['patient_id'], result['patient_data'], result['score'],
+                                                   result['risk1_year'], result['risk3_year'], result['category']))
+    for result in results
+  ]
+
+
+# Ends every entry of patient_descriptions.txt
+ENTRY_SEPARATOR = "\n" + "-" * 80 + "\n"
+
+
+def process_file_and_calculate(filename, workers=None, narratives='eager', result_type='dict', progress=None,
+                               output_file="patient_descriptions.txt", compression=None, sharded=False):
+  """
+  Score every patient in `filename` and write the descriptions to
+  `output_file` (gzip or zstd compressed with `compression`, which adds the
+  .gz/.zst suffix). Give every concurrent run its own output_file.
+  With workers=N (N > 1) the patients are scored on N processes in
+  order-preserving chunks; the results and the file are identical. With
+  sharded=True as well, each worker writes its chunks to shard files that
+  are merged into output_file at the end.
+  With narratives='lazy' the descriptions and messages are only built when
+  a result field is read (see models.results.LazyResult); result_type='record'
+  returns compact RiskResult objects. Neither writes the descriptions file.
+  """
+  write_descriptions = narratives != 'lazy' and result_type != 'record'
+  output_file = output_path(output_file, compression)
+  metrics = current_metrics()
+  # Column aliases are resolved once for the whole file
+  parser = PatientParser()
+  with metrics.stage('read'):
+    patient_data_list = read_patient_records(filename, columns=parser.uses_column)
+
+  process = partial(process_patient, narratives=narratives, result_type=result_type, parse=parser)
+  sharded = sharded and write_descriptions and workers and workers > 1
+  if workers and workers > 1:
+    if patient_data_list:
+      # Plan the headers (and print their warnings) once, before the parser is copied to the workers
+      parser.plan_for(patient_data_list[0])
+    on_chunk = None
+    if sharded:
+      remove_shards(output_file)
+      on_chunk = partial(write_description_shard, output_file, compression)
+    processed = process_records_parallel(process, patient_data_list, workers, on_chunk=on_chunk)
+  else:
+    processed = (process(raw_data, idx) for idx, raw_data in enumerate(patient_data_list))
+
+  # Process patient data
+  memo_hits, memo_misses = MESSAGE_MEMO.hits, MESSAGE_MEMO.misses
+  with metrics.stage('score'):
+    results = collect_results(processed, len(patient_data_list), progress)
+  metrics.count('rows_parsed', len(patient_data_list))
+  metrics.count('rows_rejected', len(patient_data_list) - len(results))
+  metrics.count('message_memo_hits', MESSAGE_MEMO.hits - memo_hits)
+  metrics.count('message_memo_misses', MESSAGE_MEMO.misses - memo_misses)
+
+  if not write_descriptions:
+    return results
+
+  # Write the descriptions to the output file
+  with metrics.stage('write_descriptions'):
+    if sharded:
+      merge_shards(output_file)
+    else:
+      with DescriptionWriter(output_file, compression) as writer:
+        for result in results:
+          writer.write(format_patient_description(result))
+  metrics.count('bytes_written', os.path.getsize(output_file))
 
   print(f"Patient descriptions have been saved to {output_file}")
   return results
 
 
-def run_model(file_path):
-  return process_file_and_calculate(file_path)
+def describe_patient(result):
+  return generate_patient_description(
+    patient_id=result['patient_id'],
+    patient_data=result['patient_data'],
+    score=result['score'],
+    risk1_year=result['risk1_year'],
+    risk3_year=result['risk3_year'],
+    category=result['category']
+  )
+
+
+def message_profile(score, patient_data):
+  """
+  Everything generate_health_message_patient/doctor depend on: the risk
+  category and the outcome of each clinical threshold they test.
+  Patients with the same profile get the same messages.
+  """
+  lvef = patient_data['lvef']
+  bmi = patient_data['bmi']
+  creatinine = patient_data['creatinine']
+  gender = patient_data['gender'].lower()
+  return (
+    get_risk_category(score),
+    lvef < 40,
+    lvef > 70,
+    patient_data['smoker'],
+    patient_data['diabetes'],
+    patient_data['copd'],
+    patient_data['sbp'] > 130,
+    patient_data['beta_blocker'],
+    patient_data['ace_arb'],
+    (gender == 'male' and creatinine > 1.2) or (gender == 'female' and creatinine > 1.1),
+    (gender == 'male' and creatinine < 0.6) or (gender == 'female' and creatinine < 0.5),
+    bmi < 18.5,
+    18.5 < bmi < 25,
+    25 <= bmi < 30,
+    bmi > 29.9,
+  )
+
+
+# Patient and doctor messages of the most recent profiles; see message_memo_stats()
+MESSAGE_MEMO = LRUMemo(maxsize=4096)
+
+# (patient_data, score, messages) of the last call: the patient and doctor
+# narrators ask for the same patient one after the other
+_last_messages = (None, None, None)
+
+
+def generate_health_messages(score, patient_data):
+  """
+  (patient message, doctor message), memoized on message_profile.
+  The recommendation lists are shared between patients with the same
+  profile and must not be modified.
+  """
+  global _last_messages
+  last_data, last_score, messages = _last_messages
+  if last_data is patient_data and last_score == score:
+    return messages
+
+  key = message_profile(score, patient_data)
+  messages = MESSAGE_MEMO.lookup(key)
+  if messages is None:
+    messages = (generate_health_message_patient(score, patient_data),
+                generate_health_message_doctor(score, patient_data))
+    MESSAGE_MEMO.store(key, messages)
+  _last_messages = (patient_data, score, messages)
+  return messages
+
+
+def message_memo_stats():
+  """Hits, misses, hit rate and size of the message memo."""
+  return MESSAGE_MEMO.stats()
+
+
+def patient_message(result):
+  return generate_health_messages(result['score'], result['patient_data'])[0]
+
+
+def doctor_message(result):
+  return generate_health_messages(result['score'], result['patient_data'])[1]
+
+
+# Builders of the narrative result fields, shared by the eager and lazy modes
+NARRATORS = {
+  'detailed_description': describe_patient,
+  'patient_message': patient_message,
+  'doctor_message': doctor_message,
+}
+
+
+def process_patient(raw_data, idx, narratives='eager', result_type='dict', parse=parse_patient_data,
+                    narrators=NARRATORS):
+  """
+  Score one raw patient record; returns the result dict or None on error.
+  narratives='lazy' returns a LazyResult whose narrative fields are built
+  on first access instead of up front; result_type='record' returns a
+  compact RiskResult without the narrative fields. Pass the file's
+  PatientParser as `parse` when scoring many records, and another model's
+  narrative functions as `narrators`.
+  """
+  patient_id = f"Patient {idx + 1}"
+  try:
+    # Parse patient data
+    patient_data = parse(raw_data, idx + 1)
+    patient_id = patient_id_for(patient_data['name'], idx + 1)
+    score = calculate_maggic_score(patient_data)
+
+    result = {
+      "patient_id": patient_id,
+      "patient_data": patient_data,
+      "score": score,
+      "risk1_year": calculate_1_year_risk(score),
+      "risk3_year": calculate_3_year_risk(score),
+      "category": get_risk_category(score),
+    }
+    if result_type == 'record':
+      return RiskResult.from_dict(result)
+    # Patients the narratives cannot describe are dropped in both narrative modes
+    check_narrative_inputs(patient_data)
+    if narratives == 'lazy':
+      return LazyResult(result, narrators)
+
+    # Generate the messages for the patient and doctor and the detailed description
+    for field, narrator in narrators.items():
+      result[field] = narrator(result)
+    return result
+  except Exception as e:
+    print(f"Error processing patient data for {patient_id}: {e}")
+    return None
+
+
+def format_patient_description(result):
+  """The patient_descriptions.txt entry of one result."""
+  patient_id = result['patient_id']
+  patient_main_message, patient_recommendations = result['patient_message']
+  doctor_main_message, doctor_recommendations = result['doctor_message']
+
+  parts = [
+    f"{patient_id}\n",
+    f"{result['detailed_description']}\n",
+    "MESSAGE FOR PATIENT:\n",
+    f"{patient_main_message}\n",
+    f"RECOMMENDATIONS FOR PATIENT {patient_id}:\n",
+  ]
+  parts.extend(f"- {rec}\n" for rec in patient_recommendations)
+  parts.append("\nMESSAGE FOR DOCTOR:\n")
+  parts.append(f"{doctor_main_message}\n")
+  parts.append(f"RECOMMENDATIONS FOR DOCTOR TO PATIENT {patient_id}:\n")
+  parts.extend(f"- {rec}\n" for rec in doctor_recommendations)
+  parts.append(ENTRY_SEPARATOR)
+  return ''.join(parts)
+
+
+def write_patient_description(output, result):
+  """Write one result to the patient_descriptions.txt stream."""
+  output.write(format_patient_description(result))
+
+
+def write_description_shard(output_file, compression, start, results):
+  """Append the entries of the chunk starting at row `start` to its shard of `output_file` (in the worker)."""
+  with DescriptionWriter(shard_path(output_file, start), compression, append=True) as writer:
+    for result in results:
+      if result is not None:
+        writer.write(format_patient_description(result))
+
+
+def _iter_file_results(filename, chunksize, narratives, result_type):
+  parser = PatientParser()
+  idx = 0
+  for chunk in iter_patient_chunks(filename, chunksize, columns=parser.uses_column):
+    for raw_data in chunk:
+      result = process_patient(raw_data, idx, narratives=narratives, result_type=result_type, parse=parser)
+      idx += 1
+      if result is not None:
+        yield result
+
+
+def stream_file_and_calculate(filename, chunksize=DEFAULT_CHUNKSIZE, output_file="patient_descriptions.txt",
+                              narratives='eager', result_type='dict', compression=None):
+  """
+  Streaming version of process_file_and_calculate.
+  Reads the file `chunksize` rows at a time and yields one result dict per
+  patient as soon as it is scored, so memory stays flat for any file size.
+  The descriptions file is written incrementally, in buffered blocks, as
+  results are produced (not in narratives='lazy' or result_type='record' mode).
+  """
+  results = _iter_file_results(filename, chunksize, narratives, result_type)
+  if narratives == 'lazy' or result_type == 'record':
+    yield from results
+    return
+
+  output_file = output_path(output_file, compression)
+  with DescriptionWriter(output_file, compression) as writer:
+    for result in results:
+      writer.write(format_patient_description(result))
+      yield result
+
+  print(f"Patient descriptions have been saved to {output_file}")
+
 
+def score_file_batch(filename, chunksize=DEFAULT_CHUNKSIZE, typed_csv=True):
+  """
+  Score `filename` into a NumPy-backed ResultBatch, one vectorized pass per
+  chunk. CSV files are read with declared dtypes (see models.typed_csv)
+  unless typed_csv=False.
+  """
+  from models.batch_scoring import score_patient_file
+  return score_patient_file(filename, PatientParser(), chunksize=chunksize, typed_csv=typed_csv)
+
+
+def run_model(file_path, stream=False, chunksize=DEFAULT_CHUNKSIZE, workers=None, narratives='eager',
+              result_type='dict', progress=None, output_file="patient_descriptions.txt", compression=None,
+              sharded=False):
+  """
+  result_type selects the result form: 'dict' (the result dicts), 'record'
+  (RiskResult objects) or 'batch' (a single ResultBatch; stream, workers and
+  narratives do not apply). progress(done, total) is called as the rows of a
+  non-streaming run are scored. output_file, compression and sharded select
+  where and how the descriptions are written.
+  """
+  if result_type == 'batch':
+    return score_file_batch(file_path, chunksize=chunksize)
+  if stream:
+    return stream_file_and_calculate(file_path, chunksize=chunksize, output_file=output_file, narratives=narratives,
+                                     result_type=result_type, compression=compression)
+  return process_file_and_calculate(file_path, workers=workers, narratives=narratives, result_type=result_type,
+                                    progress=progress, output_file=output_file, compression=compression,
+                                    sharded=sharded)
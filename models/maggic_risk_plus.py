@@ -1,386 +1,111 @@
 # maggic_model.py
-import os
-import json
-import pandas as pd
-import PyPDF2
+from functools import partial
+
+from models.file_readers import DEFAULT_CHUNKSIZE, iter_patient_chunks, read_patient_records
+from models.instrumentation import current_metrics
+from models.parallel import process_records_parallel
+from models.results import LazyResult, RiskResult, collect_results
+from models.maggic_core import (
+  FIELD_ALIASES,
+  PatientParser,
+  patient_id_for,
+  parse_clinical_values,
+  parse_yes_no,
+  check_narrative_inputs,
+  calculate_efr,
+  calculate_efar,
+  calculate_sbpr,
+  calculate_bmir,
+  calculate_crtnr,
+  calculate_gender_points,
+  calculate_nyha_points,
+  calculate_smoker_points,
+  calculate_diabetes_points,
+  calculate_copd_points,
+  calculate_hf_points,
+  calculate_blocker_points,
+  calculate_acei_points,
+  get_risk_category,
+)
+from models.scoring_table import MAGGIC_PLUS_TABLE
+
+# Part of the result cache key: bump when the scores or the narratives change
+# 2: integral float cells (an int column with blanks) parse as ints, not as the field default;
+#    patients with a NaN (blank) name are "Patient <n>" instead of nan
+MODEL_VERSION = '2'
+
+
+PLUS_FIELD_ALIASES = dict(
+  FIELD_ALIASES,
+  sodium=['sodium', 'Sodium'],
+  atrial_fibrillation=['atrial_fibrillation', 'Atrial Fibrillation'],
+  myocardial_infarction=['myocardial_infarction', 'Myocardial Infarction'],
+  stroke=['stroke', 'Stroke'],
+  pci=['pci', 'PCI'],
+  cabg=['cabg', 'CABG'],
+)
+
+
+class PlusPatientParser(PatientParser):
+  """PatientParser for the MAGGIC Risk Plus fields."""
+  field_aliases = PLUS_FIELD_ALIASES
+
+  def __init__(self, **kwargs):
+    # Numeric cells are read as strings so that every field can be .strip()-ed
+    super().__init__(stringify_numbers=True, **kwargs)
+
+  def parse_fields(self, get_value, parsed_data):
+    parse_clinical_values(get_value, parsed_data)
+    parsed_data['sodium'] = float(get_value('sodium', 140))  # Default τιμή 140 mmol/L
+    parsed_data['atrial_fibrillation'] = parse_yes_no(get_value('atrial_fibrillation', 'no'))
+    parsed_data['myocardial_infarction'] = parse_yes_no(get_value('myocardial_infarction', 'no'))
+    parsed_data['stroke'] = parse_yes_no(get_value('stroke', 'no'))
+    parsed_data['pci'] = parse_yes_no(get_value('pci', 'no'))
+    parsed_data['cabg'] = parse_yes_no(get_value('cabg', 'no'))
+    return parsed_data
 
 
 def parse_patient_data(patient_data, default_patient_no):
-  parsed_data = {}
+  return PlusPatientParser().parse(patient_data, default_patient_no)
 
-  # Handle possible different key names with case insensitivity
-  def get_value(keys, default):
-    for key in keys:
-        if key in patient_data:
-            value = patient_data[key]
-            if isinstance(value, (int, float)):
-                return str(value)
-            return value
-    return default
-
-
-  name = get_value(['Name', 'name', 'Patient Name', 'PatientName'], None)
-  if not name:
-    # Fallback: Extract the first column's value
-    first_key = list(patient_data.keys())[0]
-    name = patient_data[first_key]
-    print(f"Warning: 'name' field not found. Using first column '{first_key}' value '{name}' as patient name.")
-
-  parsed_data['name'] = name
-
-  try:
-    parsed_data['age'] = int(get_value(['age', 'Age'], 0))
-  except ValueError:
-    parsed_data['age'] = 0
-
-  gender = get_value(['gender', 'Gender'], 'male').strip().lower()
-  parsed_data['gender'] = gender if gender in ['male', 'female'] else 'male'
-
-  nyha_str = get_value(['nyha_class', 'NYHA Class'], 'I').strip().upper()
-  nyha_class_map = {'I': 1, 'II': 2, 'III': 3, 'IV': 4}
-  parsed_data['nyha_class'] = nyha_class_map.get(nyha_str, 1)
-
-  try:
-    parsed_data['lvef'] = float(get_value(['lvef', 'LVEF'], 30))
-  except ValueError:
-    parsed_data['lvef'] = 30.0
-
-  parsed_data['diabetes'] = get_value(['diabetes', 'Diabetes'], 'no').strip().lower() == 'yes'
-  parsed_data['smoker'] = get_value(['smoker', 'Smoker'], 'no').strip().lower() == 'yes'
-  parsed_data['copd'] = get_value(['copd', 'COPD'], 'no').strip().lower() == 'yes'
-
-  try:
-    parsed_data['sbp'] = int(get_value(['sbp', 'SBP'], 120))
-  except ValueError:
-    parsed_data['sbp'] = 120
-
-  try:
-    parsed_data['creatinine'] = float(get_value(['creatinine', 'Creatinine'], 1.0))
-  except ValueError:
-    parsed_data['creatinine'] = 1.0
-
-  try:
-    parsed_data['bmi'] = float(get_value(['bmi', 'BMI'], 24))
-  except ValueError:
-    parsed_data['bmi'] = 24.0
-
-  parsed_data['beta_blocker'] = get_value(['beta_blocker', 'Beta Blocker'], 'no').strip().lower() == 'yes'
-  parsed_data['ace_arb'] = get_value(['ace_arb', 'ACE_ARB', 'ACE Inhibitors or ARBs'], 'no').strip().lower() == 'yes'
-  parsed_data['hf_duration_less_than_18_months'] = get_value(
-    ['hf_duration_less_than_18_months', 'HF Duration <18 months'], 'no').strip().lower() == 'yes'
-  parsed_data['sodium'] = float(get_value(['sodium', 'Sodium'], 140))  # Default τιμή 140 mmol/L
-  parsed_data['atrial_fibrillation'] = get_value(['atrial_fibrillation', 'Atrial Fibrillation'],
-                                                 'no').strip().lower() == 'yes'
-  parsed_data['myocardial_infarction'] = get_value(['myocardial_infarction', 'Myocardial Infarction'],
-                                                   'no').strip().lower() == 'yes'
-  parsed_data['stroke'] = get_value(['stroke', 'Stroke'], 'no').strip().lower() == 'yes'
-  parsed_data['pci'] = get_value(['pci', 'PCI'], 'no').strip().lower() == 'yes'
-  parsed_data['cabg'] = get_value(['cabg', 'CABG'], 'no').strip().lower() == 'yes'
-  return parsed_data
-
-
-def calculate_efr(ef):
-  if ef == 0 or ef is None:
-    return None
-  elif ef < 20:
-    return 7
-  elif ef < 25:
-    return 6
-  elif ef < 30:
-    return 5
-  elif ef < 35:
-    return 3
-  elif ef < 40:
-    return 2
-  else:
-    return 0
-
-
-def calculate_efar(age, ef, _efr):
-  if age < 18 or age > 110 or age is None:
-    return None
-  elif _efr is not None:
-    if age < 55:
-      return 0
-    elif age < 60:
-      if ef < 30:
-        return 1
-      elif ef < 40:
-        return 2
-      else:
-        return 3
-    elif age < 65:
-      if ef < 30:
-        return 2
-      elif ef < 40:
-        return 4
-      else:
-        return 5
-    elif age < 70:
-      if ef < 30:
-        return 4
-      elif ef < 40:
-        return 6
-      else:
-        return 7
-    elif age < 75:
-      if ef < 30:
-        return 6
-      elif ef < 40:
-        return 8
-      else:
-        return 9
-    elif age < 80:
-      if ef < 30:
-        return 8
-      elif ef < 40:
-        return 10
-      else:
-        return 12
-    else:
-      if ef < 30:
-        return 10
-      elif ef < 40:
-        return 13
-      else:
-        return 15
-  else:
-    return None
-
-
-def calculate_sbpr(sbp, ef):
-  if ef < 1 or ef > 95 or sbp < 50 or sbp > 250:
-    return None
-  else:
-    if sbp < 110:
-      if ef < 30:
-        return 5
-      elif ef < 40:
-        return 3
-      else:
-        return 2
-    elif sbp < 120:
-      if ef < 30:
-        return 4
-      elif ef < 40:
-        return 2
-      else:
-        return 1
-    elif sbp < 130:
-      if ef < 30:
-        return 3
-      elif ef < 40:
-        return 1
-      else:
-        return 1
-    elif sbp < 140:
-      if ef < 30:
-        return 2
-      elif ef < 40:
-        return 1
-      else:
-        return 0
-    elif sbp < 150:
-      if ef < 30:
-        return 1
-      else:
-        return 0
-    else:
-      return 0
-
-
-def calculate_bmir(bmi):
-  if bmi < 10 or bmi > 50:
-    return None
-  else:
-    if bmi < 15:
-      return 6
-    elif bmi < 20:
-      return 5
-    elif bmi < 25:
-      return 3
-    elif bmi < 30:
-      return 2
-    else:
-      return 0
-
-
-def calculate_crtnr(creatinine):
-  if creatinine < 20 or creatinine > 1400:
-    return None
-  else:
-    if creatinine < 90:
-      return 0
-    elif creatinine < 110:
-      return 1
-    elif creatinine < 130:
-      return 2
-    elif creatinine < 150:
-      return 3
-    elif creatinine < 170:
-      return 4
-    elif creatinine < 210:
-      return 5
-    elif creatinine < 250:
-      return 6
-    else:
-      return 8
-
-
-def calculate_gender_points(gender):
-  if gender.lower() == 'female':
-    return -3
-  else:
-    return 0
-
-
-def calculate_nyha_points(nyha_class):
-  nyha_points = {1: 0, 2: 3, 3: 6, 4: 8}
-  return nyha_points.get(nyha_class, 0)
-
-
-def calculate_smoker_points(smoker):
-  return 1 if smoker else 0
-
-
-def calculate_diabetes_points(diabetes):
-  return 3 if diabetes else 0
-
-
-def calculate_copd_points(copd):
-  return 2 if copd else 0
-
-
-def calculate_hf_points(hf_duration_less_than_18_months):
-  return 2 if hf_duration_less_than_18_months else 0
-
-
-def calculate_blocker_points(beta_blocker):
-  return 5 if not beta_blocker else 0
-
-
-def calculate_acei_points(acei_arb):
-  return 3 if not acei_arb else 0
 
 def calculate_sodium_points(sodium):
-    if sodium < 135:
-      return 3
-    else:
-      return 0
+  return MAGGIC_PLUS_TABLE.sodium(sodium)
 
 #HYPOTHETICAL prices for
 # artial fibrillation, myocardial infraction,
 #stroke points, pci,cabg
 def calculate_atrial_fibrillation_points(af):
-  return 3 if af else 0
+  return MAGGIC_PLUS_TABLE.flag('atrial_fibrillation', af)
 
 
 def calculate_myocardial_infarction_points(mi):
-  return 2 if mi else 0
+  return MAGGIC_PLUS_TABLE.flag('myocardial_infarction', mi)
 
 
 def calculate_stroke_points(stroke):
-  return 2 if stroke else 0
+  return MAGGIC_PLUS_TABLE.flag('stroke', stroke)
 
 
 def calculate_pci_points(pci):
-  return -1 if pci else 0
+  return MAGGIC_PLUS_TABLE.flag('pci', pci)
 
 
 def calculate_cabg_points(cabg):
-  return -1  if cabg else 0
+  return MAGGIC_PLUS_TABLE.flag('cabg', cabg)
 
 
 def calculate_maggic_score(patient_data):
-  age = patient_data['age']
-  lvef = patient_data['lvef']
-  ef = lvef  # For consistency with TypeScript code
-  sbp = patient_data['sbp']
-  bmi = patient_data['bmi']
-  creatinine_mg_dl = patient_data['creatinine']
-  creatinine = creatinine_mg_dl * 88.4  # Convert mg/dL to μmol/L
-
-  _efr = calculate_efr(ef)
-  _efar = calculate_efar(age, ef, _efr)
-  _sbpr = calculate_sbpr(sbp, ef)
-  _bmir = calculate_bmir(bmi)
-  _crtnr = calculate_crtnr(creatinine)
-
-  gender_points = calculate_gender_points(patient_data['gender'])
-  nyha_points = calculate_nyha_points(patient_data['nyha_class'])
-  smoker_points = calculate_smoker_points(patient_data['smoker'])
-  diabetes_points = calculate_diabetes_points(patient_data['diabetes'])
-  copd_points = calculate_copd_points(patient_data['copd'])
-  hf_points = calculate_hf_points(patient_data['hf_duration_less_than_18_months'])
-  blocker_points = calculate_blocker_points(patient_data['beta_blocker'])
-  acei_points = calculate_acei_points(patient_data['ace_arb'])
-  sodium_points = calculate_sodium_points(patient_data['sodium'])
-  atrial_fibrillation_points = calculate_atrial_fibrillation_points(patient_data['atrial_fibrillation'])
-  myocardial_infarction_points = calculate_myocardial_infarction_points(patient_data['myocardial_infarction'])
-  stroke_points = calculate_stroke_points(patient_data['stroke'])
-  pci_points = calculate_pci_points(patient_data['pci'])
-  cabg_points = calculate_cabg_points(patient_data['cabg'])
-  # Sum all the points
-  score = (
-    (_efr or 0) +
-    (_efar or 0) +
-    (_sbpr or 0) +
-    (_bmir or 0) +
-    (_crtnr or 0) +
-    gender_points +
-    nyha_points +
-    smoker_points +
-    diabetes_points +
-    copd_points +
-    hf_points +
-    blocker_points +
-    acei_points +
-    sodium_points +
-    atrial_fibrillation_points +
-    myocardial_infarction_points +
-    stroke_points +
-    pci_points +
-    cabg_points
-
-  )
-
-  return score
+  # Point lookups come from the shared, precompiled scoring table
+  return MAGGIC_PLUS_TABLE.score(patient_data)
 
 
 def calculate_1_year_risk(score):
-  risk1 = [
-    0.015, 0.016, 0.018, 0.02, 0.022, 0.024, 0.027, 0.029, 0.032, 0.036,
-    0.039, 0.043, 0.048, 0.052, 0.058, 0.063, 0.07, 0.077, 0.084, 0.093,
-    0.102, 0.111, 0.122, 0.134, 0.147, 0.16, 0.175, 0.191, 0.209, 0.227,
-    0.248, 0.269, 0.292, 0.316, 0.342, 0.369, 0.398, 0.427, 0.458, 0.49,
-    0.523, 0.557, 0.591, 0.625, 0.659, 0.692, 0.725, 0.757, 0.787, 0.816,
-    0.842
-  ]
-  if 0 <= score < len(risk1):
-    return round(100 * risk1[score], 2)  # Percentage % with 2 decimal places
-  return None
+  return MAGGIC_PLUS_TABLE.risk1_year(score)
 
 
 def calculate_3_year_risk(score):
-  risk3 = [
-    0.039, 0.043, 0.048, 0.052, 0.058, 0.063, 0.07, 0.077, 0.084, 0.092,
-    0.102, 0.111, 0.122, 0.134, 0.146, 0.16, 0.175, 0.191, 0.209, 0.227,
-    0.247, 0.269, 0.292, 0.316, 0.342, 0.369, 0.397, 0.427, 0.458, 0.49,
-    0.523, 0.556, 0.59, 0.625, 0.658, 0.692, 0.725, 0.756, 0.787, 0.815,
-    0.842, 0.866, 0.889, 0.908, 0.926, 0.941, 0.953, 0.964, 0.973, 0.98, 0.985
-  ]
-  if 0 <= score < len(risk3):
-    return round(100 * risk3[score], 2)  # Percentage % with 2 decimal places
-  return None
-
-
-def get_risk_category(score):
-  if score <= 19:
-    return 'Low Risk'
-  elif score <= 30:
-    return 'Medium Risk'
-  else:
-    return 'High Risk'
+  return MAGGIC_PLUS_TABLE.risk3_year(score)
 
 
 def generate_health_message_patient(score):
@@ -625,115 +350,137 @@ def generate_patient_description(patient_id, patient_data, score, risk1_year, ri
 
   return description
 
-def process_file_and_calculate(filename):
-    patient_data_list = []
-    file_extension = os.path.splitext(filename)[-1].lower()
-
-    if file_extension == '.csv':
-      try:
-        df = pd.read_csv(filename)
-        patient_data_list = df.to_dict(orient='records')
-      except Exception as e:
-        print(f"Error reading CSV file: {e}")
-
-    elif file_extension == '.txt':
-      try:
-        with open(filename, 'r', encoding='utf-8') as f:
-          lines = f.readlines()
-        headers = lines[0].strip().split(',')
-        for line in lines[1:]:
-          values = line.strip().split(',')
-          patient_data = dict(zip(headers, values))
-          patient_data_list.append(patient_data)
-      except Exception as e:
-        print(f"Error reading TXT file: {e}")
-
-
-    elif file_extension == '.json':
-
-      try:
-        with open(filename, 'r', encoding='utf-8') as f:
-          data = json.load(f)
-        # Debug the loaded data
-        print(f"Loaded JSON data: {data}")
-        if isinstance(data, list):  # Check if it's a list of patient data
-          patient_data_list = data
-        elif isinstance(data, dict):  # If it's a single patient, wrap it in a list
-          patient_data_list = [data]
-        else:
-          raise ValueError("Invalid JSON format: Expected a list or a dictionary.")
-      except json.JSONDecodeError as e:
-        print(f"Error decoding JSON file: {e}")
-      except Exception as e:
-        print(f"Error reading JSON file: {e}")
-
-
-    elif file_extension in ['.xls', '.xlsx']:
-      try:
-        df = pd.read_excel(filename, sheet_name=0)
-        patient_data_list = df.to_dict(orient='records')
-      except Exception as e:
-        print(f"Error reading Excel file: {e}")
-
-    elif file_extension == '.pdf':
-      try:
-        with open(filename, 'rb') as f:
-          reader = PyPDF2.PdfReader(f)
-          text = ""
-          for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-              text += page_text + "\n"
-
-        lines = [line.strip() for line in text.split('\n') if line.strip()]
-        if lines:
-          headers = lines[0].split(',')
-          for line in lines[1:]:
-            values = line.split(',')
-            if len(values) == len(headers):
-              patient_data = dict(zip(headers, values))
-              patient_data_list.append(patient_data)
-      except Exception as e:
-        print(f"Error reading PDF file: {e}")
-
-    results = []
-    for idx, raw_data in enumerate(patient_data_list):
-      try:
-        patient_data = parse_patient_data(raw_data, idx + 1)
-        patient_id = patient_data['name'] if patient_data['name'] else f"Patient {idx + 1}"
-        score = calculate_maggic_score(patient_data)
-        risk1_year = calculate_1_year_risk(score)
-        risk3_year = calculate_3_year_risk(score)
-        category = get_risk_category(score)
-        patient_main_message, patient_recommendations = generate_health_message_patient(score)
-        doctor_main_message, doctor_recommendations = generate_health_message_doctor(score)
-
-        detailed_description = generate_patient_description(
-          patient_id=patient_id,
-          patient_data=patient_data,
-          score=score,
-          risk1_year=risk1_year,
-          risk3_year=risk3_year,
-          category=category
-        )
-
-        results.append({
-          "patient_id": patient_id,
-          "patient_data": patient_data,
-          "detailed_description": detailed_description,
-          "score": score,
-          "risk1_year": risk1_year,
-          "risk3_year": risk3_year,
-          "category": category,
-          "patient_message": (patient_main_message, patient_recommendations),
-          "doctor_message": (doctor_main_message, doctor_recommendations)
-        })
-      except Exception as e:
-        print(f"Error processing patient data: {e}")
+def process_file_and_calculate(filename, workers=None, narratives='eager', result_type='dict', progress=None):
+    """
+    Score every patient in `filename`.
+    With workers=N (N > 1) the patients are scored on N processes in
+    order-preserving chunks. With narratives='lazy' the descriptions and
+    messages are only built when a result field is read; result_type='record'
+    returns compact RiskResult objects.
+    """
+    metrics = current_metrics()
+    # Column aliases are resolved once for the whole file
+    parser = PlusPatientParser()
+    with metrics.stage('read'):
+      patient_data_list = read_patient_records(filename, columns=parser.uses_column)
+
+    process = partial(process_patient, narratives=narratives, result_type=result_type, parse=parser)
+    if workers and workers > 1:
+      if patient_data_list:
+        # Plan the headers (and print their warnings) once, before the parser is copied to the workers
+        parser.plan_for(patient_data_list[0])
+      processed = process_records_parallel(process, patient_data_list, workers)
+    else:
+      processed = (process(raw_data, idx) for idx, raw_data in enumerate(patient_data_list))
+
+    with metrics.stage('score'):
+      results = collect_results(processed, len(patient_data_list), progress)
+    metrics.count('rows_parsed', len(patient_data_list))
+    metrics.count('rows_rejected', len(patient_data_list) - len(results))
 
     return results
 
 
-def run_model(file_path):
-  return process_file_and_calculate(file_path)
+def describe_patient(result):
+  return generate_patient_description(
+    patient_id=result['patient_id'],
+    patient_data=result['patient_data'],
+    score=result['score'],
+    risk1_year=result['risk1_year'],
+    risk3_year=result['risk3_year'],
+    category=result['category']
+  )
+
+
+def patient_message(result):
+  return generate_health_message_patient(result['score'])
+
+
+def doctor_message(result):
+  return generate_health_message_doctor(result['score'])
+
+
+# Builders of the narrative result fields, shared by the eager and lazy modes
+NARRATORS = {
+  'detailed_description': describe_patient,
+  'patient_message': patient_message,
+  'doctor_message': doctor_message,
+}
+
+
+def process_patient(raw_data, idx, narratives='eager', result_type='dict', parse=parse_patient_data):
+  """
+  Score one raw patient record; returns the result dict or None on error.
+  narratives='lazy' returns a LazyResult whose narrative fields are built
+  on first access instead of up front; result_type='record' returns a
+  compact RiskResult without the narrative fields. Pass the file's
+  PatientParser as `parse` when scoring many records.
+  """
+  try:
+    patient_data = parse(raw_data, idx + 1)
+    patient_id = patient_id_for(patient_data['name'], idx + 1)
+    score = calculate_maggic_score(patient_data)
+
+    result = {
+      "patient_id": patient_id,
+      "patient_data": patient_data,
+      "score": score,
+      "risk1_year": calculate_1_year_risk(score),
+      "risk3_year": calculate_3_year_risk(score),
+      "category": get_risk_category(score),
+    }
+    if result_type == 'record':
+      return RiskResult.from_dict(result)
+    # Patients the narratives cannot describe are dropped in both narrative modes
+    check_narrative_inputs(patient_data)
+    if narratives == 'lazy':
+      return LazyResult(result, NARRATORS)
+
+    for field, narrator in NARRATORS.items():
+      result[field] = narrator(result)
+    return result
+  except Exception as e:
+    print(f"Error processing patient data: {e}")
+    return None
+
 
+def stream_file_and_calculate(filename, chunksize=DEFAULT_CHUNKSIZE, narratives='eager', result_type='dict'):
+  """
+  Streaming version of process_file_and_calculate.
+  Reads the file `chunksize` rows at a time and yields one result dict per
+  patient as soon as it is scored.
+  """
+  parser = PlusPatientParser()
+  idx = 0
+  for chunk in iter_patient_chunks(filename, chunksize, columns=parser.uses_column):
+    for raw_data in chunk:
+      result = process_patient(raw_data, idx, narratives=narratives, result_type=result_type, parse=parser)
+      idx += 1
+      if result is not None:
+        yield result
+
+
+def score_file_batch(filename, chunksize=DEFAULT_CHUNKSIZE, typed_csv=True):
+  """
+  Score `filename` into a NumPy-backed ResultBatch, one vectorized pass per
+  chunk. CSV files are read with declared dtypes (see models.typed_csv)
+  unless typed_csv=False.
+  """
+  from models.batch_scoring import score_patient_file
+  return score_patient_file(filename, PlusPatientParser(), MAGGIC_PLUS_TABLE, chunksize=chunksize, typed_csv=typed_csv)
+
+
+def run_model(file_path, stream=False, chunksize=DEFAULT_CHUNKSIZE, workers=None, narratives='eager',
+              result_type='dict', progress=None):
+  """
+  result_type selects the result form: 'dict' (the result dicts), 'record'
+  (RiskResult objects) or 'batch' (a single ResultBatch; stream, workers and
+  narratives do not apply). progress(done, total) is called as the rows of a
+  non-streaming run are scored.
+  """
+  if result_type == 'batch':
+    return score_file_batch(file_path, chunksize=chunksize)
+  if stream:
+    return stream_file_and_calculate(file_path, chunksize=chunksize, narratives=narratives, result_type=result_type)
+  return process_file_and_calculate(file_path, workers=workers, narratives=narratives, result_type=result_type,
+                                    progress=progress)
@@ -0,0 +1,54 @@
+# memo.py
+# Bounded LRU memo with hit/miss counters.
+from collections import OrderedDict
+
+
+class LRUMemo:
+  """
+  Keeps the values of the `maxsize` most recently used keys.
+  Lock-free: each step is a single OrderedDict operation, so concurrent
+  callers at worst recompute a value or miscount a hit.
+  """
+
+  def __init__(self, maxsize=4096):
+    self.maxsize = maxsize
+    self.data = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+
+  def lookup(self, key):
+    """The memoized value of `key`, or None (counted as a miss)."""
+    value = self.data.get(key)
+    if value is None:
+      self.misses += 1
+      return None
+    self.hits += 1
+    try:
+      self.data.move_to_end(key)
+    except KeyError:
+      pass
+    return value
+
+  def store(self, key, value):
+    data = self.data
+    data[key] = value
+    if len(data) > self.maxsize:
+      try:
+        data.popitem(last=False)
+      except KeyError:
+        pass
+
+  def stats(self):
+    calls = self.hits + self.misses
+    return {
+      'hits': self.hits,
+      'misses': self.misses,
+      'hit_rate': self.hits / calls if calls else None,
+      'size': len(self.data),
+      'maxsize': self.maxsize,
+    }
+
+  def clear(self):
+    self.data.clear()
+    self.hits = 0
+    self.misses = 0
@@ -0,0 +1,45 @@
+# parallel.py
+# Order-preserving multi-process scoring for large cohorts.
+# The patient list is cut into contiguous chunks, each chunk is scored in a
+# worker process and the results are handed back in the original order.
+# Every process pool of the models (see also pdf_reader and excel_reader)
+# starts its workers with mp_context(): the apps run the models on JobQueue
+# threads, and forking a threaded process can deadlock the child.
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+# Chunks per worker: enough to balance uneven chunks without paying the
+# pickling overhead of one task per patient.
+CHUNKS_PER_WORKER = 4
+
+
+def mp_context():
+  """Start method of the worker processes: forkserver, or spawn where that is not available (Windows)."""
+  methods = multiprocessing.get_all_start_methods()
+  return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def _process_chunk(process_patient, start, records, on_chunk=None):
+  results = [process_patient(raw_data, start + offset) for offset, raw_data in enumerate(records)]
+  if on_chunk is not None:
+    on_chunk(start, results)
+  return results
+
+
+def process_records_parallel(process_patient, records, workers, chunksize=None, on_chunk=None):
+  """
+  Run process_patient(raw_data, idx) over `records` on `workers` processes.
+  `process_patient` must be a module-level function so it can be pickled.
+  Yields the results (including None for failed patients) in input order.
+  on_chunk(start, results), if given, is called in the worker after each
+  chunk (e.g. to write the chunk's output); it must be picklable as well.
+  """
+  if chunksize is None:
+    chunksize = max(1, -(-len(records) // (workers * CHUNKS_PER_WORKER)))
+  starts = range(0, len(records), chunksize)
+  chunks = (records[start:start + chunksize] for start in starts)
+
+  with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context()) as executor:
+    for results in executor.map(_process_chunk, repeat(process_patient), starts, chunks, repeat(on_chunk)):
+      yield from results
@@ -0,0 +1,204 @@
+# pdf_reader.py
+# PDF ingestion for models.file_readers.
+# Text is extracted page by page and rows are emitted as each page arrives,
+# so no document-sized string is ever built. Documents of at least
+# PARALLEL_MIN_PAGES pages are extracted on several processes: every worker
+# opens the PDF once and extracts batches of PAGES_PER_TASK pages, which are
+# handed back in page order. The workers are started with forkserver (see
+# models.parallel.mp_context); configure_workers() caps how many are
+# started per document.
+# The first non-empty line holds the headers. Rows with a different number
+# of columns cannot be mapped to them; they are skipped, counted (the
+# pdf_rows_dropped metric) and reported once the document has been read.
+# With a page cache configured (configure_page_cache), the extracted text is
+# kept on disk by page_key, a hash of the page's content stream and fonts.
+# The cache is opt-in: without it every page is extracted.
+# A re-uploaded export that only gained or changed a few pages only has
+# those pages extracted; hashing a page costs a fraction of a millisecond,
+# extracting its text tens of milliseconds.
+import hashlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from models.instrumentation import current_metrics
+from models.parallel import mp_context
+from models.result_cache import make_result_cache
+
+PARALLEL_MIN_PAGES = 32
+PAGES_PER_TASK = 8
+
+# Extracted page text is kept for monthly re-exports
+PAGE_CACHE_TTL = 45 * 24 * 3600
+
+# The document opened by each extraction worker
+_worker_reader = None
+
+# Most extraction workers per document; None until configure_workers() is called
+_max_workers = None
+
+# Extracted page text by page_key; None until configure_page_cache() is called
+_page_cache = None
+
+
+def configure_page_cache(directory, **kwargs):
+  """
+  Cache the extracted text of every page under `directory` (a
+  DiskResultCache, see models.result_cache); an empty directory turns the
+  cache off.
+  """
+  global _page_cache
+  if directory:
+    kwargs.setdefault('ttl', PAGE_CACHE_TTL)
+    _page_cache = make_result_cache(directory, **kwargs)
+  else:
+    _page_cache = None
+  return _page_cache
+
+
+def configure_workers(max_workers):
+  """Extract every document on at most `max_workers` processes; None (or 0) lifts the cap."""
+  global _max_workers
+  _max_workers = max_workers or None
+  return _max_workers
+
+
+def _open_reader(source):
+  import PyPDF2
+  if isinstance(source, bytes):
+    return PyPDF2.PdfReader(io.BytesIO(source))
+  return PyPDF2.PdfReader(source)
+
+
+def _update_digest(digest, value):
+  # Hash a PDF object by value: streams by their decoded data, dictionaries
+  # and arrays element by element, with indirect references resolved
+  value = value.get_object()
+  if hasattr(value, 'get_data'):
+    digest.update(b"stream:")
+    digest.update(value.get_data())
+  elif isinstance(value, dict):
+    digest.update(b"<<")
+    for key in sorted(value):
+      digest.update(f"{key}=".encode())
+      _update_digest(digest, value[key])
+    digest.update(b">>")
+  elif isinstance(value, list):
+    digest.update(b"[")
+    for item in value:
+      _update_digest(digest, item)
+    digest.update(b"]")
+  else:
+    digest.update(f"{value!s};".encode())
+
+
+def page_key(page):
+  """
+  Cache key of a page's text: a hash of its decoded content stream and the
+  fonts it uses (their /ToUnicode maps and /Encoding included, since the
+  text is decoded through them), plus the PyPDF2 version that extracts it.
+  """
+  import PyPDF2
+  digest = hashlib.sha256()
+  contents = page.get_contents()
+  if contents is not None:
+    digest.update(contents.get_data())
+  resources = page.get('/Resources')
+  fonts = resources.get_object().get('/Font') if resources is not None else None
+  fonts = fonts.get_object() if fonts is not None else {}
+  for name in sorted(fonts):
+    font = fonts[name].get_object()
+    digest.update(f"{name}={font.get('/BaseFont')};".encode())
+    for key in ('/ToUnicode', '/Encoding'):
+      if key in font:
+        digest.update(f"{key}=".encode())
+        _update_digest(digest, font[key])
+  return f"pdf-page-{PyPDF2.__version__}-{digest.hexdigest()}"
+
+
+def _init_worker(source):
+  global _worker_reader
+  _worker_reader = _open_reader(source)
+
+
+def _extract_pages(indices):
+  return [_worker_reader.pages[i].extract_text() for i in indices]
+
+
+def _extract(reader, source, indices, workers):
+  # Text of the pages at `indices`, in that order
+  if workers <= 1 or len(indices) < PARALLEL_MIN_PAGES:
+    for i in indices:
+      yield reader.pages[i].extract_text()
+    return
+
+  tasks = [indices[i:i + PAGES_PER_TASK] for i in range(0, len(indices), PAGES_PER_TASK)]
+  workers = min(workers, len(tasks))
+  with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context(), initializer=_init_worker,
+                           initargs=(source,)) as executor:
+    for texts in executor.map(_extract_pages, tasks):
+      yield from texts
+
+
+def iter_page_texts(source, workers=None):
+  """
+  Yield the text of every page of `source` (a path or the PDF bytes) in page
+  order. Pages found in the page cache are not extracted again. workers=None
+  uses every CPU once PARALLEL_MIN_PAGES pages or more need extracting;
+  workers=1 always extracts in this process. Either way no more than the
+  configure_workers() cap are started.
+  """
+  reader = _open_reader(source)
+  if workers is None:
+    workers = os.cpu_count() or 1
+  if _max_workers is not None:
+    workers = min(workers, _max_workers)
+  cache = _page_cache
+  if cache is None:
+    yield from _extract(reader, source, range(len(reader.pages)), workers)
+    return
+
+  keys = [page_key(page) for page in reader.pages]
+  cached = [cache.get(key) for key in keys]
+  missing = [i for i, text in enumerate(cached) if text is None]
+  metrics = current_metrics()
+  metrics.count('pdf_pages_cached', len(keys) - len(missing))
+  metrics.count('pdf_pages_extracted', len(missing))
+
+  extracted = _extract(reader, source, missing, workers)
+  new_texts = []
+  for key, text in zip(keys, cached):
+    if text is None:
+      text = next(extracted)
+      new_texts.append((key, text))
+    yield text
+  cache.put_many(new_texts)
+
+
+def iter_pdf_records(source, workers=None):
+  """Yield the raw patient records of a PDF (a path or its bytes) page by page."""
+  headers = None
+  dropped = 0
+  first_dropped_page = None
+  for page_no, page_text in enumerate(iter_page_texts(source, workers), 1):
+    if not page_text:
+      continue
+    for line in page_text.split('\n'):
+      line = line.strip()
+      if not line:
+        continue
+      if headers is None:
+        headers = line.split(',')
+        continue
+      values = line.split(',')
+      if len(values) == len(headers):
+        yield dict(zip(headers, values))
+      else:
+        dropped += 1
+        if first_dropped_page is None:
+          first_dropped_page = page_no
+
+  if dropped:
+    print(f"Warning: skipped {dropped} PDF rows whose column count does not match the {len(headers)} headers "
+          f"(first on page {first_dropped_page}).")
+  current_metrics().count('pdf_rows_dropped', dropped)
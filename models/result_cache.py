@@ -0,0 +1,173 @@
+# result_cache.py
+# Cache of finished upload results keyed by (file content hash, model,
+# model version), so that re-uploading the same cohort skips parsing and
+# scoring. Entries expire `ttl` seconds after they are stored and the least
+# recently used are evicted past the size limit. MemoryResultCache keeps the
+# values in this process; DiskResultCache pickles them to a local directory
+# so they survive restarts and are shared between processes.
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def hash_stream(stream):
+  """SHA-256 hex digest of a binary stream (e.g. an uploaded file), rewound afterwards."""
+  digest = hashlib.sha256()
+  for block in iter(lambda: stream.read(HASH_BLOCK_SIZE), b''):
+    digest.update(block)
+  stream.seek(0)
+  return digest.hexdigest()
+
+
+def _remove(path):
+  # Another process may have evicted the same file already
+  try:
+    os.remove(path)
+  except OSError:
+    pass
+
+
+def _touch(path, atime, mtime):
+  try:
+    os.utime(path, (atime, mtime))
+  except OSError:
+    pass
+
+
+def cache_key(content_hash, model, model_version):
+  return f"{content_hash}-{model}-{model_version}"
+
+
+class MemoryResultCache:
+  """In-process LRU cache holding at most `max_entries` results."""
+
+  def __init__(self, max_entries=32, ttl=3600):
+    self.max_entries = max_entries
+    self.ttl = ttl
+    self.entries = OrderedDict()
+    self.lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+
+  def get(self, key):
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry is None or time.time() - entry[0] > self.ttl:
+        self.entries.pop(key, None)
+        self.misses += 1
+        return None
+      self.entries.move_to_end(key)
+      self.hits += 1
+      return entry[1]
+
+  def put(self, key, value):
+    with self.lock:
+      self.entries[key] = (time.time(), value)
+      self.entries.move_to_end(key)
+      while len(self.entries) > self.max_entries:
+        self.entries.popitem(last=False)
+
+  def put_many(self, items):
+    for key, value in items:
+      self.put(key, value)
+
+  def clear(self):
+    with self.lock:
+      self.entries.clear()
+
+
+class DiskResultCache:
+  """
+  Pickled results under `directory`, at most `max_bytes` in total. A file's
+  mtime is when it was stored (for the ttl) and its atime when it was last
+  read or stored (least recently used evicted first).
+  """
+
+  def __init__(self, directory, max_bytes=512 * 1024 * 1024, ttl=24 * 3600):
+    self.directory = directory
+    self.max_bytes = max_bytes
+    self.ttl = ttl
+    self.lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+    os.makedirs(directory, exist_ok=True)
+
+  def _path(self, key):
+    return os.path.join(self.directory, f"{key}.pkl")
+
+  def get(self, key):
+    path = self._path(key)
+    try:
+      now = time.time()
+      mtime = os.path.getmtime(path)
+      if now - mtime > self.ttl:
+        _remove(path)
+        raise FileNotFoundError(path)
+      with open(path, 'rb') as f:
+        value = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+      self.misses += 1
+      return None
+    # Mark it used (noatime/relatime mounts would not on read); the mtime is kept for the ttl
+    _touch(path, now, mtime)
+    self.hits += 1
+    return value
+
+  def _write(self, key, value):
+    path = self._path(key)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+      pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+  def put(self, key, value):
+    self._write(key, value)
+    self._evict()
+
+  def put_many(self, items):
+    """Store several (key, value) pairs with a single eviction pass."""
+    for key, value in items:
+      self._write(key, value)
+    self._evict()
+
+  def _evict(self):
+    with self.lock:
+      now = time.time()
+      entries = []
+      for name in os.listdir(self.directory):
+        if not name.endswith('.pkl'):
+          continue
+        path = os.path.join(self.directory, name)
+        try:
+          stat = os.stat(path)
+        except OSError:
+          continue
+        if now - stat.st_mtime > self.ttl:
+          _remove(path)
+        else:
+          entries.append((stat.st_atime, stat.st_size, path))
+
+      total = sum(size for _, size, _ in entries)
+      for _, size, path in sorted(entries):
+        if total <= self.max_bytes:
+          break
+        _remove(path)
+        total -= size
+
+  def clear(self):
+    with self.lock:
+      for name in os.listdir(self.directory):
+        if name.endswith('.pkl'):
+          _remove(os.path.join(self.directory, name))
+
+
+def make_result_cache(directory=None, **kwargs):
+  """A DiskResultCache under `directory`, or a MemoryResultCache if it is empty."""
+  if directory:
+    return DiskResultCache(directory, **kwargs)
+  return MemoryResultCache(**kwargs)
@@ -0,0 +1,154 @@
+# results.py
+# Result containers returned by the models.
+# The NumPy-backed ResultBatch for bulk runs lives in models.batch_scoring.
+from dataclasses import asdict, dataclass, fields, is_dataclass
+
+NARRATIVE_FIELDS = ['detailed_description', 'patient_message', 'doctor_message']
+
+
+class LazyResult(dict):
+  """
+  Result dict whose narrative fields are generated on first access.
+  `narrators` maps a field name to a function taking the result and
+  returning its value; the value is stored, so each field is built once.
+  Subscript access (result['x'], and result.x in a Jinja template) triggers
+  the narrator; `in`, .get() and iteration only see the fields built so far.
+  """
+
+  def __init__(self, data, narrators):
+    super().__init__(data)
+    self.narrators = narrators
+
+  def __missing__(self, key):
+    narrator = self.narrators.get(key)
+    if narrator is None:
+      raise KeyError(key)
+    value = self[key] = narrator(self)
+    return value
+
+  def materialize(self):
+    """Build every pending narrative field and return self."""
+    for key in self.narrators:
+      self[key]
+    return self
+
+
+@dataclass(slots=True)
+class PatientRecord:
+  """
+  Parsed model inputs of one patient, the compact form of the dict returned
+  by parse_patient_data. The MAGGIC Risk Plus fields stay None for the
+  basic model. Supports record['field'] so the scoring and narrative
+  functions accept it in place of the dict.
+  """
+  name: object
+  age: int
+  gender: str
+  nyha_class: int
+  lvef: float
+  diabetes: bool
+  smoker: bool
+  copd: bool
+  sbp: int
+  creatinine: float
+  bmi: float
+  beta_blocker: bool
+  ace_arb: bool
+  hf_duration_less_than_18_months: bool
+  sodium: float = None
+  atrial_fibrillation: bool = None
+  myocardial_infarction: bool = None
+  stroke: bool = None
+  pci: bool = None
+  cabg: bool = None
+
+  @classmethod
+  def from_dict(cls, patient_data):
+    return cls(**{name: patient_data[name] for name in PATIENT_RECORD_FIELDS if name in patient_data})
+
+  def __getitem__(self, key):
+    try:
+      return getattr(self, key)
+    except AttributeError:
+      raise KeyError(key) from None
+
+  def to_dict(self):
+    return {name: getattr(self, name) for name in PATIENT_RECORD_FIELDS if getattr(self, name) is not None}
+
+
+@dataclass(slots=True)
+class RiskResult:
+  """Scored patient without the narrative fields; supports result['field'] like the result dicts."""
+  patient_id: object
+  patient_data: PatientRecord
+  score: int
+  risk1_year: float
+  risk3_year: float
+  category: str
+
+  @classmethod
+  def from_dict(cls, result):
+    patient_data = result['patient_data']
+    if patient_data is not None and not isinstance(patient_data, PatientRecord):
+      patient_data = PatientRecord.from_dict(patient_data)
+    return cls(result['patient_id'], patient_data, result['score'], result['risk1_year'],
+               result['risk3_year'], result['category'])
+
+  def __getitem__(self, key):
+    try:
+      return getattr(self, key)
+    except AttributeError:
+      raise KeyError(key) from None
+
+  def to_dict(self):
+    return {
+      "patient_id": self.patient_id,
+      "patient_data": self.patient_data.to_dict() if self.patient_data is not None else None,
+      "score": self.score,
+      "risk1_year": self.risk1_year,
+      "risk3_year": self.risk3_year,
+      "category": self.category,
+    }
+
+
+PATIENT_RECORD_FIELDS = [field.name for field in fields(PatientRecord)]
+
+
+# How often (in rows) collect_results reports progress
+PROGRESS_EVERY = 500
+
+
+def collect_results(processed, total, progress=None):
+  """
+  List the results of `processed`, dropping the failed (None) ones.
+  progress(done, total) is called every PROGRESS_EVERY rows and at the end.
+  """
+  if progress is None:
+    return [result for result in processed if result is not None]
+
+  results = []
+  done = 0
+  for done, result in enumerate(processed, 1):
+    if result is not None:
+      results.append(result)
+    if done % PROGRESS_EVERY == 0:
+      progress(done, total)
+  progress(done, total)
+  return results
+
+
+def json_ready(value):
+  """
+  `value` (results, result dicts, records, ...) with every NaN float as
+  None, for a strict JSON response: jsonify writes NaN as a bare `NaN`.
+  """
+  if isinstance(value, float):
+    return None if value != value else value
+  if isinstance(value, dict):
+    # .items() of a LazyResult only holds the fields built so far, as jsonify sees it
+    return {key: json_ready(item) for key, item in value.items()}
+  if isinstance(value, (list, tuple)):
+    return [json_ready(item) for item in value]
+  if is_dataclass(value) and not isinstance(value, type):
+    return json_ready(asdict(value))
+  return value
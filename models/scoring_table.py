@@ -0,0 +1,278 @@
+# scoring_table.py
+# Compiled MAGGIC scoring table shared by every model.
+# Each continuous input is binned once with bisect and its points come from
+# precomputed lists (2-D for the age x EF and SBP x EF interactions), which
+# replaces the if/elif ladders that used to live in every model file.
+import json
+from bisect import bisect_right
+
+# Coefficients of the original MAGGIC risk score. A bin list of edges
+# [e0, e1, ...] maps x < e0 to points[0], e0 <= x < e1 to points[1], ...,
+# and anything past the last edge (or NaN) to points[-1].
+MAGGIC_COEFFICIENTS = {
+  'ef': {
+    'edges': [20, 25, 30, 35, 40],
+    'points': [7, 6, 5, 3, 2, 0],
+  },
+  'age_ef': {
+    'age_range': [18, 110],
+    'age_edges': [55, 60, 65, 70, 75, 80],
+    'ef_edges': [30, 40],
+    'points': [
+      [0, 0, 0],
+      [1, 2, 3],
+      [2, 4, 5],
+      [4, 6, 7],
+      [6, 8, 9],
+      [8, 10, 12],
+      [10, 13, 15],
+    ],
+  },
+  'sbp_ef': {
+    'ef_range': [1, 95],
+    'sbp_range': [50, 250],
+    'sbp_edges': [110, 120, 130, 140, 150],
+    'ef_edges': [30, 40],
+    'points': [
+      [5, 3, 2],
+      [4, 2, 1],
+      [3, 1, 1],
+      [2, 1, 0],
+      [1, 0, 0],
+      [0, 0, 0],
+    ],
+  },
+  'bmi': {
+    'range': [10, 50],
+    'edges': [15, 20, 25, 30],
+    'points': [6, 5, 3, 2, 0],
+  },
+  # Creatinine is binned in μmol/L; patient values are in mg/dL
+  'creatinine': {
+    'mg_dl_to_umol_l': 88.4,
+    'range': [20, 1400],
+    'edges': [90, 110, 130, 150, 170, 210, 250],
+    'points': [0, 1, 2, 3, 4, 5, 6, 8],
+  },
+  'nyha': {1: 0, 2: 3, 3: 6, 4: 8},
+  'female': -3,
+  # Points added when the flag is set
+  'flags': {
+    'smoker': 1,
+    'diabetes': 3,
+    'copd': 2,
+    'hf_duration_less_than_18_months': 2,
+  },
+  # Points added when the treatment is missing
+  'missing_treatments': {
+    'beta_blocker': 5,
+    'ace_arb': 3,
+  },
+  'risk1': [
+    0.015, 0.016, 0.018, 0.02, 0.022, 0.024, 0.027, 0.029, 0.032, 0.036,
+    0.039, 0.043, 0.048, 0.052, 0.058, 0.063, 0.07, 0.077, 0.084, 0.093,
+    0.102, 0.111, 0.122, 0.134, 0.147, 0.16, 0.175, 0.191, 0.209, 0.227,
+    0.248, 0.269, 0.292, 0.316, 0.342, 0.369, 0.398, 0.427, 0.458, 0.49,
+    0.523, 0.557, 0.591, 0.625, 0.659, 0.692, 0.725, 0.757, 0.787, 0.816,
+    0.842
+  ],
+  'risk3': [
+    0.039, 0.043, 0.048, 0.052, 0.058, 0.063, 0.07, 0.077, 0.084, 0.092,
+    0.102, 0.111, 0.122, 0.134, 0.146, 0.16, 0.175, 0.191, 0.209, 0.227,
+    0.247, 0.269, 0.292, 0.316, 0.342, 0.369, 0.397, 0.427, 0.458, 0.49,
+    0.523, 0.556, 0.59, 0.625, 0.658, 0.692, 0.725, 0.756, 0.787, 0.815,
+    0.842, 0.866, 0.889, 0.908, 0.926, 0.941, 0.953, 0.964, 0.973, 0.98, 0.985
+  ],
+}
+
+# MAGGIC Risk Plus adds sodium and (HYPOTHETICAL) history points
+MAGGIC_PLUS_COEFFICIENTS = dict(
+  MAGGIC_COEFFICIENTS,
+  flags=dict(
+    MAGGIC_COEFFICIENTS['flags'],
+    atrial_fibrillation=3,
+    myocardial_infarction=2,
+    stroke=2,
+    pci=-1,
+    cabg=-1,
+  ),
+  low_sodium={'threshold': 135, 'points': 3},
+)
+
+
+class ScoringTable:
+  """Precomputed MAGGIC point tables built from a coefficients dict."""
+
+  def __init__(self, coefficients):
+    self.coefficients = coefficients
+
+    ef = coefficients['ef']
+    self.ef_edges = list(ef['edges'])
+    self.ef_points = list(ef['points'])
+
+    age_ef = coefficients['age_ef']
+    self.age_min, self.age_max = age_ef['age_range']
+    self.age_edges = list(age_ef['age_edges'])
+    self.age_ef_edges = list(age_ef['ef_edges'])
+    self.age_ef_points = [list(row) for row in age_ef['points']]
+
+    sbp_ef = coefficients['sbp_ef']
+    self.sbp_ef_min, self.sbp_ef_max = sbp_ef['ef_range']
+    self.sbp_min, self.sbp_max = sbp_ef['sbp_range']
+    self.sbp_edges = list(sbp_ef['sbp_edges'])
+    self.sbp_ef_edges = list(sbp_ef['ef_edges'])
+    self.sbp_ef_points = [list(row) for row in sbp_ef['points']]
+
+    bmi = coefficients['bmi']
+    self.bmi_min, self.bmi_max = bmi['range']
+    self.bmi_edges = list(bmi['edges'])
+    self.bmi_points = list(bmi['points'])
+
+    creatinine = coefficients['creatinine']
+    self.creatinine_factor = creatinine['mg_dl_to_umol_l']
+    self.creatinine_min, self.creatinine_max = creatinine['range']
+    self.creatinine_edges = list(creatinine['edges'])
+    self.creatinine_points = list(creatinine['points'])
+
+    # JSON object keys are strings, the parsed NYHA class is an int
+    self.nyha_points = {int(k): v for k, v in coefficients['nyha'].items()}
+    self.female_points = coefficients['female']
+    self.flag_points = list(coefficients['flags'].items())
+    self.missing_treatment_points = list(coefficients['missing_treatments'].items())
+
+    low_sodium = coefficients.get('low_sodium')
+    self.sodium_threshold = low_sodium['threshold'] if low_sodium else None
+    self.sodium_points = low_sodium['points'] if low_sodium else 0
+
+    # Rounded exactly as the risk functions always did, once per table
+    self.risk1 = list(coefficients['risk1'])
+    self.risk3 = list(coefficients['risk3'])
+    self.risk1_percent = [round(100 * r, 2) for r in self.risk1]
+    self.risk3_percent = [round(100 * r, 2) for r in self.risk3]
+
+    # score(patient_data) -> total MAGGIC score for a parsed patient dict
+    self.score = self._compile_scorer()
+
+  @classmethod
+  def from_json(cls, path):
+    """Load a table from a JSON file holding a coefficients dict."""
+    with open(path, 'r', encoding='utf-8') as f:
+      return cls(json.load(f))
+
+  def to_json(self, path):
+    with open(path, 'w', encoding='utf-8') as f:
+      json.dump(self.coefficients, f, indent=2)
+
+  # Individual factors; None means "outside the valid range" (0 points)
+
+  def efr(self, ef):
+    if ef == 0 or ef is None:
+      return None
+    return self.ef_points[bisect_right(self.ef_edges, ef)]
+
+  def efar(self, age, ef, _efr):
+    if age < self.age_min or age > self.age_max or age is None:
+      return None
+    if _efr is None:
+      return None
+    return self.age_ef_points[bisect_right(self.age_edges, age)][bisect_right(self.age_ef_edges, ef)]
+
+  def sbpr(self, sbp, ef):
+    if ef < self.sbp_ef_min or ef > self.sbp_ef_max or sbp < self.sbp_min or sbp > self.sbp_max:
+      return None
+    return self.sbp_ef_points[bisect_right(self.sbp_edges, sbp)][bisect_right(self.sbp_ef_edges, ef)]
+
+  def bmir(self, bmi):
+    if bmi < self.bmi_min or bmi > self.bmi_max:
+      return None
+    return self.bmi_points[bisect_right(self.bmi_edges, bmi)]
+
+  def crtnr(self, creatinine):
+    """`creatinine` in μmol/L."""
+    if creatinine < self.creatinine_min or creatinine > self.creatinine_max:
+      return None
+    return self.creatinine_points[bisect_right(self.creatinine_edges, creatinine)]
+
+  def gender(self, gender):
+    return self.female_points if gender.lower() == 'female' else 0
+
+  def nyha(self, nyha_class):
+    return self.nyha_points.get(nyha_class, 0)
+
+  def flag(self, name, value):
+    return self.coefficients['flags'][name] if value else 0
+
+  def missing_treatment(self, name, value):
+    return self.coefficients['missing_treatments'][name] if not value else 0
+
+  def sodium(self, sodium):
+    if self.sodium_threshold is not None and sodium < self.sodium_threshold:
+      return self.sodium_points
+    return 0
+
+  def _compile_scorer(self):
+    """
+    Build the per-patient scoring function.
+    Every table is bound as a local of the closure, so the hot path does no
+    attribute lookups; the factor methods above are inlined.
+    """
+    ef_edges, ef_points = self.ef_edges, self.ef_points
+    age_min, age_max, age_edges = self.age_min, self.age_max, self.age_edges
+    age_ef_edges, age_ef_points = self.age_ef_edges, self.age_ef_points
+    sbp_ef_min, sbp_ef_max, sbp_min, sbp_max = self.sbp_ef_min, self.sbp_ef_max, self.sbp_min, self.sbp_max
+    sbp_edges, sbp_ef_edges, sbp_ef_points = self.sbp_edges, self.sbp_ef_edges, self.sbp_ef_points
+    bmi_min, bmi_max, bmi_edges, bmi_points = self.bmi_min, self.bmi_max, self.bmi_edges, self.bmi_points
+    creatinine_factor = self.creatinine_factor
+    creatinine_min, creatinine_max = self.creatinine_min, self.creatinine_max
+    creatinine_edges, creatinine_points = self.creatinine_edges, self.creatinine_points
+    nyha_points, female_points = self.nyha_points, self.female_points
+    flag_points = tuple(self.flag_points)
+    missing_treatment_points = tuple(self.missing_treatment_points)
+    sodium_threshold, sodium_points = self.sodium_threshold, self.sodium_points
+
+    def score(patient_data):
+      ef = patient_data['lvef']
+      age = patient_data['age']
+      sbp = patient_data['sbp']
+      bmi = patient_data['bmi']
+      creatinine = patient_data['creatinine'] * creatinine_factor
+
+      total = nyha_points.get(patient_data['nyha_class'], 0)
+      if ef != 0:
+        total += ef_points[bisect_right(ef_edges, ef)]
+        if not (age < age_min or age > age_max):
+          total += age_ef_points[bisect_right(age_edges, age)][bisect_right(age_ef_edges, ef)]
+      if not (ef < sbp_ef_min or ef > sbp_ef_max or sbp < sbp_min or sbp > sbp_max):
+        total += sbp_ef_points[bisect_right(sbp_edges, sbp)][bisect_right(sbp_ef_edges, ef)]
+      if not (bmi < bmi_min or bmi > bmi_max):
+        total += bmi_points[bisect_right(bmi_edges, bmi)]
+      if not (creatinine < creatinine_min or creatinine > creatinine_max):
+        total += creatinine_points[bisect_right(creatinine_edges, creatinine)]
+      if patient_data['gender'].lower() == 'female':
+        total += female_points
+
+      for name, points in flag_points:
+        if patient_data[name]:
+          total += points
+      for name, points in missing_treatment_points:
+        if not patient_data[name]:
+          total += points
+      if sodium_threshold is not None and patient_data['sodium'] < sodium_threshold:
+        total += sodium_points
+      return total
+
+    return score
+
+  def risk1_year(self, score):
+    if 0 <= score < len(self.risk1_percent):
+      return self.risk1_percent[score]  # Percentage % with 2 decimal places
+    return None
+
+  def risk3_year(self, score):
+    if 0 <= score < len(self.risk3_percent):
+      return self.risk3_percent[score]  # Percentage % with 2 decimal places
+    return None
+
+
+MAGGIC_TABLE = ScoringTable(MAGGIC_COEFFICIENTS)
+MAGGIC_PLUS_TABLE = ScoringTable(MAGGIC_PLUS_COEFFICIENTS)
@@ -0,0 +1,192 @@
+# typed_csv.py
+# Typed CSV ingestion for the batch scorer (run_model(result_type='batch')).
+# Instead of turning every row into a dict and parsing it cell by cell, the
+# CSV is read with declared dtypes, only the columns the parser knows
+# (plus the first column, which names patients without a name column), and
+# normalized column by column: the text fields are categoricals, so
+# strip/lower/'yes' run once per distinct value, and the numbers are NumPy
+# arrays with the parser's defaults filled in.
+# The result is exactly what PatientParser would produce. Files the
+# declared types cannot represent that way (blank or numeric text fields,
+# non-numeric numbers, ...) raise TypedCSVUnsupported and are scored by the
+# generic path instead.
+import numpy as np
+
+from models.batch_scoring import ResultBatch, _table_columns
+from models.file_readers import DEFAULT_CHUNKSIZE, csv_headers, iter_csv_frames
+from models.maggic_core import NYHA_CLASS_MAP, patient_id_for, stringify_number
+from models.scoring_table import MAGGIC_TABLE
+
+# Fields parsed with int(), and their defaults
+INT_FIELDS = {'age': 0, 'sbp': 120}
+# Fields parsed with float(), and their defaults. They stay float64: float32
+# would move values that sit on a bin edge (e.g. a creatinine of 1.3 mg/dL).
+FLOAT_FIELDS = {'lvef': 30.0, 'creatinine': 1.0, 'bmi': 24.0, 'sodium': 140.0}
+# gender and nyha_class are text; every other field the parsers know is a yes/no flag (default 'no')
+
+# pandas reads these as booleans rather than text
+_BOOL_STRINGS = {'True', 'False', 'TRUE', 'FALSE', 'true', 'false'}
+
+
+class TypedCSVUnsupported(ValueError):
+  """The CSV holds values the typed reader cannot normalize like PatientParser does."""
+
+
+def field_dtype(field, stringify_numbers=False):
+  """Declared dtype of the column of `field` (None: left to pandas)."""
+  if field == 'name':
+    return None
+  if field in INT_FIELDS:
+    # Stringified, 65.5 is not truncated but falls back to the default, so
+    # the column is left to pandas as in the generic path
+    return None if stringify_numbers else 'float64'
+  if field in FLOAT_FIELDS:
+    return 'float64'
+  return 'category'
+
+
+def _category_values(series, normalize):
+  # normalize() runs on the distinct values only; the rows take theirs by code
+  codes = series.cat.codes.to_numpy()
+  if (codes < 0).any():
+    raise TypedCSVUnsupported(f"blank cells in column {series.name!r}")
+  categories = series.cat.categories
+  import pandas as pd
+  if pd.to_numeric(categories, errors='coerce').notna().all() or set(categories) <= _BOOL_STRINGS:
+    # pandas would have read the column as numbers or booleans
+    raise TypedCSVUnsupported(f"column {series.name!r} is not text")
+  return np.asarray(normalize(categories.str.strip()))[codes]
+
+
+def _gender(categories):
+  lowered = categories.str.lower()
+  return np.where(lowered.isin(['male', 'female']), lowered, 'male')
+
+
+def _nyha_class(categories):
+  return categories.str.upper().map(NYHA_CLASS_MAP).fillna(1).astype(np.int64)
+
+
+def _yes_no(categories):
+  return categories.str.lower() == 'yes'
+
+
+def _int_values(series, default, stringify_numbers):
+  values = series.to_numpy()
+  if values.dtype.kind in 'iu':
+    return values.astype(float)
+  if values.dtype.kind != 'f':
+    raise TypedCSVUnsupported(f"non-numeric values in column {series.name!r}")
+  if stringify_numbers:
+    # Integral values are stringified as '65' (see stringify_number); int('65.5'),
+    # int('nan') and int('inf') fail and fall back to the default
+    integral = np.isfinite(values) & (values == np.trunc(values))
+    return np.where(integral, values, float(default))
+  if np.isinf(values).any():
+    raise TypedCSVUnsupported(f"infinite values in column {series.name!r}")
+  # int() truncates; NaN is a ValueError, i.e. the default
+  return np.where(np.isnan(values), float(default), np.trunc(values))
+
+
+def normalize_frame(frame, plan, fields, stringify_numbers=False):
+  """The parsed value arrays of `fields` for every row of `frame` (see PatientParser.parse_fields)."""
+  n = len(frame)
+  data = {}
+  for field in fields:
+    column = plan.columns.get(field)
+    if field in INT_FIELDS:
+      default = INT_FIELDS[field]
+      data[field] = (np.full(n, float(default)) if column is None
+                     else _int_values(frame[column], default, stringify_numbers))
+    elif field in FLOAT_FIELDS:
+      data[field] = np.full(n, FLOAT_FIELDS[field]) if column is None else frame[column].to_numpy(dtype=float)
+    elif field == 'gender':
+      data[field] = np.full(n, 'male', dtype=object) if column is None else _category_values(frame[column], _gender)
+    elif field == 'nyha_class':
+      data[field] = np.ones(n, dtype=np.int64) if column is None else _category_values(frame[column], _nyha_class)
+    else:
+      data[field] = np.zeros(n, dtype=bool) if column is None else _category_values(frame[column], _yes_no)
+  return data
+
+
+def patient_ids(frame, plan, parser, start=0, first_column_raw=True):
+  """
+  Patient ids of the rows of `frame`, numbered from start + 1, named as
+  PatientParser names them. first_column_raw=False means the first column
+  was read with a declared dtype and cannot stand in for a missing name.
+  """
+  name_column = plan.columns.get('name')
+  if name_column is not None:
+    names = frame[name_column]
+    if names.dtype.kind == 'O' and not names.isna().any():
+      # Non-empty strings: the common case needs no per-row work
+      return names.to_numpy()
+    names = names.tolist()
+  else:
+    names = [None] * len(frame)
+
+  ids = []
+  first_values = frame[plan.first_column].tolist()
+  for patient_no, (name, first_value) in enumerate(zip(names, first_values), start + 1):
+    if parser.stringify_numbers and name_column is not None and isinstance(name, (int, float)) and name == name:
+      name = stringify_number(name)
+    if not name:
+      if not first_column_raw:
+        raise TypedCSVUnsupported(f"patient {patient_no} is named by the typed column {plan.first_column!r}")
+      name = first_value
+      parser.warn_name_fallback(plan.first_column)
+    ids.append(patient_id_for(name, patient_no))
+  return ids
+
+
+def _typed_frames(filename, chunksize, usecols, dtype):
+  # pandas raises ValueError (ParserError, a cell the declared dtype cannot
+  # hold, bad encoding, ...) for files the typed reader cannot represent
+  frames = iter_csv_frames(filename, chunksize, usecols=usecols, dtype=dtype)
+  while True:
+    try:
+      frame = next(frames)
+    except StopIteration:
+      return
+    except ValueError as e:
+      raise TypedCSVUnsupported(f"cannot read the file with the declared types: {e}") from e
+    yield frame
+
+
+def score_csv_batch(filename, parser, table=MAGGIC_TABLE, chunksize=DEFAULT_CHUNKSIZE):
+  """
+  Score a CSV file (a path or PatientFile) into a ResultBatch, read
+  `chunksize` rows at a time with declared dtypes. `parser` supplies the
+  column aliases and warnings. Raises TypedCSVUnsupported (or OSError) if
+  the file has to go through the generic path; any other error is a bug.
+  """
+  try:
+    headers = csv_headers(filename)
+  except ValueError as e:
+    raise TypedCSVUnsupported(f"cannot read the CSV headers: {e}") from e
+  # Resolves the columns and prints the missing-column warning, as the generic path does
+  plan = parser.plan_for(dict.fromkeys(headers))
+  fields = _table_columns(table)
+  usecols = list(dict.fromkeys([plan.first_column] + list(plan.columns.values())))
+  dtype = {}
+  for field, column in plan.columns.items():
+    field_type = field_dtype(field, parser.stringify_numbers)
+    if field_type is None:
+      continue
+    if column == plan.first_column and 'name' not in plan.columns:
+      # The raw values of the first column name the patients, so pandas has to infer them
+      if field_type == 'category':
+        raise TypedCSVUnsupported(f"the patients are named by the text column {column!r}")
+      continue
+    dtype[column] = field_type
+  first_column_raw = plan.first_column not in dtype
+
+  batches = []
+  start = 0
+  for frame in _typed_frames(filename, chunksize, usecols, dtype):
+    data = normalize_frame(frame, plan, fields, parser.stringify_numbers)
+    ids = patient_ids(frame, plan, parser, start, first_column_raw)
+    start += len(frame)
+    if len(frame):
+      batches.append(ResultBatch.from_columns(ids, data, table))
+  return ResultBatch.concat(batches)
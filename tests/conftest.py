@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+# The models are imported as the `models` package from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+HEADER = ("Name,age,gender,nyha_class,lvef,diabetes,smoker,copd,sbp,creatinine,bmi,beta_blocker,ace_arb,"
+          "hf_duration_less_than_18_months\n")
+
+
+@pytest.fixture
+def edge_csv(tmp_path):
+  """Four patients; P2 has a missing BMI and P3 one between the BMI bands."""
+  path = tmp_path / "edge.csv"
+  path.write_text(
+    HEADER
+    + "P1,67,female,II,25.5,no,no,no,130,1.2,23.0,yes,yes,no\n"
+    + "P2,71,male,III,35.0,yes,yes,no,110,1.5,,no,yes,yes\n"
+    + "P3,55,male,I,45.0,no,no,yes,140,0.9,24.95,yes,no,no\n"
+    + "P4,80,female,IV,20.0,yes,no,no,95,2.1,31.0,no,no,yes\n",
+    encoding='utf-8')
+  return str(path)
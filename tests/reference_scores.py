@@ -0,0 +1,230 @@
+# Frozen copy of the original if/elif MAGGIC point ladders (the scalar
+# calculate_maggic_score of models/maggic_risk_model.py and
+# models/maggic_risk_plus.py before the scoring table was introduced).
+# Tests use it as an oracle that does not read models.scoring_table, so a
+# wrong bin edge or coefficient in the table cannot pass unnoticed.
+# Do not "fix" or refactor it.
+
+
+def calculate_efr(ef):
+  if ef == 0 or ef is None:
+    return None
+  elif ef < 20:
+    return 7
+  elif ef < 25:
+    return 6
+  elif ef < 30:
+    return 5
+  elif ef < 35:
+    return 3
+  elif ef < 40:
+    return 2
+  else:
+    return 0
+
+
+def calculate_efar(age, ef, _efr):
+  if age < 18 or age > 110 or age is None:
+    return None
+  elif _efr is not None:
+    if age < 55:
+      return 0
+    elif age < 60:
+      if ef < 30:
+        return 1
+      elif ef < 40:
+        return 2
+      else:
+        return 3
+    elif age < 65:
+      if ef < 30:
+        return 2
+      elif ef < 40:
+        return 4
+      else:
+        return 5
+    elif age < 70:
+      if ef < 30:
+        return 4
+      elif ef < 40:
+        return 6
+      else:
+        return 7
+    elif age < 75:
+      if ef < 30:
+        return 6
+      elif ef < 40:
+        return 8
+      else:
+        return 9
+    elif age < 80:
+      if ef < 30:
+        return 8
+      elif ef < 40:
+        return 10
+      else:
+        return 12
+    else:
+      if ef < 30:
+        return 10
+      elif ef < 40:
+        return 13
+      else:
+        return 15
+  else:
+    return None
+
+
+def calculate_sbpr(sbp, ef):
+  if ef < 1 or ef > 95 or sbp < 50 or sbp > 250:
+    return None
+  else:
+    if sbp < 110:
+      if ef < 30:
+        return 5
+      elif ef < 40:
+        return 3
+      else:
+        return 2
+    elif sbp < 120:
+      if ef < 30:
+        return 4
+      elif ef < 40:
+        return 2
+      else:
+        return 1
+    elif sbp < 130:
+      if ef < 30:
+        return 3
+      elif ef < 40:
+        return 1
+      else:
+        return 1
+    elif sbp < 140:
+      if ef < 30:
+        return 2
+      elif ef < 40:
+        return 1
+      else:
+        return 0
+    elif sbp < 150:
+      if ef < 30:
+        return 1
+      else:
+        return 0
+    else:
+      return 0
+
+
+def calculate_bmir(bmi):
+  if bmi < 10 or bmi > 50:
+    return None
+  else:
+    if bmi < 15:
+      return 6
+    elif bmi < 20:
+      return 5
+    elif bmi < 25:
+      return 3
+    elif bmi < 30:
+      return 2
+    else:
+      return 0
+
+
+def calculate_crtnr(creatinine):
+  if creatinine < 20 or creatinine > 1400:
+    return None
+  else:
+    if creatinine < 90:
+      return 0
+    elif creatinine < 110:
+      return 1
+    elif creatinine < 130:
+      return 2
+    elif creatinine < 150:
+      return 3
+    elif creatinine < 170:
+      return 4
+    elif creatinine < 210:
+      return 5
+    elif creatinine < 250:
+      return 6
+    else:
+      return 8
+
+
+def calculate_maggic_score(patient_data):
+  ef = patient_data['lvef']
+  age = patient_data['age']
+  creatinine = patient_data['creatinine'] * 88.4  # Convert mg/dL to μmol/L
+
+  _efr = calculate_efr(ef)
+  score = (
+    (_efr or 0) +
+    (calculate_efar(age, ef, _efr) or 0) +
+    (calculate_sbpr(patient_data['sbp'], ef) or 0) +
+    (calculate_bmir(patient_data['bmi']) or 0) +
+    (calculate_crtnr(creatinine) or 0) +
+    (-3 if patient_data['gender'].lower() == 'female' else 0) +
+    {1: 0, 2: 3, 3: 6, 4: 8}.get(patient_data['nyha_class'], 0) +
+    (1 if patient_data['smoker'] else 0) +
+    (3 if patient_data['diabetes'] else 0) +
+    (2 if patient_data['copd'] else 0) +
+    (2 if patient_data['hf_duration_less_than_18_months'] else 0) +
+    (5 if not patient_data['beta_blocker'] else 0) +
+    (3 if not patient_data['ace_arb'] else 0)
+  )
+  return score
+
+
+def calculate_plus_score(patient_data):
+  # MAGGIC Risk Plus: sodium and the (HYPOTHETICAL) history points
+  return (
+    calculate_maggic_score(patient_data) +
+    (3 if patient_data['sodium'] < 135 else 0) +
+    (3 if patient_data['atrial_fibrillation'] else 0) +
+    (2 if patient_data['myocardial_infarction'] else 0) +
+    (2 if patient_data['stroke'] else 0) +
+    (-1 if patient_data['pci'] else 0) +
+    (-1 if patient_data['cabg'] else 0)
+  )
+
+
+RISK1 = [
+  0.015, 0.016, 0.018, 0.02, 0.022, 0.024, 0.027, 0.029, 0.032, 0.036,
+  0.039, 0.043, 0.048, 0.052, 0.058, 0.063, 0.07, 0.077, 0.084, 0.093,
+  0.102, 0.111, 0.122, 0.134, 0.147, 0.16, 0.175, 0.191, 0.209, 0.227,
+  0.248, 0.269, 0.292, 0.316, 0.342, 0.369, 0.398, 0.427, 0.458, 0.49,
+  0.523, 0.557, 0.591, 0.625, 0.659, 0.692, 0.725, 0.757, 0.787, 0.816,
+  0.842
+]
+
+RISK3 = [
+  0.039, 0.043, 0.048, 0.052, 0.058, 0.063, 0.07, 0.077, 0.084, 0.092,
+  0.102, 0.111, 0.122, 0.134, 0.146, 0.16, 0.175, 0.191, 0.209, 0.227,
+  0.247, 0.269, 0.292, 0.316, 0.342, 0.369, 0.397, 0.427, 0.458, 0.49,
+  0.523, 0.556, 0.59, 0.625, 0.658, 0.692, 0.725, 0.756, 0.787, 0.815,
+  0.842, 0.866, 0.889, 0.908, 0.926, 0.941, 0.953, 0.964, 0.973, 0.98, 0.985
+]
+
+
+def calculate_1_year_risk(score):
+  if 0 <= score < len(RISK1):
+    return round(100 * RISK1[score], 2)  # Percentage % with 2 decimal places
+  return None
+
+
+def calculate_3_year_risk(score):
+  if 0 <= score < len(RISK3):
+    return round(100 * RISK3[score], 2)  # Percentage % with 2 decimal places
+  return None
+
+
+def get_risk_category(score):
+  if score <= 19:
+    return 'Low Risk'
+  elif score <= 30:
+    return 'Medium Risk'
+  else:
+    return 'High Risk'
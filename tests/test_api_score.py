@@ -0,0 +1,44 @@
+import pytest
+
+flask = pytest.importorskip('flask')
+
+from flask_maggic_score import app  # noqa: E402
+
+
+@pytest.fixture
+def client():
+  return app.test_client()
+
+
+def test_unnamed_patients_are_numbered(client, capsys):
+  patients = [
+    {"name": "A", "age": 70, "gender": "male", "lvef": 35},
+    {"age": 65, "gender": "female", "lvef": 45},
+  ]
+  response = client.post('/api/score', json=patients)
+
+  assert response.status_code == 200
+  body = response.get_json()
+  assert [result['patient_id'] for result in body['results']] == ['A', 'Patient 2']
+  assert body['errors'] == []
+  # The missing columns are reported to the client, not printed by the server
+  assert any("columns not found" in warning for warning in body['warnings'])
+  assert "Warning" not in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('model', ['maggic', 'maggic_plus'])
+def test_null_fields_take_their_defaults(client, model):
+  patient = {"name": "A", "age": 70, "gender": "male", "lvef": 35, "sbp": 130, "bmi": 26, "creatinine": 1.1,
+             "sodium": 138, "diabetes": True}
+  expected = client.post(f'/api/score?model={model}', json=patient).get_json()
+
+  nulls = dict(patient, nyha_class=None, smoker=None, copd=None, beta_blocker=None)
+  response = client.post(f'/api/score?model={model}', json=nulls)
+  assert response.status_code == 200
+  assert response.get_json() == expected
+
+  # A null number is its default too (sbp 120), not an int(None) error
+  response = client.post(f'/api/score?model={model}', json=[dict(patient, sbp=None)])
+  body = response.get_json()
+  assert body['errors'] == []
+  assert body['results'] == client.post(f'/api/score?model={model}', json=[dict(patient, sbp=120)]).get_json()['results']
@@ -0,0 +1,49 @@
+import importlib
+import io
+import json
+import time
+
+import pytest
+
+pytest.importorskip('flask')
+
+CSV = ("Name,age,gender,nyha_class,lvef,diabetes,smoker,copd,sbp,creatinine,bmi,beta_blocker,ace_arb,"
+       "hf_duration_less_than_18_months,sodium\n"
+       "P1,67,male,II,35,no,yes,no,130,1.2,23.0,yes,yes,no,138\n"
+       ",80,female,IV,25,yes,no,no,105,2.4,31.0,no,yes,yes,\n")
+
+
+@pytest.fixture(scope='module', params=['app_general', 'app_morelang'])
+def client(request, tmp_path_factory):
+  with pytest.MonkeyPatch.context() as monkeypatch:
+    monkeypatch.setenv('MAGGIC_DESCRIPTIONS_DIR', str(tmp_path_factory.mktemp('descriptions')))
+    module = importlib.import_module(request.param)
+  module.app.config['TESTING'] = True
+  return module.app.test_client()
+
+
+def _strict_json(response):
+  def reject(constant):
+    raise ValueError(f"invalid JSON constant {constant}")
+  return json.loads(response.get_data(as_text=True), parse_constant=reject)
+
+
+@pytest.mark.parametrize('model', ['maggic', 'maggic_plus'])
+def test_json_results_are_strict_json(client, model):
+  response = client.post('/upload?format=json', data={'model': model, 'file': (io.BytesIO(CSV.encode()), 'cohort.csv')},
+                         content_type='multipart/form-data')
+  assert response.status_code == 202
+  results_url = response.get_json()['results_url']
+
+  for _ in range(300):
+    response = client.get(results_url + '?format=json')
+    if response.status_code != 202:
+      break
+    time.sleep(0.1)
+  assert response.status_code == 200
+
+  results = _strict_json(response)['results']
+  # The blank name is not nan
+  assert [result['patient_id'] for result in results] == ['P1', 'Patient 2']
+  if model == 'maggic_plus':
+    assert results[1]['patient_data']['sodium'] is None
@@ -0,0 +1,165 @@
+# Parity of the vectorized scorer (models/batch_scoring.py) with the original
+# scalar if/elif ladders (tests/reference_scores.py, which does not read the
+# scoring table) over a grid of inputs that sits on, just below and just
+# above every bin edge and range limit, plus NaN, and with hand-computed
+# points for the boundary cases.
+import itertools
+import math
+
+import numpy as np
+import pytest
+
+import reference_scores
+from models.batch_scoring import _table_columns, score_patients_batch
+from models.scoring_table import MAGGIC_PLUS_TABLE, MAGGIC_TABLE
+
+NAN = float('nan')
+UMOL_PER_MG = 88.4
+TABLES = [
+  (MAGGIC_TABLE, reference_scores.calculate_maggic_score),
+  (MAGGIC_PLUS_TABLE, reference_scores.calculate_plus_score),
+]
+TABLE_IDS = ['maggic', 'maggic_plus']
+
+# 12 x 12 x 11 x 9 x 12 x 2 = 342,144 patients
+GRID = {
+  'age': [17, 18, 54.9, 55, 60, 65, 70, 75, 80, 110, 111, NAN],
+  'lvef': [0, 0.5, 1, 19.9, 20, 25, 30, 35, 40, 95, 96, NAN],
+  'sbp': [49, 50, 109.9, 110, 120, 130, 140, 150, 250, 251, NAN],
+  'bmi': [9.9, 10, 15, 20, 25, 30, 50, 50.1, NAN],
+  # mg/dL values that land on (and just past) the μmol/L edges
+  'creatinine': [umol / UMOL_PER_MG for umol in (19, 20, 90, 110, 130, 150, 170, 210, 250, 1400, 1401)] + [NAN],
+  'gender': ['male', 'Female'],
+}
+NYHA_CLASSES = [0, 1, 2, 3, 4]
+SODIUM = [134, 135, 140, NAN]
+
+
+def grid_columns(table):
+  """The grid as a dict of columns; the flags and NYHA class cycle with the row number."""
+  rows = list(itertools.product(*GRID.values()))
+  n = len(rows)
+  data = {field: [row[i] for row in rows] for i, field in enumerate(GRID)}
+  index = np.arange(n)
+  data['nyha_class'] = [NYHA_CLASSES[i] for i in index % len(NYHA_CLASSES)]
+  data['sodium'] = [SODIUM[i] for i in index % len(SODIUM)]
+  flags = [field for field in _table_columns(table) if field not in data]
+  for bit, field in enumerate(flags):
+    data[field] = ((index >> bit) & 1).astype(bool).tolist()
+  return data
+
+
+def same(a, b):
+  if a is None:
+    return math.isnan(b)
+  return a == b
+
+
+@pytest.mark.parametrize('table, reference_score', TABLES, ids=TABLE_IDS)
+def test_batch_matches_reference_scores(table, reference_score):
+  data = grid_columns(table)
+  batch = score_patients_batch(data, table)
+  scores = batch['score'].tolist()
+  risk1 = batch['risk1_year'].tolist()
+  risk3 = batch['risk3_year'].tolist()
+  categories = batch['category'].tolist()
+  assert len(scores) == 342144
+
+  fields = list(data)
+  mismatches = []
+  for i, values in enumerate(zip(*data.values())):
+    patient = dict(zip(fields, values))
+    score = reference_score(patient)
+    if (score != scores[i] or not same(reference_scores.calculate_1_year_risk(score), risk1[i])
+        or not same(reference_scores.calculate_3_year_risk(score), risk3[i])
+        or reference_scores.get_risk_category(score) != categories[i]):
+      mismatches.append((patient, score, scores[i]))
+  assert not mismatches, f"{len(mismatches)} mismatches, e.g. {mismatches[:3]}"
+
+
+# A patient worth 0 points: age under 55, EF 40 or more, SBP 150 or more,
+# BMI 30 to 50, creatinine under 90 μmol/L, NYHA I, male, treated, no flags
+ZERO_POINTS = {
+  'age': 50, 'gender': 'male', 'nyha_class': 1, 'lvef': 45, 'sbp': 160, 'creatinine': 1.0, 'bmi': 35,
+  'diabetes': False, 'smoker': False, 'copd': False, 'hf_duration_less_than_18_months': False,
+  'beta_blocker': True, 'ace_arb': True, 'sodium': 140, 'atrial_fibrillation': False,
+  'myocardial_infarction': False, 'stroke': False, 'pci': False, 'cabg': False,
+}
+
+# (changed fields, points by hand from the published MAGGIC tables)
+BOUNDARY_CASES = [
+  ({}, 0),
+  ({'lvef': 0}, 0),  # EF 0 counts as missing: no EF, age or SBP points
+  ({'lvef': 0, 'sbp': 100}, 0),
+  ({'lvef': 19.9}, 7),
+  ({'lvef': 20}, 6),
+  ({'lvef': 29.9}, 5),
+  ({'lvef': 30}, 3),
+  ({'lvef': 39.9}, 2),
+  ({'lvef': 40}, 0),
+  ({'lvef': NAN}, 0),
+  ({'age': 55, 'lvef': 29}, 5 + 1),
+  ({'age': 80}, 15),
+  ({'age': 79}, 12),
+  ({'age': 80, 'lvef': 35}, 2 + 13),
+  ({'age': 110}, 15),
+  ({'age': 111}, 0),
+  ({'age': 17, 'lvef': 25}, 5),
+  ({'age': NAN}, 15),  # NaN fails every `<` test and lands in the last age band
+  ({'sbp': 109}, 2),
+  ({'sbp': 110, 'lvef': 25}, 5 + 4),
+  ({'sbp': 149, 'lvef': 25}, 5 + 1),
+  ({'sbp': 150, 'lvef': 25}, 5),
+  ({'sbp': 49}, 0),
+  ({'sbp': 100, 'lvef': 96}, 0),  # EF above 95: no SBP points
+  ({'sbp': 100, 'lvef': 0.5}, 7),  # EF below 1: EF points but no SBP points
+  ({'bmi': 9.9}, 0),
+  ({'bmi': 10}, 6),
+  ({'bmi': 15}, 5),
+  ({'bmi': 24.9}, 3),
+  ({'bmi': 25}, 2),
+  ({'bmi': 30}, 0),
+  ({'bmi': 50.1}, 0),
+  ({'bmi': NAN}, 0),
+  ({'creatinine': 0.2}, 0),  # 17.7 μmol/L, below the range
+  ({'creatinine': 1.1}, 1),  # 97.2
+  ({'creatinine': 1.5}, 3),  # 132.6
+  ({'creatinine': 2.0}, 5),  # 176.8
+  ({'creatinine': 3.0}, 8),  # 265.2
+  ({'creatinine': 16.0}, 0),  # 1414.4, above the range
+  ({'creatinine': NAN}, 8),  # like age, NaN lands in the last band
+  ({'gender': 'Female'}, -3),
+  ({'nyha_class': 4}, 8),
+  ({'nyha_class': 0}, 0),
+  ({'beta_blocker': False, 'ace_arb': False}, 5 + 3),
+  ({'diabetes': True, 'smoker': True, 'copd': True, 'hf_duration_less_than_18_months': True}, 3 + 1 + 2 + 2),
+]
+
+# Extra MAGGIC Risk Plus points of each case
+PLUS_CASES = [
+  ({'sodium': 134.9}, 3),
+  ({'sodium': 135}, 0),
+  ({'sodium': NAN}, 0),
+  ({'atrial_fibrillation': True, 'myocardial_infarction': True, 'stroke': True}, 3 + 2 + 2),
+  ({'pci': True, 'cabg': True}, -2),
+]
+
+
+def _score_one(patient, table):
+  return score_patients_batch({field: [value] for field, value in patient.items()}, table)['score'].tolist()[0]
+
+
+@pytest.mark.parametrize('changes, points', BOUNDARY_CASES)
+@pytest.mark.parametrize('table, reference_score', TABLES, ids=TABLE_IDS)
+def test_boundary_points(table, reference_score, changes, points):
+  patient = dict(ZERO_POINTS, **changes)
+  assert reference_score(patient) == points
+  assert _score_one(patient, table) == points
+
+
+@pytest.mark.parametrize('changes, points', BOUNDARY_CASES[:1] + PLUS_CASES)
+def test_plus_boundary_points(changes, points):
+  patient = dict(ZERO_POINTS, **changes)
+  assert reference_scores.calculate_plus_score(patient) == points
+  assert _score_one(patient, MAGGIC_PLUS_TABLE) == points
+  assert _score_one(patient, MAGGIC_TABLE) == 0
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from models import maggic_risk_model
+from models.corpus_export import CORPUS_COLUMNS, corpus_rows, export_corpus, main
+from models.results import LazyResult
+
+
+def _results(path):
+  return maggic_risk_model.run_model(path, stream=True, narratives='lazy')
+
+
+def test_jsonl_export_skips_undescribable_patients(edge_csv, tmp_path, capsys):
+  out = tmp_path / "out.jsonl"
+  assert main([edge_csv, str(out)]) == 0
+
+  rows = [json.loads(line) for line in out.read_text(encoding='utf-8').splitlines()]
+  assert [row['patient_id'] for row in rows] == ['P1', 'P4']
+  assert list(rows[0]) == [name for name, _ in CORPUS_COLUMNS]
+  assert "2 patients have been exported" in capsys.readouterr().out
+
+
+def test_failing_rows_are_reported_and_skipped(capsys):
+  def no_description(result):
+    raise ValueError("no description")
+
+  good = maggic_risk_model.process_patient({'Name': 'P1', 'age': '60', 'bmi': '22'}, 0, narratives='lazy')
+  broken = maggic_risk_model.process_patient({'Name': 'P2', 'age': '70', 'bmi': '22'}, 1, narratives='lazy')
+  broken = LazyResult(dict(broken), dict(maggic_risk_model.NARRATORS, detailed_description=no_description))
+  rows = list(corpus_rows([broken, good]))
+
+  assert [row['patient_id'] for row in rows] == ['P1']
+  assert "Error exporting patient data for P2: no description" in capsys.readouterr().out
+
+
+def test_jsonl_gzip_export(edge_csv, tmp_path):
+  import gzip
+  out = tmp_path / "out.jsonl.gz"
+  assert export_corpus(_results(edge_csv), str(out)) == 2
+  with gzip.open(out, 'rt', encoding='utf-8') as f:
+    assert [json.loads(line)['patient_id'] for line in f] == ['P1', 'P4']
+
+
+def test_parquet_export(edge_csv, tmp_path):
+  pytest.importorskip('pyarrow')
+  import pyarrow.parquet as pq
+  from models.corpus_export import arrow_schema
+
+  out = tmp_path / "out.parquet"
+  assert export_corpus(_results(edge_csv), str(out)) == 2
+  table = pq.read_table(out)
+  assert table.schema.equals(arrow_schema())
+  assert table.column('patient_id').to_pylist() == ['P1', 'P4']
+  assert table.column('age').to_pylist() == [67, 80]
+  assert all(table.column('patient_recommendations').to_pylist())
+
+
+def test_arrow_export_can_be_memory_mapped(edge_csv, tmp_path):
+  pa = pytest.importorskip('pyarrow')
+  out = tmp_path / "out.arrow"
+  assert export_corpus(_results(edge_csv), str(out)) == 2
+  with pa.memory_map(str(out)) as source:
+    table = pa.ipc.open_file(source).read_all()
+  assert table.column('patient_id').to_pylist() == ['P1', 'P4']
+  assert table.column('score').type == pa.int64()
+
+
+def test_unknown_format(tmp_path):
+  with pytest.raises(ValueError):
+    export_corpus([], str(tmp_path / "out.csv"))
@@ -0,0 +1,30 @@
+# patient_descriptions.txt must stay byte-identical for a fixed cohort.
+# tests/data/golden_patient_descriptions.txt was written by the original
+# (pre-template) description code from tests/data/golden_cohort.csv, whose
+# rows sit on the LVEF, SBP, creatinine and BMI classification boundaries.
+import os
+
+import pytest
+
+from models import maggic_risk_model
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+COHORT = os.path.join(DATA_DIR, 'golden_cohort.csv')
+GOLDEN = os.path.join(DATA_DIR, 'golden_patient_descriptions.txt')
+
+
+@pytest.mark.parametrize('options', [
+  {},
+  {'stream': True, 'chunksize': 7},
+  {'workers': 2, 'sharded': True},
+], ids=['eager', 'stream', 'sharded'])
+def test_descriptions_match_golden_file(tmp_path, options):
+  output_file = str(tmp_path / "patient_descriptions.txt")
+  results = maggic_risk_model.run_model(COHORT, output_file=output_file, **options)
+  # A streaming run writes the file as its results are consumed
+  assert len(list(results)) == 39
+
+  with open(GOLDEN, 'rb') as f:
+    golden = f.read()
+  with open(output_file, 'rb') as f:
+    assert f.read() == golden
@@ -0,0 +1,55 @@
+import csv
+
+import pytest
+
+from models import maggic_risk_model, maggic_risk_plus
+
+pytest.importorskip('openpyxl')
+
+HEADER = ['Name', 'age', 'gender', 'nyha_class', 'lvef', 'sbp', 'creatinine', 'bmi', 'beta_blocker', 'sodium']
+# age and sbp are int columns with blank cells: pandas reads them as floats, openpyxl as ints
+ROWS = [
+  ['P1', 48, 'male', 'II', 35, 190, 1.2, 27.0, 'yes', 137],
+  ['P2', None, 'female', 'III', 25, None, 2.1, 31.0, 'no', 132],
+  ['P3', 72, 'male', 'IV', 45.5, 105, 0.9, 22.0, 'yes', 140],
+]
+
+
+@pytest.fixture
+def cohort(tmp_path):
+  from openpyxl import Workbook
+  csv_path = tmp_path / "cohort.csv"
+  with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+    writer = csv.writer(f)
+    writer.writerow(HEADER)
+    writer.writerows([['' if value is None else value for value in row] for row in ROWS])
+
+  xlsx_path = tmp_path / "cohort.xlsx"
+  workbook = Workbook(write_only=True)
+  sheet = workbook.create_sheet()
+  sheet.append(HEADER)
+  for row in ROWS:
+    sheet.append(row)
+  workbook.save(xlsx_path)
+  return str(csv_path), str(xlsx_path)
+
+
+def _scores(results):
+  return [(result['patient_id'], result['patient_data'], result['score'], result['risk1_year'])
+          for result in results]
+
+
+@pytest.mark.parametrize('model', [maggic_risk_model, maggic_risk_plus], ids=['maggic', 'maggic_plus'])
+def test_int_columns_with_blanks(cohort, model, tmp_path, monkeypatch):
+  monkeypatch.chdir(tmp_path)
+  csv_path, xlsx_path = cohort
+  from_csv = model.run_model(csv_path)
+  from_xlsx = model.run_model(xlsx_path)
+
+  assert _scores(from_xlsx) == _scores(from_csv)
+  # 48.0 from the CSV is age 48, not the default
+  assert [result['patient_data']['age'] for result in from_csv] == [48, 0, 72]
+  assert [result['patient_data']['sbp'] for result in from_csv] == [190, 120, 105]
+
+  batch = model.run_model(csv_path, result_type='batch')
+  assert batch.score.tolist() == [result['score'] for result in from_csv]
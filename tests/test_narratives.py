@@ -0,0 +1,24 @@
+import pytest
+
+from models import maggic_risk_model, maggic_risk_plus
+
+
+@pytest.mark.parametrize('model', [maggic_risk_model, maggic_risk_plus])
+def test_lazy_and_eager_keep_the_same_patients(model, edge_csv, tmp_path, monkeypatch):
+  monkeypatch.chdir(tmp_path)
+  eager = model.run_model(edge_csv)
+  lazy = model.run_model(edge_csv, narratives='lazy')
+
+  assert [r['patient_id'] for r in eager] == ['P1', 'P4']
+  assert [r['patient_id'] for r in lazy] == ['P1', 'P4']
+  for eager_result, lazy_result in zip(eager, lazy):
+    for field in ('detailed_description', 'patient_message', 'doctor_message'):
+      assert lazy_result[field] == eager_result[field]
+
+
+def test_part2_run_model_return_shape(edge_csv, tmp_path, monkeypatch):
+  from models import maggic_risk_model_part2
+  monkeypatch.chdir(tmp_path)
+  results, same_results, group_chart = maggic_risk_model_part2.run_model(edge_csv)
+  assert same_results is results
+  assert [result['patient_id'] for result in results] == ['P1', 'P4']
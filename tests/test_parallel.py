@@ -0,0 +1,49 @@
+# The apps run the models on JobQueue threads; every process pool must
+# start its workers without forking the threaded process.
+import threading
+
+import pytest
+
+from models import maggic_risk_model
+from models.excel_reader import iter_excel_records
+from models.parallel import mp_context
+
+
+def _in_thread(target):
+  result = []
+  thread = threading.Thread(target=lambda: result.append(target()))
+  thread.start()
+  thread.join(timeout=300)
+  assert not thread.is_alive()
+  return result[0]
+
+
+def _scores(results):
+  return [(result.patient_id, result.score, result.risk1_year, result.risk3_year) for result in results]
+
+
+def test_pools_do_not_fork():
+  assert mp_context().get_start_method() != 'fork'
+
+
+def test_parallel_scoring_from_a_thread(edge_csv, tmp_path, monkeypatch):
+  monkeypatch.chdir(tmp_path)
+  serial = maggic_risk_model.run_model(edge_csv, result_type='record')
+  parallel = _in_thread(lambda: maggic_risk_model.run_model(edge_csv, workers=2, result_type='record'))
+  assert len(serial) == 4
+  assert _scores(parallel) == _scores(serial)
+
+
+def test_sheets_read_in_parallel_from_a_thread(tmp_path):
+  openpyxl = pytest.importorskip('openpyxl')
+  path = str(tmp_path / "sheets.xlsx")
+  workbook = openpyxl.Workbook()
+  workbook.active.append(['Name', 'age'])
+  workbook.active.append(['P1', 60])
+  sheet = workbook.create_sheet()
+  sheet.append(['Name', 'age'])
+  sheet.append(['P2', 70])
+  workbook.save(path)
+
+  records = _in_thread(lambda: list(iter_excel_records(path, sheets=None, workers=2)))
+  assert records == [{'Name': 'P1', 'age': 60}, {'Name': 'P2', 'age': 70}]
@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+from benchmarks.cohorts import PDF_ROWS_PER_PAGE, make_cohort
+from models import pdf_reader
+from models.parallel import mp_context
+
+pytest.importorskip('PyPDF2')
+
+
+PAGES = 4
+
+
+@pytest.fixture(scope='module')
+def cohort_pdf(tmp_path_factory):
+  return make_cohort(str(tmp_path_factory.mktemp('pdf')), PAGES * PDF_ROWS_PER_PAGE, 'pdf')
+
+
+@pytest.fixture
+def long_pdf(cohort_pdf, monkeypatch):
+  """A PDF long enough to be extracted on several processes, one page per task."""
+  monkeypatch.setattr(pdf_reader, 'PARALLEL_MIN_PAGES', 2)
+  monkeypatch.setattr(pdf_reader, 'PAGES_PER_TASK', 1)
+  return cohort_pdf
+
+
+@pytest.fixture
+def worker_cap():
+  yield pdf_reader.configure_workers
+  pdf_reader.configure_workers(None)
+
+
+def test_parallel_extraction_from_a_thread(long_pdf):
+  # The jobs of the apps read uploads on JobQueue threads, which must not fork
+  assert mp_context().get_start_method() != 'fork'
+  serial = list(pdf_reader.iter_pdf_records(long_pdf, workers=1))
+  parallel = []
+  thread = threading.Thread(target=lambda: parallel.extend(pdf_reader.iter_pdf_records(long_pdf, workers=2)))
+  thread.start()
+  thread.join(timeout=300)
+
+  assert not thread.is_alive()
+  assert len(serial) == PAGES * PDF_ROWS_PER_PAGE
+  assert parallel == serial
+
+
+def test_workers_are_capped(long_pdf, worker_cap, monkeypatch):
+  started = []
+  extract = pdf_reader._extract
+  # Record the worker count and extract in this process
+  monkeypatch.setattr(pdf_reader, '_extract', lambda reader, source, indices, workers: (
+    started.append(workers) or extract(reader, source, indices, 1)))
+
+  worker_cap(1)
+  list(pdf_reader.iter_page_texts(long_pdf, workers=8))
+  worker_cap(0)
+  list(pdf_reader.iter_page_texts(long_pdf, workers=8))
+  assert started == [1, 8]
+
+
+def _first_font(page):
+  fonts = page['/Resources'].get_object()['/Font'].get_object()
+  return fonts[sorted(fonts)[0]].get_object()
+
+
+def test_page_key_covers_the_font_encoding(cohort_pdf):
+  from PyPDF2 import PdfReader
+  from PyPDF2.generic import DecodedStreamObject, NameObject
+
+  page = PdfReader(cohort_pdf).pages[0]
+  key = pdf_reader.page_key(page)
+  assert pdf_reader.page_key(PdfReader(cohort_pdf).pages[0]) == key
+
+  # Same content stream and font name, different glyph-to-text mapping
+  font = _first_font(page)
+  to_unicode = DecodedStreamObject()
+  to_unicode.set_data(font['/ToUnicode'].get_object().get_data().replace(b"0030", b"0031"))
+  font[NameObject('/ToUnicode')] = to_unicode
+  remapped = pdf_reader.page_key(page)
+  assert remapped != key
+
+  font[NameObject('/Encoding')] = NameObject('/Identity-V')
+  assert pdf_reader.page_key(page) not in (key, remapped)
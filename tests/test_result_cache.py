@@ -0,0 +1,48 @@
+import os
+import time
+
+from models.result_cache import DiskResultCache, MemoryResultCache
+
+VALUE = b'x' * 1000
+
+
+def _age(cache, key, seconds):
+  """Pretend `key` was stored and last read `seconds` ago."""
+  stamp = time.time() - seconds
+  os.utime(cache._path(key), (stamp, stamp))
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+  cache = DiskResultCache(str(tmp_path), max_bytes=2500)
+  cache.put('a', VALUE)
+  cache.put('b', VALUE)
+  _age(cache, 'a', 30)
+  _age(cache, 'b', 20)
+  stored = os.path.getmtime(cache._path('a'))
+
+  assert cache.get('a') == VALUE
+  # A hit marks the entry used but does not extend its ttl
+  assert os.path.getmtime(cache._path('a')) == stored
+
+  cache.put('c', VALUE)
+  assert cache.get('b') is None
+  assert cache.get('a') == VALUE
+  assert cache.get('c') == VALUE
+
+
+def test_disk_cache_ttl_counts_from_put(tmp_path):
+  cache = DiskResultCache(str(tmp_path), ttl=60)
+  cache.put('a', VALUE)
+  _age(cache, 'a', 61)
+  assert cache.get('a') is None
+  assert not os.path.exists(cache._path('a'))
+
+
+def test_memory_cache_evicts_least_recently_used():
+  cache = MemoryResultCache(max_entries=2)
+  cache.put('a', 1)
+  cache.put('b', 2)
+  assert cache.get('a') == 1
+  cache.put('c', 3)
+  assert cache.get('b') is None
+  assert (cache.get('a'), cache.get('c')) == (1, 3)
@@ -0,0 +1,21 @@
+from benchmarks import run_benchmarks
+
+
+def test_warm_up_and_pdf_size_limit(tmp_path, monkeypatch):
+  pipelines = []
+  run_pipeline = run_benchmarks.run_pipeline
+
+  def record(model_name, path, *args):
+    pipelines.append((model_name, path))
+    return run_pipeline(model_name, path, *args)
+
+  monkeypatch.setattr(run_benchmarks, 'WARMUP_PATIENTS', 20)
+  monkeypatch.setattr(run_benchmarks, 'run_pipeline', record)
+  results = run_benchmarks.run_benchmarks(['maggic_risk_model'], [30, 90], ['csv', 'pdf'], str(tmp_path),
+                                          pdf_max_patients=50)
+
+  assert [(run['format'], run['patients']) for run in results['runs']] == [('csv', 30), ('pdf', 30), ('csv', 90)]
+  # One untimed run per format, on the warm-up cohort, before the first timed one
+  assert [path.rsplit('cohort_', 1)[1] for _, path in pipelines] == [
+    '20_seed0.csv', '30_seed0.csv', '20_seed0.pdf', '30_seed0.pdf', '90_seed0.csv',
+  ]
@@ -0,0 +1,21 @@
+# Regression check that every pipeline stays linear in the number of
+# patients (see benchmarks/scaling.py). The cohorts are small so the test
+# stays quick; a per-patient step that grows with the cohort (e.g. a chart
+# rendered for every patient) still shows up as an exponent near 2.
+from benchmarks import scaling
+
+SIZES = ['250', '1000']
+MAX_EXPONENT = '1.5'
+
+
+def test_pipelines_scale_linearly(tmp_path, capsys):
+  status = scaling.main(['--sizes', *SIZES, '--max-exponent', MAX_EXPONENT, '--data-dir', str(tmp_path)])
+  output = capsys.readouterr().out
+  assert status == 0, output
+  for model_name in scaling.PIPELINES:
+    assert model_name in output
+
+
+def test_scaling_exponent():
+  assert abs(scaling.scaling_exponent([100, 1000], [0.1, 1.0]) - 1.0) < 1e-9
+  assert abs(scaling.scaling_exponent([100, 1000], [0.01, 1.0]) - 2.0) < 1e-9
@@ -0,0 +1,44 @@
+import pytest
+
+from models import typed_csv
+from models.batch_scoring import score_patient_file
+from models.maggic_core import PatientParser
+
+pytest.importorskip('pandas')
+
+CSV = ("Name,age,gender,nyha_class,lvef,diabetes,smoker,copd,sbp,creatinine,bmi,beta_blocker,ace_arb,"
+       "hf_duration_less_than_18_months\n"
+       "P1,67,male,II,35,no,yes,no,130,1.2,23.0,yes,yes,no\n"
+       "P2,80,female,IV,{lvef},yes,no,no,105,2.4,31.0,no,yes,yes\n")
+
+
+def _score(path, typed):
+  batch = score_patient_file(path, PatientParser(), typed_csv=typed)
+  return list(batch.patient_id), batch.score.tolist()
+
+
+def test_typed_read(tmp_path):
+  path = tmp_path / "cohort.csv"
+  path.write_text(CSV.format(lvef=25), encoding='utf-8')
+  assert _score(str(path), True) == _score(str(path), False)
+
+
+def test_unrepresentable_file_falls_back(tmp_path):
+  # Text in a number column cannot be read as float64
+  path = tmp_path / "cohort.csv"
+  path.write_text(CSV.format(lvef='unknown'), encoding='utf-8')
+  with pytest.raises(typed_csv.TypedCSVUnsupported):
+    typed_csv.score_csv_batch(str(path), PatientParser())
+  assert _score(str(path), True) == _score(str(path), False)
+
+
+def test_unexpected_errors_are_not_swallowed(tmp_path, monkeypatch):
+  path = tmp_path / "cohort.csv"
+  path.write_text(CSV.format(lvef=25), encoding='utf-8')
+
+  def broken(*args):
+    raise IndexError("bug in the typed path")
+
+  monkeypatch.setattr(typed_csv, 'normalize_frame', broken)
+  with pytest.raises(IndexError):
+    score_patient_file(str(path), PatientParser())